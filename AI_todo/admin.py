@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import KeywordRule
+
+
+@admin.register(KeywordRule)
+class KeywordRuleAdmin(admin.ModelAdmin):
+    list_display = ("label", "keyword", "group_order")
+    list_filter = ("label",)
+    search_fields = ("keyword",)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AiTodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'AI_todo'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0002_insightjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contextentry',
+            index=models.Index(fields=['created_at', 'id'], name='context_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contextentry',
+            index=models.Index(fields=['source_type', 'created_at'], name='context_source_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_at', 'id'], name='task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'deadline'], name='task_status_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'priority_score'], name='task_status_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['deadline'], name='task_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'status'], name='task_category_status_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# SQLite FTS5 full-text index over Task.title/description and
+# ContextEntry.content. External-content tables keep only the inverted
+# index; triggers keep it in sync with every write path, including
+# bulk_create/update which bypass model signals. Other databases skip this
+# and API/search.py falls back to icontains lookups.
+
+from django.db import migrations
+
+FTS_TABLES = {
+    # fts table: (source table, indexed columns)
+    "ai_todo_task_fts": ("AI_todo_task", ["title", "description"]),
+    "ai_todo_contextentry_fts": ("AI_todo_contextentry", ["content"]),
+}
+
+
+def _statements(fts, source, columns):
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{c}" for c in columns)
+    old_vals = ", ".join(f"old.{c}" for c in columns)
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{source}', content_rowid='id', "
+        f"tokenize='porter unicode61');",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN {insert_new} END;",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN {delete_old} END;",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {source} BEGIN {delete_old} {insert_new} END;",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild');",
+    ]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for fts, (source, columns) in FTS_TABLES.items():
+        for sql in _statements(fts, source, columns):
+            schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for fts in FTS_TABLES:
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix};")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts};")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0003_task_context_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeywordRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100)),
+                ('keyword', models.CharField(max_length=100)),
+                ('group_order', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('label', 'keyword'), name='unique_keyword_rule')],
+            },
+        ),
+    ]
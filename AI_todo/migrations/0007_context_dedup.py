@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS = "ai_todo_contextentry_fts"
+SOURCE = "AI_todo_contextentry"
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # Adding the foreign key makes SQLite rebuild the table, which drops the
+    # triggers from 0004_search_index; the FTS rows themselves keep their ids.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    insert_new = f"INSERT INTO {FTS}(rowid, content) VALUES (new.id, new.content);"
+    delete_old = f"INSERT INTO {FTS}({FTS}, rowid, content) VALUES ('delete', old.id, old.content);"
+    for sql in (
+        f"DROP TRIGGER IF EXISTS {FTS}_ai;",
+        f"DROP TRIGGER IF EXISTS {FTS}_ad;",
+        f"DROP TRIGGER IF EXISTS {FTS}_au;",
+        f"CREATE TRIGGER {FTS}_ai AFTER INSERT ON {SOURCE} BEGIN {insert_new} END;",
+        f"CREATE TRIGGER {FTS}_ad AFTER DELETE ON {SOURCE} BEGIN {delete_old} END;",
+        f"CREATE TRIGGER {FTS}_au AFTER UPDATE OF content ON {SOURCE} BEGIN {delete_old} {insert_new} END;",
+    ):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0006_embedding'),
+    ]
+
+    operations = [
+        # runs last when migrating backwards, after the table is rebuilt again
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='contextentry',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='AI_todo.contextentry'),
+        ),
+        migrations.AddField(
+            model_name='contextentry',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contextentry',
+            name='minhash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contextentry',
+            index=models.Index(fields=['fingerprint'], name='context_fingerprint_idx'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
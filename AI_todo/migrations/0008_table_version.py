@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+TABLES = ("task", "context", "category")
+
+
+def seed_versions(apps, schema_editor):
+    TableVersion = apps.get_model("AI_todo", "TableVersion")
+    TableVersion.objects.bulk_create([TableVersion(table=t) for t in TABLES], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0007_context_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['updated_at'], name='task_updated_idx'),
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
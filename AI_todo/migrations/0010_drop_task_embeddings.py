@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations
+
+
+def drop_task_embeddings(apps, schema_editor):
+    # Task vectors were written on every save but never queried
+    Embedding = apps.get_model("AI_todo", "Embedding")
+    Embedding.objects.filter(kind="task").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0009_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_task_embeddings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_todo', '0010_drop_task_embeddings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='embedding',
+            name='kind',
+            field=models.CharField(choices=[('context', 'Context')], max_length=10),
+        ),
+    ]
@@ -12,6 +12,17 @@ class ContextEntry(models.Model):
     source_type = models.CharField(max_length=20, choices=SOURCE_CHOICES, default="note")
     created_at = models.DateTimeField(default=timezone.now)
     processed_insights = models.JSONField(blank=True, null=True)
+    # Dedup (API/dedup.py): hash of the normalized text, 64-bit MinHash, and
+    # the first entry of the duplicate cluster this one belongs to.
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+    minhash = models.BigIntegerField(null=True, blank=True, editable=False)
+    duplicate_of = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL, related_name="duplicates")
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="context_created_idx"),
+            models.Index(fields=["source_type", "created_at"], name="context_source_created_idx"),
+            models.Index(fields=["fingerprint"], name="context_fingerprint_idx"),
+        ]
     def __str__(self): return f"{self.source_type} — {self.created_at:%Y-%m-%d %H:%M}"
 
 class Task(models.Model):
@@ -24,4 +35,75 @@ class Task(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="task_created_idx"),
+            models.Index(fields=["status", "deadline"], name="task_status_deadline_idx"),
+            models.Index(fields=["status", "priority_score"], name="task_status_priority_idx"),
+            models.Index(fields=["deadline"], name="task_deadline_idx"),
+            models.Index(fields=["category", "status"], name="task_category_status_idx"),
+            models.Index(fields=["updated_at"], name="task_updated_idx"),
+        ]
     def __str__(self): return self.title
+
+class InsightJob(models.Model):
+    """Queue row asking the insight worker to fill ContextEntry.processed_insights."""
+    STATUS_CHOICES=[("pending","Pending"),("running","Running"),("done","Done"),("failed","Failed")]
+    context = models.ForeignKey(ContextEntry, on_delete=models.CASCADE, related_name="insight_jobs")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+    def __str__(self): return f"insights for context {self.context_id} ({self.status})"
+
+class KeywordRule(models.Model):
+    """
+    Keyword for the offline heuristic classifier (API/keyword_rules.py).
+    label is "urgency" or a category name; categories with a lower
+    group_order win when several match.
+    """
+    label = models.CharField(max_length=100)
+    keyword = models.CharField(max_length=100)
+    group_order = models.IntegerField(default=0)
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["label", "keyword"], name="unique_keyword_rule")]
+    def __str__(self): return f"{self.label}: {self.keyword}"
+
+class Embedding(models.Model):
+    """Hashed TF vector for a context entry (API/embeddings.py)."""
+    KIND_CHOICES=[("context","Context")]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["kind", "object_id"], name="unique_embedding")]
+    def __str__(self): return f"{self.kind} {self.object_id}"
+
+class TableVersion(models.Model):
+    """
+    Write counter per API table ("task", "context", "category"), bumped on
+    every change. Feeds the ETag / Last-Modified validators (API/http_cache.py).
+    """
+    table = models.CharField(max_length=40, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self): return f"{self.table} v{self.version}"
+
+class ChangeLog(models.Model):
+    """
+    One row per write to an API table; the id is the delta-sync cursor
+    (GET /api/changes/?since=, API/changes.py). Deletes are tombstones.
+    """
+    OPS = [("upsert", "Upsert"), ("delete", "Delete")]
+    id = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OPS, default="upsert")
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=["created_at"], name="changelog_created_idx")]
+    def __str__(self): return f"#{self.id} {self.op} {self.table} {self.object_id}"
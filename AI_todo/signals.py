@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Category, ContextEntry, InsightJob, Task
+
+API_TABLES = {Task: "task", ContextEntry: "context", Category: "category"}
+
+
+@receiver(pre_save, sender=ContextEntry)
+def fingerprint_context(sender, instance, update_fields=None, **kwargs):
+    """
+    Fingerprint new contexts and link them to their duplicate cluster
+    (API/dedup.py); an edited content is re-fingerprinted and re-linked.
+    """
+    if instance._state.adding:
+        if not instance.fingerprint:
+            from API.dedup import annotate
+            annotate(instance)
+    elif update_fields is None or "content" in update_fields:
+        from API.dedup import fingerprint, relink
+        if fingerprint(instance.content) != instance.fingerprint:
+            relink(instance)
+
+
+@receiver(post_save, sender=ContextEntry)
+def enqueue_insight_job(sender, instance, created, **kwargs):
+    """
+    Queue new contexts for the insight worker (manage.py process_insights).
+    A duplicate queues its canonical entry instead, once per cluster.
+    """
+    if created and instance.processed_insights is None and getattr(settings, "INSIGHTS_AUTO_ENQUEUE", True):
+        if instance.duplicate_of_id:
+            from API.insights import enqueue
+            enqueue([instance.duplicate_of_id])
+        else:
+            InsightJob.objects.create(context=instance)
+
+
+@receiver(post_save, sender=ContextEntry)
+def index_context_minhash(sender, instance, created, update_fields=None, **kwargs):
+    from API.dedup import index_canonical, reindex
+    if created:
+        index_canonical(instance)
+    else:
+        reindex(instance, update_fields)
+
+
+@receiver(post_save, sender=ContextEntry)
+def embed_context(sender, instance, update_fields=None, **kwargs):
+    """Keep the context's semantic vector (API/embeddings.py) current."""
+    if update_fields is None or "content" in update_fields:
+        from API.embeddings import store_embedding
+        store_embedding("context", instance.pk, instance.content)
+
+
+@receiver(pre_save, sender=Task)
+def remember_category(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._previous_category_id = None
+    elif update_fields is not None and not {"category", "category_id"} & set(update_fields):
+        instance._previous_category_id = instance.category_id
+    else:
+        # A move is counted here, race-free; count_category_usage then sees no change
+        from API.category_counts import swap_category
+        instance._previous_category_id = instance.category_id if swap_category(instance) else None
+
+
+@receiver(post_save, sender=Task)
+def count_category_usage(sender, instance, **kwargs):
+    """Keep Category.usage_count current (API/category_counts.py)."""
+    from API.category_counts import move
+    move(getattr(instance, "_previous_category_id", None), instance.category_id)
+
+
+@receiver(post_delete, sender=ContextEntry)
+def drop_context_embedding(sender, instance, **kwargs):
+    from API.embeddings import delete_embedding
+    delete_embedding("context", instance.pk)
+
+
+@receiver(pre_delete, sender=ContextEntry)
+def remember_cluster(sender, instance, **kwargs):
+    # duplicate_of is SET_NULL, so the members are only known before the delete
+    instance._cluster_members = list(instance.duplicates.order_by("id").values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=ContextEntry)
+def promote_duplicate(sender, instance, **kwargs):
+    """Hand the cluster over to its oldest remaining member."""
+    from API.dedup import forget, promote
+    forget(instance)
+    promote(getattr(instance, "_cluster_members", []))
+
+
+@receiver(post_delete, sender=Task)
+def uncount_category_usage(sender, instance, **kwargs):
+    from API.category_counts import move
+    move(instance.category_id, None)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def log_table_change(sender, instance, signal, **kwargs):
+    """Feed the change log and ETag versions of the API tables (API/changes.py)."""
+    table = API_TABLES.get(sender)
+    if table:
+        from API.changes import record
+        record(table, [instance.pk], op="delete" if signal is post_delete else "upsert")
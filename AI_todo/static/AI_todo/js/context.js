@@ -46,7 +46,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // Fetch and display contexts
     function fetchContexts() {
-        fetch("/api/context/") // Replace with your actual Django API endpoint
+        fetch("/api/context/?fields=id,content,source_type") // skip processed_insights blobs
             .then(response => response.json())
             .then(data => {
                 contextList.innerHTML = "";
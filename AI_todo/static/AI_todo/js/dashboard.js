@@ -136,37 +136,33 @@ async function deleteTask(taskId) {
   });
   if (res.ok) {
     TASKS_CACHE = TASKS_CACHE.filter(t => t.id != taskId);
-    applyFilters();
+    renderTasks(TASKS_CACHE);
   } else {
     alert('Error deleting task.');
   }
 }
 
-// Apply filters
-function applyFilters() {
+// Build the server-side filter query from the dropdowns
+function filterParams() {
+  const params = new URLSearchParams();
   const cat = document.getElementById('filter-category').value;
   const status = document.getElementById('filter-status').value;
   const pr = document.getElementById('filter-priority').value;
-  let filtered = TASKS_CACHE.slice();
-
-  if (cat) filtered = filtered.filter(t => (t.category && t.category.name === cat));
-  if (status) filtered = filtered.filter(t => t.status === status);
-  if (pr) {
-    filtered = filtered.filter(t => {
-      const p = t.priority_score || 0;
-      if (pr === 'high') return p >= 7;
-      if (pr === 'medium') return p >= 4 && p < 7;
-      return p < 4;
-    });
-  }
-  renderTasks(filtered);
+
+  if (cat) params.set('category', cat);
+  if (status) params.set('status', status);
+  if (pr === 'high') params.set('min_priority', 7);
+  if (pr === 'medium') { params.set('min_priority', 4); params.set('priority_below', 7); }
+  if (pr === 'low') params.set('priority_below', 4);
+  return params.toString();
 }
 
-// Fetch tasks from backend
+// Fetch (already filtered) tasks from backend
 async function fetchAndShowTasks() {
-  const data = await getJSON(API + 'tasks/');
+  const query = filterParams();
+  const data = await getJSON(API + 'tasks/' + (query ? `?${query}` : ''));
   TASKS_CACHE = data;
-  applyFilters();
+  renderTasks(TASKS_CACHE);
 }
 
 // Escape HTML to avoid XSS
@@ -194,8 +190,8 @@ document.addEventListener('DOMContentLoaded', async () => {
   await loadCategoriesIntoFilter();
   await fetchAndShowTasks();
 
-  document.getElementById('filter-category').addEventListener('change', applyFilters);
-  document.getElementById('filter-status').addEventListener('change', applyFilters);
-  document.getElementById('filter-priority').addEventListener('change', applyFilters);
+  document.getElementById('filter-category').addEventListener('change', fetchAndShowTasks);
+  document.getElementById('filter-status').addEventListener('change', fetchAndShowTasks);
+  document.getElementById('filter-priority').addEventListener('change', fetchAndShowTasks);
   document.getElementById('refresh').addEventListener('click', fetchAndShowTasks);
 });
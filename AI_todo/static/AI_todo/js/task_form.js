@@ -2,7 +2,8 @@
 const API = '/api/';
 
 async function loadCategoriesToSelect(){
-  const cats = await getJSON(API + 'categories/');
+  // most used first; usage_count is kept current on the server
+  const cats = await getJSON(API + 'categories/?ordering=-usage_count,name');
   const sel = document.getElementById('category');
   sel.innerHTML = '<option value="">Select Category</option>';
   cats.forEach(c => {
@@ -1,3 +1,1003 @@
-from django.test import TestCase
+import json
+import time
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from API.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+from .models import Category, ContextEntry, KeywordRule, Task
+
+
+# Maximum SQL queries any list endpoint may issue, whatever the row count.
+# One of them is the conditional-GET validator (API/http_cache.py).
+LIST_QUERY_BUDGET = {
+    "/api/tasks/": 2,
+    "/api/categories/": 2,
+    "/api/context/": 2,
+    "/api/context/?compact=1": 2,
+    "/api/tasks/?page_size=10": 2,
+}
+
+
+class ListQueryBudgetTests(TestCase):
+    """Guard against N+1 regressions in the API list endpoints."""
+
+    def make_rows(self, n):
+        cats = [Category.objects.create(name=f"cat-{Category.objects.count()}-{i}") for i in range(3)]
+        Task.objects.bulk_create(
+            [Task(title=f"task {i}", category=cats[i % 3]) for i in range(n)]
+        )
+        ContextEntry.objects.bulk_create(
+            [ContextEntry(content=f"context {i}") for i in range(n)]
+        )
+
+    def assert_within_budget(self):
+        for url, budget in LIST_QUERY_BUDGET.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+
+    def test_budget_small_table(self):
+        self.make_rows(3)
+        self.assert_within_budget()
+
+    def test_budget_large_table(self):
+        self.make_rows(60)
+        self.assert_within_budget()
+
+    def test_task_list_includes_category(self):
+        self.make_rows(4)
+        rows = self.client.get("/api/tasks/").json()
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(r["category"]["name"].startswith("cat-") for r in rows))
+
+
+class SparseCursorPageTests(TestCase):
+    def walk(self, url):
+        rows = []
+        while url:
+            with self.assertNumQueries(2):  # validator + one page query, deferred columns untouched
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            rows += resp.json()["results"]
+            url = resp.json()["next"]
+        return rows
+
+    def test_pages_keep_only_the_requested_fields(self):
+        ContextEntry.objects.bulk_create([ContextEntry(content=f"context {i}") for i in range(5)])
+        rows = self.walk("/api/context/?fields=content&page_size=2")
+        self.assertEqual([r["content"] for r in rows], [f"context {i}" for i in reversed(range(5))])
+        self.assertTrue(all(set(r) == {"content"} for r in rows))
+
+        Task.objects.bulk_create([Task(title=f"task {i}", priority_score=i) for i in range(5)])
+        rows = self.walk("/api/tasks/?fields=id,title&ordering=-priority_score&page_size=2")
+        self.assertEqual([r["title"] for r in rows], [f"task {i}" for i in reversed(range(5))])
+        self.assertTrue(all(set(r) == {"id", "title"} for r in rows))
+
+
+class TaskFilterTests(TestCase):
+    def setUp(self):
+        work = Category.objects.create(name="Work")
+        home = Category.objects.create(name="Home")
+        Task.objects.create(title="a", status="pending", category=work, priority_score=8, deadline="2025-01-10")
+        Task.objects.create(title="b", status="done", category=work, priority_score=5, deadline="2025-01-20")
+        Task.objects.create(title="c", status="pending", category=home, priority_score=2)
+
+    def titles(self, query):
+        resp = self.client.get(f"/api/tasks/?{query}")
+        self.assertEqual(resp.status_code, 200)
+        return sorted(t["title"] for t in resp.json())
+
+    def test_filters(self):
+        self.assertEqual(self.titles("status=pending"), ["a", "c"])
+        self.assertEqual(self.titles("category=Work"), ["a", "b"])
+        self.assertEqual(self.titles("min_priority=4&priority_below=7"), ["b"])
+        self.assertEqual(self.titles("deadline_after=2025-01-15"), ["b"])
+        self.assertEqual(self.titles("deadline_before=2025-01-10"), ["a"])
+
+    def test_ordering(self):
+        rows = self.client.get("/api/tasks/?ordering=-priority_score").json()
+        self.assertEqual([t["title"] for t in rows], ["a", "b", "c"])
+
+    def test_bad_date_is_rejected(self):
+        self.assertEqual(self.client.get("/api/tasks/?deadline_after=soon").status_code, 400)
+        self.assertEqual(self.client.get("/api/tasks/?deadline_after=2025-13-45").status_code, 400)
+        self.assertEqual(self.client.get("/api/context/?created_after=2025-02-30").status_code, 400)
+
+    def test_deadline_cursor_pages_reach_every_task(self):
+        Task.objects.create(title="d", deadline="2025-01-10")
+        Task.objects.create(title="e")
+        for ordering, expected in (("deadline", ["a", "d", "b", "c", "e"]), ("-deadline", ["e", "c", "b", "d", "a"])):
+            seen, url = [], f"/api/tasks/?ordering={ordering}&page_size=1"
+            while url:
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                seen += [t["title"] for t in resp.json()["results"]]
+                url = resp.json()["next"]
+            self.assertEqual(seen, expected)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(title="Prepare quarterly report", description="metrics for the manager")
+        ContextEntry.objects.create(content="Client meeting tomorrow about the quarterly budget")
+        ContextEntry.objects.create(content="Buy milk and eggs")
+
+    def search(self, query):
+        resp = self.client.get("/api/search/", {"q": query})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()["results"]
+
+    def test_matches_tasks_and_contexts(self):
+        hits = self.search("quarterly")
+        self.assertEqual(sorted(h["type"] for h in hits), ["context", "task"])
+        self.assertTrue(all("[quarterly]" in h["snippet"].lower() for h in hits))
+
+    def test_index_follows_updates_and_deletes(self):
+        self.task.title = "Renamed"
+        self.task.description = ""
+        self.task.save()
+        self.assertEqual([h["type"] for h in self.search("quarterly")], ["context"])
+        ContextEntry.objects.all().delete()
+        self.assertEqual(self.search("quarterly"), [])
+
+    def test_prefix_and_punctuation(self):
+        self.assertEqual(len(self.search('mil"k')), 0)
+        self.assertEqual([h["type"] for h in self.search("eg")], ["context"])
+        self.assertEqual(self.search("  ...  "), [])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_recovers_after_probe(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        for _ in range(2):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())   # the single half-open probe
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_success(latency=0.01)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_slow_success_counts_as_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, latency_slo=0.5)
+        breaker.allow()
+        breaker.record_success(latency=2.0)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.stats()["slo_breaches"], 1)
+
+
+class SuggestionCacheTests(SimpleTestCase):
+    def test_locmem_entries_expire_and_evict_least_recently_used(self):
+        from API.suggestion_cache import LocMemBackend, SuggestionCache
+
+        cache = SuggestionCache(LocMemBackend(ttl=60, max_entries=2))
+        cache.set("a", {"n": 1})
+        cache.set("b", {"n": 2})
+        self.assertEqual(cache.get("a"), {"n": 1})  # "a" is now the most recent
+        cache.set("c", {"n": 3})
+        self.assertEqual([cache.get(k) for k in "abc"], [{"n": 1}, None, {"n": 3}])
+        self.assertEqual(cache.stats()["hits"], 3)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        short = LocMemBackend(ttl=0.02, max_entries=10)
+        short.set("a", 1)
+        self.assertEqual(short.get("a"), 1)
+        time.sleep(0.03)
+        self.assertIsNone(short.get("a"))
+        self.assertEqual(len(short), 0)
+
+    def test_key_covers_every_input_but_not_whitespace(self):
+        from API.suggestion_cache import make_key
+
+        base = ("Pay rent", "before the 1st", ["landlord mail"], "gemini-x", "4")
+        key = make_key(*base)
+        self.assertEqual(key, make_key(" Pay   rent ", "before the\n1st", ["landlord  mail"], "gemini-x", "4"))
+        for n, changed in enumerate(("Pay bills", "after the 1st", ["other mail"], "gemini-y", "5")):
+            with self.subTest(part=n):
+                self.assertNotEqual(key, make_key(*base[:n], changed, *base[n + 1:]))
+
+    def test_repeated_request_is_answered_from_cache(self):
+        from API.ai_utils import get_ai_suggestions_with_gemini
+        from API.suggestion_cache import get_suggestion_cache
+
+        stats = get_suggestion_cache().stats
+        with self.settings(AI_FAKE_MODEL={"latency": 0}):
+            before = stats()
+            first = get_ai_suggestions_with_gemini("Cache me", "unique cache test body", [])
+            second = get_ai_suggestions_with_gemini("Cache  me", "unique cache test body", [])
+        self.assertEqual(first, second)
+        self.assertEqual(stats()["misses"] - before["misses"], 1)
+        self.assertEqual(stats()["hits"] - before["hits"], 1)
+
+
+class KeywordRuleTests(TestCase):
+    def test_db_rules_replace_defaults(self):
+        from API.ai_utils import _heuristic_ai
+        from API.keyword_rules import get_classifier, reset_classifier
+
+        # rows vanish on rollback without post_delete, so drop the cached rules
+        self.addCleanup(reset_classifier)
+        self.assertEqual(_heuristic_ai("Pay the electricity bill", "", [])["category"], "General")
+        KeywordRule.objects.create(label="Bills", keyword="bill", group_order=1)
+        KeywordRule.objects.create(label="urgency", keyword="overdue")
+        result = _heuristic_ai("Pay the electricity bill", "overdue", [])
+        self.assertEqual(result["category"], "Bills")
+        self.assertEqual(result["priority_score"], 7.0)
+        self.assertIn(
+            {"keyword": "bill", "label": "Bills", "start": 20, "end": 24},
+            get_classifier().classify("pay the electricity bill")["matches"],
+        )
+
+
+class RescoreTests(TestCase):
+    def test_rescore_updates_open_tasks_only(self):
+        today = date.today()
+        soon = Task.objects.create(title="File taxes", deadline=today)
+        later = Task.objects.create(title="Plan trip", deadline=today + timedelta(days=30))
+        done = Task.objects.create(title="Old", status="done", deadline=today)
+
+        summary = self.client.post("/api/tasks/rescore/").json()
+        self.assertEqual(summary["scanned"], 2)
+        for t in (soon, later, done):
+            t.refresh_from_db()
+        self.assertGreater(soon.priority_score, later.priority_score)
+        self.assertEqual(done.priority_score, 0.0)
+        self.assertEqual(self.client.post("/api/tasks/rescore/").json()["updated"], 0)
+
+
+class RelevantContextTests(TestCase):
+    def setUp(self):
+        from API.embeddings import reset_index
+
+        self.addCleanup(reset_index)
+        reset_index()
+
+    def test_suggestion_uses_most_relevant_context(self):
+        from API.views import _select_contexts
+
+        tax = ContextEntry.objects.create(content="Send the quarterly tax return to the accountant")
+        ContextEntry.objects.create(content="Buy milk, eggs and bread")
+        ContextEntry.objects.create(content="Book flights for the team offsite")
+        picked = _select_contexts("tax return", "", [])
+        self.assertEqual(picked[0], tax)
+
+        # no usable words: newest first, as before
+        self.assertEqual(_select_contexts("", "", [])[0].content, "Book flights for the team offsite")
+
+    def test_deleted_context_leaves_index(self):
+        from API.embeddings import relevant_contexts
+
+        ctx = ContextEntry.objects.create(content="Renew car insurance policy")
+        self.assertEqual(relevant_contexts("car insurance"), [ctx])
+        ctx.delete()
+        self.assertEqual(relevant_contexts("car insurance"), [])
+
+    def test_index_follows_vectors_written_by_other_processes(self):
+        from API.embeddings import embed_text, relevant_contexts, to_bytes
+        from .models import Embedding
+
+        ContextEntry.objects.create(content="Water the office plants")
+        with self.settings(AI_EMBEDDINGS={"REFRESH_INTERVAL": 0}):
+            self.assertEqual(relevant_contexts("dentist appointment"), [])
+            # another process: no signals here, just the stored rows
+            ctx = ContextEntry.objects.bulk_create([ContextEntry(content="Book the dentist appointment")])[0]
+            Embedding.objects.create(kind="context", object_id=ctx.id, vector=to_bytes(embed_text(ctx.content)))
+            self.assertEqual(relevant_contexts("dentist appointment"), [ctx])
+            Embedding.objects.filter(object_id=ctx.id).delete()
+            self.assertEqual(relevant_contexts("dentist appointment"), [])
+
+    def test_readding_an_id_replaces_its_vector_in_any_list(self):
+        import numpy as np
+
+        from API.embeddings import IVFIndex, embed_text, get_config
+
+        texts = [f"note {n} about topic {n % 4} and item {n * 7}" for n in range(16)]
+        index = IVFIndex(list(range(16)), np.vstack([embed_text(t) for t in texts]),
+                         {**get_config(), "BRUTE_FORCE_BELOW": 0})
+        self.assertGreater(len(index.list_ids), 1)
+        for text in ("something else entirely", "renew passport", texts[0]):
+            index.add(0, embed_text(text))
+            self.assertEqual(sum(int((ids == 0).sum()) for ids in index.list_ids), 1)
+            self.assertEqual(len(index), 16)
+        self.assertEqual(index.search(embed_text(texts[0]), 1)[0][0], 0)
+
+    def test_explicit_ids_keep_the_callers_order(self):
+        from API.views import _select_contexts
+
+        old = ContextEntry.objects.create(content="Older note")
+        new = ContextEntry.objects.create(content="Newer note")
+        self.assertEqual(_select_contexts("", "", [old.id, new.id, old.id, 10**9]), [old, new])
+
+    def test_prompt_and_cache_key_cover_every_context(self):
+        from API.ai_utils import _build_suggestion_prompt
+        from API.prompts import estimate_tokens
+        from API.suggestion_cache import make_key
+
+        texts = ["Renew the car insurance. " + "Compare quotes. " * 400, "Pay the electricity bill", "Call the garage"]
+        with self.settings(PROMPT_BUDGET={"MAX_CONTEXT_TOKENS": 300}):
+            prompt = _build_suggestion_prompt("", "", texts)
+        lines = [line for line in prompt.splitlines() if line.startswith("RELEVANT_CONTEXT_")]
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("RELEVANT_CONTEXT_1: Renew the car insurance."))
+        self.assertTrue(lines[2].endswith("Call the garage"))
+        self.assertLessEqual(sum(estimate_tokens(line.split(": ", 1)[1]) for line in lines), 300)
+
+        key = make_key("", "", texts, "m", "1")
+        self.assertNotEqual(key, make_key("", "", texts[:1], "m", "1"))
+        self.assertNotEqual(key, make_key("", "", texts[::-1], "m", "1"))
+        self.assertEqual(make_key("", "", "a  b", "m", "1"), make_key("", "", ["a b"], "m", "1"))
+
+    def test_insights_and_heuristic_use_every_context(self):
+        from API.ai_utils import _heuristic_ai, _suggestion_from_insights
+
+        best = ContextEntry(content="Plan the offsite agenda", processed_insights={
+            "title": "Plan offsite", "priority_score": 4, "deadline": {"date": "2030-05-01"}, "category": "Work"})
+        other = ContextEntry(content="Book venue", processed_insights={
+            "title": "Book venue", "priority_score": 9, "deadline": {"date": "2030-04-01"}})
+        suggestion = _suggestion_from_insights("", "", [best, other])
+        self.assertEqual((suggestion["suggested_title"], suggestion["category"]), ("Plan offsite", "Work"))
+        self.assertEqual((suggestion["priority_score"], suggestion["suggested_deadline"]), (9.0, "2030-04-01"))
+        self.assertIsNone(_suggestion_from_insights("", "", [ContextEntry(content="x"), other]))
+
+        calm, urgent = ContextEntry(content="Plan the offsite agenda"), ContextEntry(content="urgent: reply asap")
+        result = _heuristic_ai("", "", [calm, urgent])
+        self.assertEqual(result["suggested_title"], "Plan the offsite agenda")
+        self.assertGreater(result["priority_score"], _heuristic_ai("", "", [calm])["priority_score"])
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        from API.embeddings import reset_index
+
+        self.addCleanup(reset_index)
+
+    def test_ndjson_body_is_imported_in_batches(self):
+        from .models import Embedding, InsightJob
+
+        body = "\n".join(
+            [f'{{"content": "line {i}", "source_type": "email"}}' for i in range(5)]
+            + ['{"content": ""}', "not json"]
+        )
+        resp = self.client.post(
+            "/api/context/ingest/?batch_size=2&enqueue=1", body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json(), {"created": 5, "duplicates": 0, "skipped": 1, "batches": 3, "errors": {"invalid": 1}})
+        self.assertEqual(ContextEntry.objects.filter(source_type="email").count(), 5)
+        self.assertEqual(Embedding.objects.filter(kind="context").count(), 5)
+        self.assertEqual(InsightJob.objects.count(), 5)
+
+    def test_malformed_rows_are_counted_not_fatal(self):
+        rows = [
+            {"content": "list source", "source_type": ["email"]},
+            {"content": {"nested": 1}},
+            {"content": "numeric date", "created_at": 1700000000},
+            {"content": "bad date", "created_at": "yesterday"},
+            {"content": "fine", "source_type": "email", "created_at": "2024-01-31T09:00:00"},
+            {"content": ""},
+        ]
+        body = "\n".join(json.dumps(r) for r in rows)
+        resp = self.client.post("/api/context/ingest/", body, content_type="application/x-ndjson")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json(), {"created": 3, "duplicates": 0, "skipped": 1, "batches": 1,
+                                       "errors": {"invalid": 2, "bad_dates": 2}})
+        self.assertEqual(ContextEntry.objects.get(content="fine").created_at.date(), date(2024, 1, 31))
+
+    def test_unknown_default_source_type_or_bad_batch_size_is_rejected(self):
+        for query in ("source_type=fax", "batch_size=0", "batch_size=2.5", "batch_size=-3", "batch_size=abc"):
+            resp = self.client.post(f"/api/context/ingest/?{query}", '{"content": "x"}',
+                                    content_type="application/x-ndjson")
+            self.assertEqual(resp.status_code, 400, query)
+        self.assertFalse(ContextEntry.objects.exists())
+
+    def test_whatsapp_export(self):
+        from API.ingest import iter_whatsapp
+
+        lines = [
+            "31/12/2023, 21:41 - Messages are end-to-end encrypted.",
+            "31/12/2023, 21:41 - Alice: Finish the slides",
+            "by Friday please",
+            "[01/01/2024, 09:05:10] Bob: ok",
+        ]
+        rows = list(iter_whatsapp(lines, dayfirst=True))
+        self.assertEqual([r["content"] for r in rows], ["Alice: Finish the slides\nby Friday please", "Bob: ok"])
+        self.assertEqual(rows[1]["created_at"].date(), date(2024, 1, 1))
+
+
+class InsightWorkerTests(TestCase):
+    def test_claims_never_overlap(self):
+        from API.insights import claim_jobs
+
+        for i in range(3):
+            ContextEntry.objects.create(content=f"claim test {i}")
+        first, second = claim_jobs(2), claim_jobs(5)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertFalse({j.pk for j in first} & {j.pk for j in second})
+        self.assertEqual(claim_jobs(5), [])
+        self.assertTrue(all(j.status == "running" and j.attempts == 1 for j in first + second))
+
+    def test_results_are_stored_and_shared_with_duplicates(self):
+        from unittest import mock
+
+        from API.insights import process_batch
+        from .models import InsightJob
+
+        text = "Submit the quarterly expense report to finance before the end of the month please"
+        canonical = ContextEntry.objects.create(content=text)
+        member = ContextEntry.objects.create(content=text.upper())
+        self.assertEqual(member.duplicate_of_id, canonical.pk)
+        insights = {"title": "Submit expense report", "priority_score": 6}
+        with mock.patch("API.insights.compute_insights", return_value=insights) as compute:
+            self.assertEqual(process_batch(), 1)  # one job per cluster
+        compute.assert_called_once()
+        member.refresh_from_db()
+        self.assertEqual(member.processed_insights, insights)
+        self.assertEqual(InsightJob.objects.get().status, "done")
+
+    def test_failures_retry_then_give_up(self):
+        from unittest import mock
+
+        from django.utils import timezone
+
+        from API.insights import MAX_ATTEMPTS, process_batch, requeue_stale
+        from .models import InsightJob
+
+        ContextEntry.objects.create(content="flaky model")
+        with mock.patch("API.insights.compute_insights", side_effect=ConnectionError("boom")):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                self.assertEqual(process_batch(), 1)
+                job = InsightJob.objects.get()
+                self.assertEqual((job.attempts, job.last_error), (attempt, "boom"))
+                self.assertEqual(job.status, "pending" if attempt < MAX_ATTEMPTS else "failed")
+            self.assertEqual(process_batch(), 0)
+
+        InsightJob.objects.update(status="running", updated_at=timezone.now() - timedelta(hours=1))  # a dead worker's job
+        self.assertEqual(requeue_stale(timedelta(minutes=5)), 1)
+        self.assertEqual(InsightJob.objects.get().status, "pending")
+
+
+class DedupTests(TestCase):
+    FORWARD = ("Reminder: please send the signed contract, the final invoice and the delivery schedule "
+               "to the client before Friday noon so legal can review everything over the weekend")
+
+    def setUp(self):
+        from API.dedup import reset_index
+
+        self.addCleanup(reset_index)
+        reset_index()
+
+    def test_duplicates_join_the_first_entry_and_share_insights(self):
+        first = ContextEntry.objects.create(content=self.FORWARD, processed_insights={"title": "Send contract"})
+        exact = ContextEntry.objects.create(content="  " + self.FORWARD.upper() + "!!")
+        near = ContextEntry.objects.create(content="Fwd: " + self.FORWARD + " thanks")
+        other = ContextEntry.objects.create(content="Buy milk, eggs and bread on the way home from the gym")
+        self.assertEqual([exact.duplicate_of_id, near.duplicate_of_id, other.duplicate_of_id], [first.pk, first.pk, None])
+        self.assertEqual(near.processed_insights, {"title": "Send contract"})
+
+        first.delete()
+        exact.refresh_from_db()
+        near.refresh_from_db()
+        self.assertIsNone(exact.duplicate_of_id)
+        self.assertEqual(near.duplicate_of_id, exact.pk)
+
+    def test_edited_content_is_relinked(self):
+        from API.dedup import fingerprint
+
+        first = ContextEntry.objects.create(content=self.FORWARD)
+        exact = ContextEntry.objects.create(content=self.FORWARD.upper())
+        near = ContextEntry.objects.create(content="Fwd: " + self.FORWARD)
+        other = ContextEntry.objects.create(content="Buy milk, eggs and bread on the way home from the gym")
+
+        other.content = "fwd " + self.FORWARD
+        other.save(update_fields=["content"])
+        other.refresh_from_db()
+        self.assertEqual((other.fingerprint, other.duplicate_of_id), (fingerprint(other.content), first.pk))
+
+        # the old canonical leaves its cluster, which passes to its oldest member
+        first.content = "Water the plants on the balcony every other morning before it gets hot outside"
+        first.save()
+        for entry in (first, exact, near, other):
+            entry.refresh_from_db()
+        self.assertEqual([first.duplicate_of_id, exact.duplicate_of_id, near.duplicate_of_id, other.duplicate_of_id],
+                         [None, None, exact.pk, exact.pk])
+        later = ContextEntry.objects.create(content="Water the plants on the balcony every other morning before it gets hot")
+        self.assertEqual(later.duplicate_of_id, first.pk)
+
+    def test_index_replays_writes_from_other_processes(self):
+        from API.changes import record
+        from API.dedup import fingerprint, get_signature_index, near_minhash
+
+        self.assertIsNone(get_signature_index().nearest(near_minhash(self.FORWARD)))
+        # another process: rows and log entries only, no signals or index calls here
+        first = ContextEntry.objects.bulk_create([ContextEntry(
+            content=self.FORWARD, fingerprint=fingerprint(self.FORWARD), minhash=near_minhash(self.FORWARD))])[0]
+        record("context", [first.pk])
+        near = ContextEntry.objects.create(content="Fwd: " + self.FORWARD + " thanks")
+        self.assertEqual(near.duplicate_of_id, first.pk)
+
+        ContextEntry.objects.filter(pk=first.pk).update(minhash=None)
+        record("context", [first.pk])
+        self.assertIsNone(get_signature_index().nearest(near_minhash(self.FORWARD)))
+
+    def test_ingest_drops_exact_duplicates(self):
+        from API.ingest import ingest
+
+        ContextEntry.objects.create(content=self.FORWARD)
+        rows = [{"content": self.FORWARD}, {"content": "New note"}, {"content": "new note."},
+                {"content": "Fwd: " + self.FORWARD}]
+        summary = ingest(rows, batch_size=10)
+        self.assertEqual((summary["created"], summary["duplicates"]), (2, 2))
+        self.assertEqual(ContextEntry.objects.filter(duplicate_of__isnull=False).count(), 1)
+
+
+class CategoryUsageTests(TestCase):
+    def counts(self):
+        return dict(Category.objects.values_list("name", "usage_count"))
+
+    def test_counts_follow_task_writes_and_reconcile(self):
+        from API.category_counts import reconcile
+
+        work, home = Category.objects.create(name="Work"), Category.objects.create(name="Home")
+        a = Task.objects.create(title="a", category=work)
+        b = Task.objects.create(title="b", category=work)
+        Task.objects.create(title="c")
+        b.category = home
+        b.save()
+        a.title = "renamed"
+        a.save(update_fields=["title"])
+        self.assertEqual(self.counts(), {"Work": 1, "Home": 1})
+        a.delete()
+        self.assertEqual(self.counts(), {"Work": 0, "Home": 1})
+
+        Task.objects.bulk_create([Task(title=f"bulk {i}", category=work) for i in range(3)])  # no signals
+        self.assertEqual(reconcile(), {"categories": 2, "corrected": 1, "dry_run": False})
+        self.assertEqual(self.counts(), {"Work": 3, "Home": 1})
+        names = [c["name"] for c in self.client.get("/api/categories/?ordering=-usage_count").json()]
+        self.assertEqual(names, ["Work", "Home"])
+
+    def test_concurrent_moves_count_once(self):
+        work, home = Category.objects.create(name="Work"), Category.objects.create(name="Home")
+        task = Task.objects.create(title="a", category=work)
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)  # both read Work
+        first.category = second.category = home
+        first.save()
+        second.save()
+        self.assertEqual(self.counts(), {"Work": 0, "Home": 1})
+        Task.objects.get(pk=task.pk).delete()
+        self.assertEqual(self.counts(), {"Work": 0, "Home": 0})
+        second.save()  # the row is gone, so this save inserts it again
+        self.assertEqual(self.counts(), {"Work": 0, "Home": 1})
+
+    def test_usage_count_is_read_only(self):
+        resp = self.client.post("/api/categories/", {"name": "Errands", "usage_count": 99}, content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["usage_count"], 0)
+
+
+class ConditionalGetTests(TestCase):
+    def test_etag_round_trip(self):
+        cat = Category.objects.create(name="Work")
+        task = Task.objects.create(title="a", category=cat)
+        first = self.client.get("/api/tasks/")
+        etag = first["ETag"]
+        self.assertTrue(first.has_header("Last-Modified"))
+        self.assertEqual(self.client.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get("/api/tasks/?status=pending")["ETag"], etag)
+        detail = self.client.get(f"/api/tasks/{task.pk}/")
+        self.assertEqual(self.client.get(f"/api/tasks/{task.pk}/", HTTP_IF_NONE_MATCH=detail["ETag"]).status_code, 304)
+
+        cat.name = "Office"  # tasks embed their category
+        cat.save()
+        again = self.client.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()[0]["category"]["name"], "Office")
+
+    def test_bulk_writes_invalidate(self):
+        from API.ingest import ingest
+
+        etag = self.client.get("/api/context/")["ETag"]
+        ingest([{"content": "imported"}])
+        self.assertEqual(self.client.get("/api/context/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_compressed_response_keeps_validators(self):
+        ContextEntry.objects.bulk_create([ContextEntry(content=f"context {i} " * 5) for i in range(20)])
+        resp = self.client.get("/api/context/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertTrue(resp["ETag"].startswith("W/"))
+        cached = self.client.get("/api/context/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+
+class ChangeFeedTests(TestCase):
+    def test_delta_since_cursor(self):
+        from API.changes import prune
+
+        Task.objects.create(title="before")
+        cursor = self.client.get("/api/changes/").json()["cursor"]
+        work = Category.objects.create(name="Work")
+        task = Task.objects.create(title="new", category=work)
+        task.title = "renamed"
+        task.save()
+        note = ContextEntry.objects.create(content="gone soon")
+        note_id = note.pk
+        note.delete()
+
+        page = self.client.get(f"/api/changes/?since={cursor}").json()
+        seen = {(c["table"], c["id"]): c for c in page["changes"]}
+        self.assertEqual(set(seen), {("category", work.pk), ("task", task.pk), ("context", note_id)})
+        self.assertEqual(seen[("task", task.pk)]["data"]["title"], "renamed")
+        self.assertEqual((seen[("context", note_id)]["op"], seen[("context", note_id)]["data"]), ("delete", None))
+        self.assertFalse(page["more"])
+        self.assertEqual(self.client.get(f"/api/changes/?since={page['cursor']}").json()["changes"], [])
+
+        tasks_only = self.client.get(f"/api/changes/?since={cursor}&tables=task&limit=1").json()
+        self.assertEqual(([c["table"] for c in tasks_only["changes"]], tasks_only["more"]), (["task"], True))
+        for bad in ("0", "-5", "ten"):
+            self.assertEqual(self.client.get(f"/api/changes/?since={cursor}&limit={bad}").status_code, 400)
+
+        prune(days=-1)
+        self.assertEqual(self.client.get(f"/api/changes/?since={cursor}").status_code, 410)
+        self.assertEqual(self.client.get("/api/changes/?since=0").status_code, 410)
+
+    async def test_stream_pushes_changes(self):
+        from asgiref.sync import sync_to_async
+
+        cursor = (await self.async_client.get("/api/changes/")).json()["cursor"]
+        await sync_to_async(Task.objects.create)(title="streamed")
+        resp = await self.async_client.get(f"/api/changes/stream/?since={cursor}")
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        events = aiter(resp.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b"retry:"))
+        event = (await anext(events)).decode()
+        self.assertIn("event: changes", event)
+        self.assertIn('"streamed"', event)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        from API import metrics
+        metrics.reset()
+
+    def test_request_metrics_and_export(self):
+        from django.test import override_settings
+
+        Task.objects.create(title="measured")
+        with override_settings(METRICS={"SERVER_TIMING": True}):
+            resp = self.client.get("/api/tasks/")
+        self.assertRegex(resp["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=')
+
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('smart_todo_request_seconds_count{endpoint="tasks-list",method="GET",status="200"} 1', body)
+        self.assertIn('smart_todo_request_db_queries_bucket{endpoint="tasks-list",le="+Inf"} 1', body)
+        self.assertIn('smart_todo_request_serialize_seconds_count{endpoint="tasks-list"} 1', body)
+
+    def test_suggestion_sources_and_model_calls(self):
+        from django.test import override_settings
+        from API import metrics
+        from API.ai_utils import get_ai_suggestions_with_gemini
+
+        with override_settings(AI_FAKE_MODEL={"latency": 0}):
+            get_ai_suggestions_with_gemini("metrics title", "", [])
+            get_ai_suggestions_with_gemini("metrics title", "", [])
+        self.assertEqual(metrics.AI_SUGGESTIONS.value(source="model"), 1)
+        self.assertEqual(metrics.AI_SUGGESTIONS.value(source="cache"), 1)
+        self.assertEqual(metrics.SUGGESTION_CACHE.value(result="miss"), 1)
+        self.assertEqual(metrics.MODEL_CALL_SECONDS.count(purpose="suggest", outcome="ok"), 1)
+        self.assertGreater(metrics.MODEL_TOKENS.value(purpose="suggest", direction="prompt"), 0)
+
+    def test_batch_model_time_reaches_the_request(self):
+        from django.test import override_settings
+
+        with override_settings(METRICS={"SERVER_TIMING": True}, AI_FAKE_MODEL={"latency": 0.01},
+                               AI_SUGGEST_BATCH={"CHUNK_SIZE": 1}):
+            resp = self.client.post("/api/ai/suggest/batch/", {"texts": ["timed batch one", "timed batch two"]},
+                                    content_type="application/json")
+        self.assertEqual([r["source"] for r in resp.json()["results"]], ["model", "model"])
+        self.assertRegex(resp["Server-Timing"], r"(^|, )model;dur=[\d.]+")
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    def connect(self, path, alias, **options):
+        from django.conf import settings
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        conf = settings.DATABASES["default"]
+        if conf["ENGINE"] != "django.db.backends.sqlite3" or "init_command" not in conf.get("OPTIONS", {}):
+            self.skipTest("SQLite tuning is off (DB_ENGINE / SQLITE_TUNED)")
+        # the test database lives in memory, where journal_mode cannot be WAL
+        wrapper = DatabaseWrapper({**conf, "NAME": path, "OPTIONS": {**conf["OPTIONS"], **options}}, alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_connections_use_wal_and_immediate_transactions(self):
+        import tempfile
+
+        from django.db import OperationalError
+
+        path = tempfile.mkdtemp() + "/tuning.sqlite3"
+        first, second = self.connect(path, "first"), self.connect(path, "second", timeout=0.05)
+        with first.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            cursor.execute("CREATE TABLE t (n integer)")
+        self.assertEqual(first.transaction_mode, "IMMEDIATE")
+
+        # what atomic() runs on entry: the write lock is taken before any write
+        first._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(OperationalError, "locked"), second.cursor() as other:
+            other.execute("INSERT INTO t VALUES (1)")
+        first.connection.rollback()
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_no_heavy_imports_at_startup(self):
+        from API.startup import import_profile
+
+        profile = import_profile()
+        self.assertEqual(profile["heavy"], [], "load these on first use (see API/startup.py)")
+        self.assertIn("API.Gemini", [name for name, _, _ in profile["modules"]])
+
+    def test_missing_api_key_is_reported_before_loading_the_sdk(self):
+        from API.gemini_client import get_model
+
+        with self.settings(GEMINI={"API_KEY": None}, AI_FAKE_MODEL=None):
+            with self.assertRaisesMessage(RuntimeError, "No GEMINI_API_KEY"):
+                get_model()
+
+
+def _fake_analyzer(text, top=5):
+    """Stand-in for textblob_analyzer: every word is a noun. Picklable for the pool test."""
+    from API.nlp import rank_keywords
+    return {"sentiment": "positive" if "great" in text else "neutral",
+            "keywords": rank_keywords([(w, "NN") for w in text.split()], top)}
+
+
+class NLPTests(SimpleTestCase):
+    def test_keywords_ranked_by_frequency_then_position(self):
+        from API.nlp import rank_keywords
+
+        tags = [("Review", "VB"), ("the", "DT"), ("budget", "NN"), ("and", "CC"), ("send", "VB"),
+                ("budget", "NN"), ("notes", "NNS"), ("quickly", "RB"), ("review", "VB")]
+        self.assertEqual(rank_keywords(tags, top=3), ["review", "budget", "send"])
+
+    def test_batches_are_deduplicated_and_memoized(self):
+        from API.nlp import NLPService
+
+        calls = []
+
+        def analyzer(text, top):
+            calls.append(text)
+            return _fake_analyzer(text, top)
+
+        nlp = NLPService(analyzer=analyzer, cache_size=2)
+        first = nlp.analyze(["great plan", "b b a", "great plan"])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(first[1]["keywords"], ["b", "a"])
+        nlp.analyze(["b b a"])
+        self.assertEqual(calls, ["great plan", "b b a"])
+        nlp.analyze(["c"])  # evicts "great plan", the least recently used
+        nlp.analyze(["great plan"])
+        self.assertEqual(calls[-1], "great plan")
+        self.assertEqual(nlp.stats()["entries"], 2)
+
+    def test_process_pool_matches_in_process(self):
+        from API.nlp import NLPService
+
+        texts = [f"item {i} great item" for i in range(8)]
+        pooled = NLPService(analyzer=_fake_analyzer, workers=2, pool_min_batch=4).analyze(texts)
+        self.assertEqual(pooled, NLPService(analyzer=_fake_analyzer).analyze(texts))
+
+
+class PromptBudgetTests(SimpleTestCase):
+    def test_quoted_reply_chains_and_repeats_are_dropped(self):
+        from API.prompts import strip_quoted
+
+        email = (
+            "Hi team,\nPlease send the budget review by Friday.\n\n"
+            "On Mon, 5 Aug 2024 at 10:02, Ravi <ravi@example.com> wrote:\n> Who owns the budget?\n> Thanks"
+        )
+        self.assertEqual(strip_quoted(email), "Hi team,\nPlease send the budget review by Friday.")
+        chat = (
+            "[05/08/2024, 10:01:02] Ravi: Submit the report by Friday\n"
+            "[05/08/2024, 10:03:00] Asha: Submit the report by Friday\n"
+            "[05/08/2024, 10:04:00] Asha: <Media omitted>\n"
+            "[05/08/2024, 10:05:00] Ravi: Book the room"
+        )
+        self.assertEqual(strip_quoted(chat).splitlines(), [chat.splitlines()[0], chat.splitlines()[3]])
+
+    def test_compact_keeps_the_ask_and_the_deadline_within_budget(self):
+        from API.prompts import compact, estimate_tokens
+
+        filler = "Some background on the vendor relationship follows. " * 100
+        text = f"Pay the vendor invoice. {filler} The invoice is due Friday."
+        summary = compact(text, 60)
+        self.assertLessEqual(estimate_tokens(summary), 60)
+        self.assertTrue(summary.startswith("Pay the vendor invoice."))
+        self.assertTrue(summary.endswith("The invoice is due Friday."))
+        self.assertEqual(compact(summary, 60), summary)
+        self.assertEqual(compact("short", 60), "short")
+
+    def test_prompts_share_a_static_prefix_and_respect_the_budget(self):
+        from API.Gemini import build_prompt
+        from API.batch_suggest import _build_batch_prompt
+        from API.prompts import estimate_tokens
+
+        with self.settings(PROMPT_BUDGET={"MAX_PROMPT_TOKENS": 800, "MAX_CONTEXT_TOKENS": 600}):
+            long_prompt = build_prompt("Call the bank. " + "Lots of detail here. " * 2000, "email")
+            short_prompt = build_prompt("Call the bank", "note")
+            self.assertLessEqual(estimate_tokens(long_prompt), 800)
+            prefix = long_prompt.split("Current datetime")[0]
+            self.assertTrue(short_prompt.startswith(prefix))
+            batch = _build_batch_prompt(["word " * 5000] * 10)
+            self.assertLessEqual(estimate_tokens(batch), 800)
+            self.assertEqual(sum(line.startswith("CONTEXT ") for line in batch.splitlines()), 10)
+
+
+class BatchSuggestTests(TestCase):
+    def suggest(self, body, **settings):
+        with self.settings(**settings):
+            resp = self.client.post("/api/ai/suggest/batch/", body, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()["results"]
+
+    def test_results_follow_input_order_per_item(self):
+        analysed = ContextEntry.objects.create(content="Renew passport", processed_insights={"title": "Renew passport"})
+        plain = ContextEntry.objects.create(content="Batch test: book the dentist appointment")
+        results = self.suggest({"context_ids": [plain.id, 10**9, analysed.id],
+                                "texts": ["Batch test: water the plants", ""]},
+                               AI_FAKE_MODEL={"latency": 0})
+        self.assertEqual([r["index"] for r in results], list(range(5)))
+        self.assertEqual([r["ok"] for r in results], [True, False, True, True, False])
+        self.assertEqual([r.get("source") for r in results], ["model", None, "insights", "model", None])
+        self.assertEqual([r.get("error") for r in results], [None, "context not found", None, None, "empty context"])
+        self.assertEqual(results[2]["context_id"], analysed.id)
+        self.assertEqual(results[0]["suggestion"]["suggested_title"], "Fake suggestion")
+
+        again = self.suggest({"texts": ["Batch test: water the plants"]}, AI_FAKE_MODEL={"latency": 0})
+        self.assertEqual(again[0]["source"], "cache")
+
+    def test_batch_answers_are_cached_apart_from_single_suggestions(self):
+        from API.ai_utils import get_ai_suggestions_with_gemini
+
+        text = "Batch cache test: renew the library card"
+        self.assertEqual(self.suggest({"texts": [text]}, AI_FAKE_MODEL={"latency": 0})[0]["source"], "model")
+        with self.settings(AI_FAKE_MODEL={"latency": 0, "fail_rate": 1.0}, AI_CIRCUIT_BREAKER={"MAX_ATTEMPTS": 1}):
+            single = get_ai_suggestions_with_gemini("", "", [ContextEntry(content=text)])
+        self.assertNotEqual(single["suggested_title"], "Fake suggestion")  # not served from the batch's entry
+
+    def test_failed_chunk_falls_back_per_item(self):
+        results = self.suggest({"texts": ["Batch fallback: urgent invoice overdue", "Batch fallback: plan picnic"]},
+                               AI_FAKE_MODEL={"latency": 0, "fail_rate": 1.0},
+                               AI_CIRCUIT_BREAKER={"MAX_ATTEMPTS": 1})
+        self.assertEqual([r["source"] for r in results], ["heuristic", "heuristic"])
+        self.assertGreater(results[0]["suggestion"]["priority_score"], results[1]["suggestion"]["priority_score"])
+
+    def test_oversized_or_malformed_batches_are_rejected(self):
+        with self.settings(AI_SUGGEST_BATCH={"MAX_ITEMS": 2}):
+            resp = self.client.post("/api/ai/suggest/batch/", {"texts": ["a", "b", "c"]}, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        for body in ({"texts": "a"}, [1, 2], "text", {"context_ids": [1, "x"]}, {"context_ids": [True]}):
+            resp = self.client.post("/api/ai/suggest/batch/", body, content_type="application/json")
+            self.assertEqual(resp.status_code, 400, body)
+
+
+class AsyncSuggestTests(TestCase):
+    async def suggest(self, body, **settings):
+        with self.settings(**settings):
+            return await self.async_client.post("/api/ai/suggest/async/", body, content_type="application/json")
+
+    async def test_model_answer_within_the_deadline(self):
+        resp = await self.suggest({"description": "async model answer test"}, AI_FAKE_MODEL={"latency": 0.01})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["suggested_title"], "Fake suggestion")
+
+    async def test_deadline_and_errors_fall_back_to_the_heuristic(self):
+        from API.ai_utils import fallback_stats
+
+        before = fallback_stats()
+        resp = await self.suggest({"description": "Slow model. Answer by heuristic"},
+                                  AI_FAKE_MODEL={"latency": 1.0}, AI_SUGGEST_TIMEOUT=0.05)
+        self.assertEqual(resp.json()["enhanced_description"], "Slow model. Answer by heuristic")
+        resp = await self.suggest({"description": "Failing model. Answer by heuristic"},
+                                  AI_FAKE_MODEL={"latency": 0, "fail_rate": 1.0},
+                                  AI_CIRCUIT_BREAKER={"MAX_ATTEMPTS": 1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.json()["suggested_title"], "Fake suggestion")
+        after = fallback_stats()
+        self.assertEqual(after.get("timeout", 0) - before.get("timeout", 0), 1)
+        self.assertEqual(after.get("error", 0) - before.get("error", 0), 1)
+
+    async def test_malformed_bodies_are_rejected(self):
+        for body in ([1, 2], "text", {"context_ids": "1,2"}, {"context_ids": [1, "2"]},
+                     {"context_ids": [True]}, {"title": 5}):
+            resp = await self.suggest(body, AI_FAKE_MODEL={"latency": 0})
+            self.assertEqual(resp.status_code, 400, body)
+
+
+class StreamingSuggestionTests(TestCase):
+    def test_fields_complete_in_order_however_the_text_is_split(self):
+        from API.json_stream import JSONObjectStream
+
+        reply = '```json\n{"suggested_title": "Pay \\"rent\\"", "priority_score": 8, "deadline": {"date": "x"}}\n```'
+        for size in (1, 5, len(reply)):
+            parser = JSONObjectStream()
+            fields = [f for n in range(0, len(reply), size) for f in parser.feed(reply[n:n + size])]
+            self.assertEqual(fields, [("suggested_title", 'Pay "rent"'), ("priority_score", 8),
+                                      ("deadline", {"date": "x"})])
+            self.assertTrue(parser.done)
+        parser = JSONObjectStream()
+        self.assertEqual(parser.feed('{"priority_score": 7'), [])  # could still become 75
+        self.assertEqual(parser.feed(", "), [("priority_score", 7)])
+
+    async def test_stream_sends_fields_then_done(self):
+        def parse(body):
+            events = [block.split("\n", 1) for block in body.decode().strip().split("\n\n")]
+            return [(head[len("event: "):], json.loads(data[len("data: "):])) for head, data in events]
+
+        with self.settings(AI_FAKE_MODEL={"latency": 0.05}):
+            resp = await self.async_client.post(
+                "/api/ai/suggest/stream/", {"description": "streamed suggestion test"},
+                content_type="application/json")
+            self.assertEqual(resp["Content-Type"], "text/event-stream")
+            events = parse(b"".join([chunk async for chunk in resp.streaming_content]))
+            self.assertEqual(events[0], ("field", {"name": "suggested_title", "value": "Fake suggestion"}))
+            self.assertEqual(events[1], ("field", {"name": "priority_score", "value": 5.0}))
+            self.assertEqual(events[-1][0], "done")
+            self.assertEqual(events[-1][1]["source"], "model")
+
+            resp = await self.async_client.get("/api/ai/suggest/stream/?description=streamed+suggestion+test")
+            events = parse(b"".join([chunk async for chunk in resp.streaming_content]))
+            self.assertEqual(events[-1][1]["source"], "cache")
+            self.assertEqual(len(events), 6)
+
+    async def test_malformed_post_bodies_are_rejected(self):
+        for body in ([1, 2], {"context_ids": "1,2"}, {"context_ids": [1, None]}):
+            resp = await self.async_client.post("/api/ai/suggest/stream/", body, content_type="application/json")
+            self.assertEqual(resp.status_code, 400, body)
+
+
+class ReplySchemaTests(SimpleTestCase):
+    def test_common_defects_are_repaired_in_place(self):
+        from API.schemas import SUGGESTION
+
+        clean, problems = SUGGESTION.validate({
+            "suggested_title": " Pay rent ", "priority_score": "12/10",
+            "suggested_deadline": "by 2025-08-16 14:00", "category": 7, "extra": "dropped",
+        })
+        self.assertEqual(clean, {"suggested_title": "Pay rent", "priority_score": 10.0,
+                                 "suggested_deadline": "2025-08-16", "category": "7", "enhanced_description": ""})
+        self.assertIn(("$.enhanced_description", "missing"), problems)
+        self.assertEqual(SUGGESTION.validate({"unrelated": 1}), (None, [("$", "invalid")]))
+
+    def test_analysis_replies_are_normalized(self):
+        from API.Gemini import normalize_result
+
+        out = normalize_result({
+            "title": "Book venue", "description": "For the offsite", "status": "On Progress",
+            "priority_score": "7.6", "sentiment_analysis": "Positive", "keywords": "venue, offsite, venue",
+            "deadline": None, "time_required": -2, "dependencies": ["call", "", "call"],
+        }, nlp=False)
+        self.assertEqual((out["status"], out["priority_score"], out["sentiment_analysis"]), ("on-progress", 8, "positive"))
+        self.assertEqual(out["keywords"], ["venue", "offsite"])
+        self.assertEqual(out["deadline"], {"date": "", "text": ""})
+        self.assertEqual((out["time_required"], out["dependencies"]), (0, ["call"]))
+
+    def test_fenced_truncated_and_array_replies(self):
+        from API import metrics
+        from API.schemas import SUGGESTION, SUGGESTION_BATCH, parse_items, parse_json, parse_reply
+
+        metrics.reset()
+        self.assertEqual(parse_json('```json\n{"a": "two\nlines", "b": [1],}\n```'), ({"a": "two\nlines", "b": [1]}, True))
+        self.assertEqual(parse_reply('{"suggested_title": "Call bank", "priority_score": 6, "categ', SUGGESTION)
+                         ["suggested_title"], "Call bank")
+        items = parse_items('Here: [{"id": 0, "suggested_title": "A"}, {"id": 1, "suggested_title": "B",}, {"id": 2',
+                            SUGGESTION_BATCH)
+        self.assertEqual([(d["id"], d["suggested_title"]) for d in items], [(0, "A"), (1, "B")])  # the cut-off item is dropped
+        self.assertIsNone(parse_reply("no json at all", SUGGESTION))
+        self.assertEqual(metrics.MODEL_OUTPUT.value(kind="suggestion", result="invalid"), 1)
@@ -0,0 +1,163 @@
+# API/batch_suggest.py
+"""
+Batch task suggestions for bulk-imported contexts.
+
+Several contexts are packed into one prompt (one model request per chunk),
+chunks run concurrently on a small thread pool, and results come back in
+input order. Cached answers are served without touching the model, and a
+chunk whose call fails falls back to the local heuristic item by item.
+
+    from API.batch_suggest import suggest_batch
+    results = suggest_batch(["Fix API bug by Friday", ctx_entry, ...])
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import gemini_client
+from .ai_utils import (
+    _heuristic_ai,
+    _suggestion_from_data,
+    _suggestion_from_insights,
+    record_fallback,
+)
+from .circuit_breaker import CircuitOpenError
+from .metrics import AI_SUGGESTIONS
+from .prompts import estimate_tokens, fit_context, get_config as get_prompt_config
+from .schemas import SUGGESTION_BATCH, output_config, parse_items
+from .suggestion_cache import get_suggestion_cache, make_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "CHUNK_SIZE": 10,    # contexts per model request
+    "CONCURRENCY": 4,    # model requests in flight
+    "MAX_ITEMS": 500,    # per API call
+}
+
+
+def get_batch_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "AI_SUGGEST_BATCH", {})}
+
+
+# Bump whenever the prompt below changes so cached answers are not reused.
+# Prefixed so batch answers never share keys with single suggestions
+# (ai_utils.PROMPT_VERSION) for the same text.
+BATCH_PROMPT_VERSION = "batch-1"
+
+BATCH_PROMPT = """
+You are a concise task assistant. Suggest ONE task for EACH numbered context below.
+
+Return ONLY a valid JSON array with one object per context, each with:
+- id (the context number)
+- suggested_title (short, <= 8 words)
+- priority_score (0-10, number)
+- suggested_deadline (YYYY-MM-DD)
+- category (short label)
+- enhanced_description (<= 200 chars)
+
+"""
+
+
+def _build_batch_prompt(texts):
+    # Each context gets an equal share of the prompt budget, one line each
+    conf = get_prompt_config()
+    share = (conf["MAX_PROMPT_TOKENS"] - estimate_tokens(BATCH_PROMPT)) // max(1, len(texts)) - 5  # "CONTEXT i: "
+    budget = min(conf["BATCH_CONTEXT_TOKENS"], share)
+    numbered = "\n".join(
+        f"CONTEXT {i}: {' '.join(fit_context(t, max_tokens=budget).split())}" for i, t in enumerate(texts)
+    )
+    return f"{BATCH_PROMPT}{numbered}\n"
+
+
+def _parse_batch_reply(text):
+    """Return {id: data} from the model's JSON array reply, checked against the batch schema."""
+    by_id = {d["id"]: d for d in parse_items(text, SUGGESTION_BATCH) if d["id"] is not None}
+    if not by_id:
+        raise ValueError("model reply holds no suggestions")
+    return by_id
+
+
+def _run_chunk(texts):
+    """Ask the model about one chunk; returns (source, suggestion) per text."""
+    try:
+        resp = gemini_client.generate_content(_build_batch_prompt(texts), **output_config(SUGGESTION_BATCH))
+        by_id = _parse_batch_reply(resp.text)
+    except Exception as e:
+        record_fallback(e)
+        if not isinstance(e, CircuitOpenError):
+            logger.warning("Gemini fallback for a batch of %d: %s", len(texts), e)
+        by_id = {}
+
+    out = []
+    for i, text in enumerate(texts):
+        data = by_id.get(i)
+        if data is not None:
+            try:
+                out.append(("model", _suggestion_from_data(data, "", "", text)))
+                continue
+            except (TypeError, ValueError):
+                pass
+        out.append(("heuristic", _heuristic_ai("", "", [text])))
+    return out
+
+
+def _entry_text(entry):
+    if entry is None:
+        return None
+    return (getattr(entry, "content", entry) or "").strip()
+
+
+def suggest_batch(entries, chunk_size=None, concurrency=None):
+    """
+    Suggest tasks for many contexts at once.
+
+    entries is a list of context texts or ContextEntry-like objects; a None
+    entry (e.g. an unknown id) yields a per-item error. Returns one dict per
+    entry, in input order, with "ok" plus either "suggestion" and "source"
+    (insights, cache, model or heuristic) or "error".
+    """
+    conf = get_batch_config()
+    chunk_size = max(1, chunk_size or conf["CHUNK_SIZE"])
+    concurrency = max(1, concurrency or conf["CONCURRENCY"])
+    cache = get_suggestion_cache()
+    model_name = gemini_client.model_name()
+
+    results = [None] * len(entries)
+    pending = []  # (index, text, cache_key)
+    for i, entry in enumerate(entries):
+        text = _entry_text(entry)
+        if not text:
+            results[i] = {"ok": False, "error": "context not found" if entry is None else "empty context"}
+            continue
+        precomputed = _suggestion_from_insights("", "", [entry])
+        if precomputed is not None:
+            results[i] = {"ok": True, "source": "insights", "suggestion": precomputed}
+            continue
+        key = make_key("", "", text, model_name, BATCH_PROMPT_VERSION)
+        cached = cache.get(key)
+        if cached is not None:
+            results[i] = {"ok": True, "source": "cache", "suggestion": dict(cached)}
+        else:
+            pending.append((i, text, key))
+
+    chunks = [pending[n:n + chunk_size] for n in range(0, len(pending), chunk_size)]
+    if chunks:
+        # one copy of the caller's context per chunk, so the request's metrics
+        # scope (API/metrics.py) sees the model time spent in the workers
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as pool:
+            answers = pool.map(lambda ctx, chunk: ctx.run(_run_chunk, [text for _, text, _ in chunk]),
+                               contexts, chunks)
+            for chunk, answer in zip(chunks, answers):
+                for (i, _, key), (source, suggestion) in zip(chunk, answer):
+                    if source == "model":
+                        cache.set(key, suggestion)
+                    results[i] = {"ok": True, "source": source, "suggestion": dict(suggestion)}
+
+    for result in results:
+        if result["ok"]:
+            AI_SUGGESTIONS.inc(source=result["source"])
+    return results
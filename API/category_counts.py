@@ -0,0 +1,73 @@
+# API/category_counts.py
+"""
+Category.usage_count upkeep.
+
+Task signals (AI_todo/signals.py) move the count with single UPDATE ...
+SET usage_count = usage_count +/- 1 statements, so concurrent writers never
+lose an increment and nothing counts tasks on the read path. Writes that
+skip model signals (bulk_create, QuerySet.update) are caught up by
+`python manage.py reconcile_category_counts`.
+
+When a stored task changes category, `swap_category` moves it with a
+compare-and-set UPDATE before the save, so of two writers that read the
+same old category only the one whose swap lands moves the counts.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from AI_todo.models import Category, Task
+
+from .changes import record
+
+
+def move(old_category_id, new_category_id):
+    """Record one task leaving `old_category_id` and joining `new_category_id` (either may be None)."""
+    if old_category_id == new_category_id:
+        return
+    if old_category_id:
+        Category.objects.filter(pk=old_category_id).update(usage_count=Greatest(F("usage_count") - 1, Value(0)))
+    if new_category_id:
+        Category.objects.filter(pk=new_category_id).update(usage_count=F("usage_count") + 1)
+    record("category", [pk for pk in (old_category_id, new_category_id) if pk])
+
+
+def swap_category(task):
+    """
+    Point the stored row of `task` (about to be saved) at task.category_id
+    and move the counts, in one transaction. Returns False when the row
+    does not exist yet (the save inserts it, and post_save counts it).
+    """
+    new = task.category_id
+    with transaction.atomic():
+        while True:
+            rows = list(Task.objects.filter(pk=task.pk).values_list("category_id", flat=True))
+            if not rows:
+                return False
+            old = rows[0]
+            if old == new:
+                return True
+            # Only counts when no other writer moved the row since the read
+            if Task.objects.filter(pk=task.pk, category_id=old).update(category_id=new):
+                move(old, new)
+                return True
+
+
+def _task_counts():
+    per_category = (Task.objects.filter(category=OuterRef("pk")).order_by()
+                    .values("category").annotate(n=Count("id")).values("n"))
+    return Coalesce(Subquery(per_category), Value(0))
+
+
+def reconcile(dry_run=False):
+    """
+    Recompute every usage_count from the task table with one aggregate
+    UPDATE. Returns {"categories", "corrected"}; corrected counts the rows
+    whose stored value had drifted.
+    """
+    drifted = list(Category.objects.annotate(actual=_task_counts())
+                   .exclude(usage_count=F("actual")).values_list("id", flat=True))
+    if drifted and not dry_run:
+        Category.objects.update(usage_count=_task_counts())
+        record("category", drifted)
+    return {"categories": Category.objects.count(), "corrected": len(drifted), "dry_run": dry_run}
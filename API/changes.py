@@ -0,0 +1,124 @@
+# API/changes.py
+"""
+Delta sync: a change log of every write to the task, context and category
+tables, read back by cursor.
+
+Model signals (AI_todo/signals.py) and the bulk paths that bypass them call
+`record`, which appends ChangeLog rows and bumps the table's ETag version
+(API/http_cache.py). `GET /api/changes/?since=<cursor>` returns the rows
+written after the cursor, collapsed to one entry per object: an upsert with
+the object's current serialized state, or a tombstone. A client syncs once
+with the full lists (taking the cursor from `GET /api/changes/` first), then
+only ever asks for changes. `GET /api/changes/stream/` pushes the same pages
+as Server-Sent Events; serve it from the ASGI app so an open stream does
+not tie up a worker thread.
+
+Cursors are ChangeLog ids. On SQLite writers are serialized, so ids become
+visible in order; on a database with concurrent writers a transaction that
+commits late can land behind a cursor a client has already passed.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from AI_todo.models import Category, ChangeLog, ContextEntry, Task
+
+from .http_cache import bump
+from .serializers import CategorySerializer, ContextEntrySerializer, TaskSerializer
+
+DEFAULT_CONFIG = {
+    "PAGE_SIZE": 500,         # log rows per /api/changes/ page
+    "MAX_PAGE_SIZE": 2000,
+    "RETENTION_DAYS": 30,     # manage.py prune_changes drops older rows
+    "STREAM_POLL": 1.0,       # seconds between log polls of an SSE stream
+    "STREAM_HEARTBEAT": 15.0, # comment line to keep proxies from closing it
+    "STREAM_MAX_SECONDS": 300,  # then the client reconnects with Last-Event-ID
+}
+
+TABLES = {
+    "task": (Task.objects.select_related("category"), TaskSerializer),
+    "context": (ContextEntry.objects.all(), ContextEntrySerializer),
+    "category": (Category.objects.all(), CategorySerializer),
+}
+WRITE_BATCH = 900
+
+
+class CursorExpired(Exception):
+    """The log rows after this cursor were pruned; the client must resync."""
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "CHANGE_FEED", {})}
+
+
+def record(table, ids, op="upsert"):
+    """Log a write of `ids` in `table` and invalidate its ETags."""
+    rows = [ChangeLog(table=table, object_id=pk, op=op) for pk in ids]
+    if not rows:
+        return
+    ChangeLog.objects.bulk_create(rows, batch_size=WRITE_BATCH)
+    bump(table)
+
+
+def head():
+    """The newest cursor; a client starting a full sync begins here."""
+    return ChangeLog.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _check_cursor(since):
+    oldest = ChangeLog.objects.aggregate(n=Min("id"))["n"]
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired(since)
+
+
+def changes_since(since, limit=None, tables=None):
+    """
+    {"cursor", "more", "changes"} for log rows after `since`. Each object
+    appears once, in the order of its last write: {"table", "id", "op",
+    "data"}, with data None for tombstones. Raises CursorExpired when the
+    rows after `since` are gone.
+    """
+    conf = get_config()
+    limit = min(max(1, int(limit or conf["PAGE_SIZE"])), conf["MAX_PAGE_SIZE"])
+    _check_cursor(since)
+    log = ChangeLog.objects.filter(id__gt=since).order_by("id")
+    if tables:
+        log = log.filter(table__in=tables)
+    rows = list(log.values_list("id", "table", "object_id", "op")[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for _, table, object_id, op in rows:
+        latest.pop((table, object_id), None)  # re-insert: order by last write
+        latest[(table, object_id)] = op
+    wanted = {}
+    for (table, object_id), op in latest.items():
+        if op == "upsert" and table in TABLES:
+            wanted.setdefault(table, []).append(object_id)
+    current = {}
+    for table, ids in wanted.items():
+        queryset, serializer = TABLES[table]
+        for n in range(0, len(ids), WRITE_BATCH):
+            objs = list(queryset.filter(pk__in=ids[n:n + WRITE_BATCH]))
+            current.update(((table, obj.pk), data) for obj, data in zip(objs, serializer(objs, many=True).data))
+
+    changes = []
+    for (table, object_id), op in latest.items():
+        data = current.get((table, object_id)) if op == "upsert" else None
+        # an upsert whose row is gone now is reported as the delete that followed
+        changes.append({"table": table, "id": object_id, "op": op if data is not None else "delete", "data": data})
+    return {"cursor": rows[-1][0] if rows else since, "more": more, "changes": changes}
+
+
+def prune(days=None):
+    """
+    Drop log rows older than `days` (RETENTION_DAYS). The newest row is
+    kept so expired cursors can still be told apart. Returns the count.
+    """
+    days = get_config()["RETENTION_DAYS"] if days is None else days
+    deleted, _ = (ChangeLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=days))
+                  .exclude(id=head()).delete())
+    return deleted
@@ -0,0 +1,121 @@
+# API/circuit_breaker.py
+"""
+Circuit breaker and retry helpers for the model call.
+
+After FAILURE_THRESHOLD consecutive failures (errors, timeouts, or answers
+slower than LATENCY_SLO) the breaker opens and model calls fail fast with
+CircuitOpenError, so callers go straight to _heuristic_ai. After
+RECOVERY_TIMEOUT seconds one probe call is let through (half-open); its
+success closes the breaker, its failure re-opens it.
+"""
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# google.api_core exception class names worth retrying; matched by name so
+# this module does not need the SDK installed.
+TRANSIENT_ERRORS = {
+    "ServiceUnavailable",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "GatewayTimeout",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the breaker is open."""
+
+
+def is_transient(exc):
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return type(exc).__name__ in TRANSIENT_ERRORS
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, latency_slo=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.latency_slo = latency_slo
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "slo_breaches": 0,
+            "short_circuited": 0,
+            "retries": 0,
+            "opened": 0,
+        }
+
+    def allow(self):
+        """Return True if a call may go to the model now."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                allowed = True
+            elif self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                allowed = True
+            else:
+                allowed = False
+            self.counters["calls" if allowed else "short_circuited"] += 1
+            return allowed
+
+    def record_success(self, latency):
+        if self.latency_slo is not None and latency > self.latency_slo:
+            with self._lock:
+                self.counters["slo_breaches"] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters["opened"] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def record_retry(self):
+        with self._lock:
+            self.counters["retries"] += 1
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                **self.counters,
+            }
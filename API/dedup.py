@@ -0,0 +1,471 @@
+# API/dedup.py
+"""
+Duplicate detection for context entries.
+
+Forwarded messages and re-sent email threads arrive many times. Each entry
+stores two fingerprints of its normalized text (case, punctuation and
+whitespace folded):
+
+* fingerprint - sha256 hex, indexed; equal means an exact duplicate.
+* minhash - 64-bit one-bit-per-permutation MinHash over the words; a small
+  Hamming distance means a near duplicate (a "Fwd:" prefix, a sign-off).
+
+Every duplicate points at the first entry of its cluster through
+ContextEntry.duplicate_of. Insights are computed for that canonical entry
+only and copied to the rest of the cluster (see API/insights.py).
+
+Near duplicates are looked up in an in-process signature index (a NumPy
+Hamming scan) and confirmed with an exact word-overlap check. Before each
+lookup the index replays the context writes logged since it last looked
+(API/changes.py), so entries added, edited or deleted by other processes
+are seen without a restart.
+"""
+import functools
+import hashlib
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+
+from AI_todo.models import ChangeLog, ContextEntry
+
+from .changes import head, record
+
+DEFAULT_CONFIG = {
+    "NEAR_DISTANCE": 5,   # max differing signature bits (~85% word overlap)
+    "MIN_WORDS": 8,       # shorter texts are only matched exactly
+    "SHINGLE": 1,         # words per feature; 1 is most stable on short messages
+    "MIN_JACCARD": 0.8,   # confirmed word overlap for a near duplicate
+}
+QUERY_BATCH = 900  # values per IN (...), below SQLite's bound-parameter limit
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "CONTEXT_DEDUP", {})}
+
+
+def normalize(text):
+    return " ".join(_WORD_RE.findall(unicodedata.normalize("NFKC", text or "").casefold()))
+
+
+def fingerprint(text):
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+def _feature_hashes(features):
+    import numpy as np
+
+    digests = b"".join(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest() for f in features)
+    return np.frombuffer(digests, dtype="<u8")
+
+
+@functools.lru_cache(maxsize=1)
+def _permutations():
+    import numpy as np
+
+    seeds = [hashlib.blake2b(f"minhash-{n}".encode(), digest_size=16).digest() for n in range(64)]
+    mult = np.array([int.from_bytes(d[:8], "little") | 1 for d in seeds], dtype=np.uint64)
+    add = np.array([int.from_bytes(d[8:], "little") for d in seeds], dtype=np.uint64)
+    return mult, add
+
+
+def minhash(text, shingle=None):
+    """
+    1-bit MinHash signature: bit n comes from the feature that is smallest
+    under the n-th hash permutation. Two texts with word-set Jaccard
+    similarity J differ in about 32 * (1 - J) bits. Returned signed so it
+    fits a BigIntegerField.
+    """
+    import numpy as np
+
+    shingle = shingle or get_config()["SHINGLE"]
+    words = normalize(text).split()
+    features = sorted({" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))})
+    hashes = _feature_hashes(features)
+    mult, add = _permutations()
+    winners = hashes[np.argmin(hashes[None, :] * mult[:, None] + add[:, None], axis=1)]
+    bits = ((winners >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little", signed=True)
+
+
+def _popcount(values):
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class SignatureIndex:
+    """
+    Canonical ids and their signatures in contiguous arrays. A lookup is
+    one vectorized XOR + popcount over every signature, which stays cheap
+    (~0.2 ms per 100k entries) however the signatures cluster, unlike LSH
+    buckets that degenerate on templated messages.
+    """
+
+    def __init__(self, max_distance, rows=(), cursor=0):
+        import numpy as np
+
+        self.max_distance = max_distance
+        self.cursor = cursor  # last ChangeLog id replayed into the index
+        rows = list(rows)
+        self.size = len(rows)
+        self.ids = np.array([r[0] for r in rows] + [0] * 16, dtype=np.int64)
+        self.sigs = np.array([r[1] & ((1 << 64) - 1) for r in rows] + [0] * 16, dtype=np.uint64)
+        self.hashes = {object_id: value for object_id, value in rows}
+        self.position = {object_id: n for n, (object_id, _) in enumerate(rows)}
+
+    def add(self, object_id, value):
+        import numpy as np
+
+        if object_id in self.position:
+            self.remove(object_id)
+        if self.size == len(self.ids):
+            self.ids = np.concatenate([self.ids, np.zeros_like(self.ids)])
+            self.sigs = np.concatenate([self.sigs, np.zeros_like(self.sigs)])
+        self.ids[self.size] = object_id
+        self.sigs[self.size] = value & ((1 << 64) - 1)
+        self.hashes[object_id] = value
+        self.position[object_id] = self.size
+        self.size += 1
+
+    def remove(self, object_id):
+        n = self.position.pop(object_id, None)
+        if n is not None:
+            self.hashes.pop(object_id)
+            self.ids[n] = -1
+
+    def nearest(self, value):
+        """Id of the closest indexed signature within max_distance bits, or None."""
+        import numpy as np
+
+        if not self.size:
+            return None
+        distance = _popcount(self.sigs[:self.size] ^ np.uint64(value & ((1 << 64) - 1))).astype(np.int16)
+        distance[self.ids[:self.size] < 0] = 65
+        best = int(np.argmin(distance))
+        return int(self.ids[best]) if distance[best] <= self.max_distance else None
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _load_index():
+    cursor = head()  # taken first: writes racing the load are replayed later
+    rows = (ContextEntry.objects.filter(duplicate_of__isnull=True, minhash__isnull=False)
+            .values_list("id", "minhash"))
+    return SignatureIndex(get_config()["NEAR_DISTANCE"], rows.iterator(), cursor)
+
+
+def _catch_up(index):
+    """
+    Replay the context writes logged after index.cursor, whichever process
+    made them. Returns a freshly loaded index instead when the log has been
+    pruned past the cursor.
+    """
+    changed = list(ChangeLog.objects.filter(id__gt=index.cursor, table="context").order_by("id")
+                   .values_list("id", "object_id"))
+    if not changed:
+        return index
+    oldest = ChangeLog.objects.order_by("id").values_list("id", flat=True).first()
+    if oldest is not None and oldest > index.cursor + 1:
+        return _load_index()
+    ids = list({object_id for _, object_id in changed})
+    current = {}
+    for n in range(0, len(ids), QUERY_BATCH):
+        current.update((pk, (duplicate_of_id, value)) for pk, duplicate_of_id, value in
+                       ContextEntry.objects.filter(pk__in=ids[n:n + QUERY_BATCH])
+                       .values_list("id", "duplicate_of_id", "minhash"))
+    for object_id in ids:
+        duplicate_of_id, value = current.get(object_id, (None, None))
+        if duplicate_of_id is None and value is not None:
+            index.add(object_id, value)
+        else:
+            index.remove(object_id)
+    index.cursor = changed[-1][0]
+    return index
+
+
+def get_signature_index():
+    """
+    Signature index over canonical entries with enough words for MinHash
+    matching, caught up with the change log.
+    """
+    global _index
+    with _lock:
+        _index = _load_index() if _index is None else _catch_up(_index)
+        return _index
+
+
+def reset_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+def canonical_for_fingerprint(fp):
+    """Id of the cluster holding an exact duplicate of `fp`, or None."""
+    row = (ContextEntry.objects.filter(fingerprint=fp).order_by("id")
+           .values_list("id", "duplicate_of_id").first())
+    return (row[1] or row[0]) if row else None
+
+
+def _stored_canonicals(ids):
+    """
+    {id: (content, processed_insights)} for candidate canonical ids still
+    stored. Ids gone from the table (deleted elsewhere, rolled back) leave
+    the index.
+    """
+    ids = list(ids)
+    found = {}
+    for n in range(0, len(ids), QUERY_BATCH):
+        rows = ContextEntry.objects.filter(pk__in=ids[n:n + QUERY_BATCH]).values_list(
+            "id", "content", "processed_insights"
+        )
+        found.update((pk, (content, insights)) for pk, content, insights in rows)
+    for stale in set(ids) - set(found):
+        if _index is not None:
+            with _lock:
+                _index.remove(stale)
+    return found
+
+
+def near_minhash(text):
+    """MinHash for texts long enough to match approximately, else None."""
+    return minhash(text) if len(normalize(text).split()) >= get_config()["MIN_WORDS"] else None
+
+
+def similar(a, b):
+    """
+    Exact word-set Jaccard check for a signature match. 64 one-bit samples
+    are noisy on short texts, so every index hit is confirmed here.
+    """
+    words_a, words_b = set(normalize(a).split()), set(normalize(b).split())
+    union = len(words_a | words_b)
+    return bool(union) and len(words_a & words_b) / union >= get_config()["MIN_JACCARD"]
+
+
+def annotate(entry):
+    """
+    Fill fingerprint/minhash and link `entry` (unsaved) to an existing cluster.
+    A new member inherits the canonical entry's insights when it has any.
+    """
+    entry.fingerprint = fingerprint(entry.content)
+    entry.minhash = near_minhash(entry.content)
+    canonical_id = canonical_for_fingerprint(entry.fingerprint)
+    exact = canonical_id is not None
+    if not exact and entry.minhash is not None:
+        canonical_id = get_signature_index().nearest(entry.minhash)
+    if canonical_id is None or canonical_id == entry.pk:
+        return entry
+    stored = _stored_canonicals([canonical_id]).get(canonical_id)
+    if stored and (exact or similar(entry.content, stored[0])):
+        entry.duplicate_of_id = canonical_id
+        if entry.processed_insights is None:
+            entry.processed_insights = stored[1]
+    return entry
+
+
+def prepare_batch(entries):
+    """
+    Fingerprint unsaved entries before bulk_create. Exact duplicates of stored
+    rows, or of earlier entries in the batch, are dropped; near duplicates of
+    stored rows are linked and inherit their insights. Returns (kept, links),
+    links mapping a kept position to the position of its in-batch canonical.
+    """
+    for e in entries:
+        e.fingerprint = fingerprint(e.content)
+    fps = list({e.fingerprint for e in entries})
+    stored = set()
+    for n in range(0, len(fps), QUERY_BATCH):
+        stored.update(ContextEntry.objects.filter(fingerprint__in=fps[n:n + QUERY_BATCH])
+                      .values_list("fingerprint", flat=True))
+    fresh, seen = [], set()
+    for e in entries:
+        if e.fingerprint not in stored and e.fingerprint not in seen:
+            seen.add(e.fingerprint)
+            e.minhash = near_minhash(e.content)
+            fresh.append(e)
+
+    index = get_signature_index()
+    candidates = {id(e): index.nearest(e.minhash) for e in fresh if e.minhash is not None}
+    canonicals = _stored_canonicals({c for c in candidates.values() if c})
+    local = SignatureIndex(index.max_distance)
+    kept, links = [], {}
+    for e in fresh:
+        if e.minhash is not None:
+            c = candidates[id(e)]
+            if c in canonicals and similar(e.content, canonicals[c][0]):
+                e.duplicate_of_id = c
+                if e.processed_insights is None:
+                    e.processed_insights = canonicals[c][1]
+            else:
+                j = local.nearest(e.minhash)
+                if j is not None and similar(e.content, kept[j].content):
+                    links[len(kept)] = j
+                else:
+                    local.add(len(kept), e.minhash)
+        kept.append(e)
+    return kept, links
+
+
+def link_batch(created, links):
+    """After bulk_create: attach in-batch near duplicates and index the new canonicals."""
+    members = {}
+    for i, j in links.items():
+        created[i].duplicate_of_id = created[j].pk
+        members.setdefault(created[j].pk, []).append(created[i].pk)
+    for canonical_id, ids in members.items():
+        ContextEntry.objects.filter(pk__in=ids).update(duplicate_of_id=canonical_id)
+    for e in created:
+        index_canonical(e)
+
+
+def index_canonical(entry):
+    """Make a freshly saved canonical entry findable as a near duplicate."""
+    if entry.duplicate_of_id is None and entry.minhash is not None and _index is not None:
+        with _lock:
+            _index.add(entry.pk, entry.minhash)
+
+
+def relink(entry):
+    """
+    Re-fingerprint a stored `entry` (unsaved changes) whose content changed
+    and move it to the cluster of its new content. Its own members were
+    duplicates of the old content; `reindex` hands them to the oldest one
+    once the entry is saved.
+    """
+    forget(entry)
+    entry._old_members = list(ContextEntry.objects.filter(duplicate_of_id=entry.pk).order_by("id")
+                              .values_list("id", flat=True))
+    entry.duplicate_of_id = None
+    return annotate(entry)
+
+
+def reindex(entry, update_fields=None):
+    """Finish `relink` after the save: write what update_fields skipped, re-cluster, re-index."""
+    members = entry.__dict__.pop("_old_members", None)
+    if members is None:
+        return
+    if update_fields is not None:
+        ContextEntry.objects.filter(pk=entry.pk).update(
+            fingerprint=entry.fingerprint, minhash=entry.minhash,
+            duplicate_of_id=entry.duplicate_of_id, processed_insights=entry.processed_insights,
+        )
+    if members:
+        ContextEntry.objects.filter(pk__in=members).update(duplicate_of_id=None)
+        promote(members)
+    index_canonical(entry)
+
+
+def forget(entry):
+    if _index is not None:
+        with _lock:
+            _index.remove(entry.pk)
+
+
+def promote(member_ids):
+    """
+    After a canonical entry is deleted (its members' links are already
+    nulled), make the oldest member canonical and point the rest at it.
+    """
+    if not member_ids:
+        return None
+    first, rest = member_ids[0], member_ids[1:]
+    ContextEntry.objects.filter(pk__in=rest).update(duplicate_of_id=first)
+    record("context", member_ids)
+    sim = ContextEntry.objects.filter(pk=first).values_list("minhash", flat=True).first()
+    if sim is not None and _index is not None:
+        with _lock:
+            _index.add(first, sim)
+    return first
+
+
+def share_insights(canonical_id, insights):
+    """Copy insights to cluster members that have none. Returns rows updated."""
+    members = list(ContextEntry.objects.filter(duplicate_of_id=canonical_id, processed_insights__isnull=True)
+                   .values_list("id", flat=True))
+    if members:
+        ContextEntry.objects.filter(pk__in=members).update(processed_insights=insights)
+        record("context", members)
+    return len(members)
+
+
+def backfill(batch_size=1000):
+    """
+    Fingerprint entries saved before dedup existed, oldest first, and link
+    their duplicates; members then inherit their canonical entry's insights.
+    Works in id-ordered chunks with one UPDATE statement per chunk. Returns
+    (fingerprinted, linked).
+    """
+    done = 0
+    linked = []
+    index = get_signature_index()
+    sql = "UPDATE {} SET fingerprint = %s, minhash = %s, duplicate_of_id = %s WHERE id = %s".format(
+        connection.ops.quote_name(ContextEntry._meta.db_table)
+    )
+    last_id = 0
+    while True:
+        rows = list(ContextEntry.objects.filter(fingerprint="", id__gt=last_id).order_by("id")
+                    .values_list("id", "content")[:batch_size])
+        if not rows:
+            break
+        fps = [fingerprint(content) for _, content in rows]
+        sims = [near_minhash(content) for _, content in rows]
+        canonical_of = {}
+        distinct = list(set(fps))
+        for n in range(0, len(distinct), QUERY_BATCH):
+            stored = (ContextEntry.objects.filter(fingerprint__in=distinct[n:n + QUERY_BATCH]).order_by("-id")
+                      .values_list("fingerprint", "id", "duplicate_of_id"))
+            canonical_of.update((fp, dup or pk) for fp, pk, dup in stored)  # oldest row wins
+        # earlier chunks: one lookup per row, one query for all candidates
+        candidates = {pk: index.nearest(sim) for (pk, _), fp, sim in zip(rows, fps, sims)
+                      if sim is not None and fp not in canonical_of}
+        canonicals = _stored_canonicals({c for c in candidates.values() if c})
+        texts = dict(rows)
+        local = SignatureIndex(index.max_distance)  # this chunk
+        updates = []
+        for (pk, content), fp, sim in zip(rows, fps, sims):
+            canonical_id = canonical_of.get(fp)
+            if canonical_id is None and sim is not None:
+                c = candidates.get(pk)
+                if c in canonicals and similar(content, canonicals[c][0]):
+                    canonical_id = c
+                else:
+                    c = local.nearest(sim)
+                    if c is not None and similar(content, texts[c]):
+                        canonical_id = c
+                    else:
+                        local.add(pk, sim)
+            canonical_of.setdefault(fp, canonical_id or pk)
+            updates.append((fp, sim, canonical_id, pk))
+            if canonical_id is not None:
+                linked.append(pk)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, updates)
+        with _lock:
+            for pk, sim in local.hashes.items():
+                index.add(pk, sim)
+        done += len(rows)
+        last_id = rows[-1][0]
+    canonical_insights = ContextEntry.objects.filter(pk=OuterRef("duplicate_of_id")).values("processed_insights")
+    ContextEntry.objects.filter(
+        processed_insights__isnull=True, duplicate_of__processed_insights__isnull=False
+    ).update(processed_insights=Subquery(canonical_insights))
+    record("context", linked)
+    return done, len(linked)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting == "CONTEXT_DEDUP":
+        reset_index()
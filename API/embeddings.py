@@ -0,0 +1,316 @@
+# API/embeddings.py
+"""
+Local semantic matching of task text (title/description) to context entries.
+
+Texts are embedded offline with feature-hashed, sublinear TF vectors
+(word unigrams and bigrams, DIM buckets, no model download). Context
+vectors are stored in the Embedding table, kept fresh by post_save signals (see
+AI_todo/signals.py) and backfilled by `manage.py build_embeddings`.
+
+Context vectors are served from an in-process IVF index: k-means
+centroids split the vectors into ~sqrt(N) lists, a query only scans the
+lists of its NPROBE closest centroids, then reranks those candidates
+exactly. IDF weights are derived from the stored vectors when the index
+is built. Contexts saved in this process are added incrementally. Vectors
+written elsewhere (ingest_contexts, build_embeddings, other workers) are
+picked up by comparing the table's row count and latest update with what
+the index has seen, at most every REFRESH_INTERVAL seconds. The index is
+rebuilt once it has grown by half since the last build, or when rows have
+disappeared from the table.
+"""
+import hashlib
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from AI_todo.models import ContextEntry, Embedding
+
+DEFAULT_CONFIG = {
+    "DIM": 256,
+    "NPROBE": 8,
+    "MIN_SIMILARITY": 0.05,
+    "BRUTE_FORCE_BELOW": 2000,   # exact scan for small tables
+    "KMEANS_ITERATIONS": 8,
+    "KMEANS_SAMPLE": 20000,
+    "REFRESH_INTERVAL": 2.0,     # seconds between checks for vectors stored elsewhere
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it me my of on or our so that the this "
+    "to was we were will with you your".split()
+)
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "AI_EMBEDDINGS", {})}
+
+
+def _features(text):
+    words = [w for w in _TOKEN_RE.findall((text or "").lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(feature, dim):
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, (1.0 if value >> 63 else -1.0)
+
+
+def embed_text(text, dim=None):
+    """Return an L2-normalized float32 hashed-TF vector for `text`."""
+    import numpy as np
+
+    dim = dim or get_config()["DIM"]
+    vec = np.zeros(dim, dtype=np.float32)
+    counts = {}
+    for feature in _features(text):
+        counts[feature] = counts.get(feature, 0) + 1
+    for feature, n in counts.items():
+        index, sign = _bucket(feature, dim)
+        vec[index] += sign * (1.0 + np.log(n))
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def to_bytes(vec):
+    return vec.astype("float32").tobytes()
+
+
+def from_bytes(raw):
+    import numpy as np
+
+    return np.frombuffer(bytes(raw), dtype=np.float32)
+
+
+def store_embedding(kind, object_id, text):
+    """Compute and upsert the vector for one object; returns it."""
+    vec = embed_text(text)
+    Embedding.objects.update_or_create(kind=kind, object_id=object_id, defaults={"vector": to_bytes(vec)})
+    if kind == "context":
+        _index_add(object_id, vec)
+    return vec
+
+
+def delete_embedding(kind, object_id):
+    Embedding.objects.filter(kind=kind, object_id=object_id).delete()
+    if kind == "context" and _index is not None:
+        _index.remove(object_id)
+
+
+class IVFIndex:
+    """Inverted-file ANN index over unit vectors (cosine similarity)."""
+
+    def __init__(self, ids, vectors, config):
+        import numpy as np
+
+        self.config = config
+        self.removed = set()
+        self.built_size = len(ids)
+        dim = config["DIM"]
+        # Bucket IDF: log(N / df) over the raw hashed vectors.
+        df = (vectors != 0).sum(axis=0) if len(ids) else np.zeros(dim)
+        self.idf = np.log((1 + len(ids)) / (1 + df)).astype(np.float32) + 1.0
+        weighted = self._weight(vectors)
+        if len(ids) < config["BRUTE_FORCE_BELOW"]:
+            self.centroids = np.zeros((1, dim), dtype=np.float32)
+            assign = np.zeros(len(ids), dtype=int)
+        else:
+            self.centroids = self._kmeans(weighted, int(np.sqrt(len(ids))))
+            assign = self._assign(weighted)
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+        self.list_ids = [ids[order[a:b]] for a, b in zip(bounds, bounds[1:])]
+        self.list_vecs = [weighted[order[a:b]] for a, b in zip(bounds, bounds[1:])]
+        self.list_of = dict(zip(ids.tolist(), assign.tolist()))  # id -> list holding its vector
+        # What the table held when this index last caught up with it.
+        self.stored_count = len(ids)
+        self.stored_latest = None
+        self.checked_at = time.monotonic()
+
+    def _weight(self, vectors):
+        import numpy as np
+
+        weighted = vectors * self.idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (weighted / norms).astype(np.float32)
+
+    def _kmeans(self, data, k):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(len(data), min(len(data), self.config["KMEANS_SAMPLE"]), replace=False)]
+        centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+        for _ in range(self.config["KMEANS_ITERATIONS"]):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(k):
+                members = sample[assign == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    norm = np.linalg.norm(mean)
+                    centroids[c] = mean / norm if norm else mean
+        return centroids
+
+    def _assign(self, data, chunk=8192):
+        import numpy as np
+
+        out = np.empty(len(data), dtype=int)
+        for n in range(0, len(data), chunk):
+            out[n:n + chunk] = np.argmax(data[n:n + chunk] @ self.centroids.T, axis=1)
+        return out
+
+    def __len__(self):
+        return sum(len(i) for i in self.list_ids) - len(self.removed)
+
+    def add(self, object_id, vector):
+        import numpy as np
+
+        self.removed.discard(object_id)
+        vec = self._weight(vector[None, :])
+        c = int(np.argmax(self.centroids @ vec[0])) if len(self.centroids) > 1 else 0
+        old = self.list_of.get(object_id)
+        if old is not None:  # replace the older vector, whichever list holds it
+            keep = self.list_ids[old] != object_id
+            self.list_ids[old] = self.list_ids[old][keep]
+            self.list_vecs[old] = self.list_vecs[old][keep]
+        self.list_ids[c] = np.append(self.list_ids[c], object_id)
+        self.list_vecs[c] = np.vstack([self.list_vecs[c], vec])
+        self.list_of[object_id] = c
+
+    def remove(self, object_id):
+        if object_id in self.list_of:
+            self.removed.add(object_id)
+
+    def search(self, vector, k):
+        """Return [(object_id, similarity)] for the k nearest vectors."""
+        import numpy as np
+
+        query = self._weight(vector[None, :])[0]
+        if not query.any():
+            return []
+        nprobe = min(self.config["NPROBE"], len(self.centroids))
+        probes = np.argsort(-(self.centroids @ query))[:nprobe] if len(self.centroids) > 1 else [0]
+        ids = np.concatenate([self.list_ids[c] for c in probes])
+        if not len(ids):
+            return []
+        sims = np.concatenate([self.list_vecs[c] @ query for c in probes])
+        want = min(len(sims), k + len(self.removed))
+        top = np.argpartition(-sims, want - 1)[:want]
+        top = top[np.argsort(-sims[top])]
+        hits = [(int(ids[i]), float(sims[i])) for i in top if int(ids[i]) not in self.removed]
+        return hits[:k]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _stored_vectors():
+    return Embedding.objects.filter(kind="context")
+
+
+def _build_index():
+    import numpy as np
+
+    config = get_config()
+    rows = list(_stored_vectors().values_list("object_id", "vector", "updated_at").iterator())
+    ids = [r[0] for r in rows]
+    vectors = (np.vstack([from_bytes(r[1]) for r in rows]) if rows
+               else np.zeros((0, config["DIM"]), dtype=np.float32))
+    index = IVFIndex(ids, vectors, config)
+    index.stored_latest = max((r[2] for r in rows), default=None)
+    return index
+
+
+def _refresh(index):
+    """
+    Catch `index` up with vectors stored by other processes. Returns the
+    index to use from now on: `index` itself, or a rebuilt one when rows
+    were deleted elsewhere or committed out of updated_at order.
+    """
+    index.checked_at = time.monotonic()
+    stored = _stored_vectors().aggregate(count=Count("id"), latest=Max("updated_at"))
+    if (stored["count"], stored["latest"]) == (index.stored_count, index.stored_latest):
+        return index
+    newer = _stored_vectors()
+    if index.stored_latest is not None:
+        newer = newer.filter(updated_at__gte=index.stored_latest)
+    for object_id, raw in newer.values_list("object_id", "vector").iterator():
+        index.add(object_id, from_bytes(raw))
+    index.stored_count, index.stored_latest = stored["count"], stored["latest"]
+    return index if len(index) == stored["count"] else _build_index()
+
+
+def _outgrown(index):
+    return len(index) > max(index.built_size, 1) * 1.5
+
+
+def _refresh_due(index):
+    return time.monotonic() - index.checked_at >= get_config()["REFRESH_INTERVAL"]
+
+
+def get_context_index():
+    """
+    Return the shared context index, (re)building it when missing or
+    outgrown and catching up with the Embedding table every REFRESH_INTERVAL.
+    """
+    global _index
+    index = _index
+    if index is None or _outgrown(index) or _refresh_due(index):
+        with _lock:
+            if _index is None or _outgrown(_index):
+                _index = _build_index()
+            elif _refresh_due(_index):
+                _index = _refresh(_index)
+            index = _index
+    return index
+
+
+def _index_add(object_id, vec):
+    if _index is not None:
+        with _lock:
+            _index.add(object_id, vec)
+
+
+def reset_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+def relevant_contexts(text, k=5):
+    """
+    ContextEntry rows most similar to `text`, best first. Empty when the text
+    has no usable words or nothing passes MIN_SIMILARITY.
+    """
+    vec = embed_text(text)
+    if not vec.any():
+        return []
+    hits = [(i, s) for i, s in get_context_index().search(vec, k)
+            if s >= get_config()["MIN_SIMILARITY"]]
+    by_id = ContextEntry.objects.in_bulk([i for i, _ in hits])
+    return [by_id[i] for i, _ in hits if i in by_id]
+
+
+def backfill(batch_size=1000):
+    """Embed every context that has no vector yet. Returns count."""
+    created = 0
+    have = Embedding.objects.filter(kind="context").values("object_id")
+    pending = ContextEntry.objects.exclude(id__in=have).order_by("id")
+    batch = []
+    for obj in pending.iterator(chunk_size=batch_size):
+        batch.append(Embedding(kind="context", object_id=obj.id, vector=to_bytes(embed_text(obj.content))))
+        if len(batch) >= batch_size:
+            Embedding.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    if batch:
+        Embedding.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+    reset_index()
+    return created
@@ -0,0 +1,74 @@
+# API/fake_model.py
+"""
+Offline stand-in for google.generativeai.GenerativeModel.
+
+Enable it in settings to load-test the suggestion endpoints without network
+access or model quota:
+
+    AI_FAKE_MODEL = {"latency": 0.5, "jitter": 0.2, "fail_rate": 0.0}
+
+Only the bits of the SDK surface we use are implemented: generate_content,
+generate_content_async (also with stream=True, which yields the reply in
+small chunks spread over the latency) and a response object with a .text
+attribute.
+"""
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, latency=0.5, jitter=0.0, fail_rate=0.0, seed=None):
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.fail_rate = float(fail_rate)
+        self._rng = random.Random(seed)
+
+    def _delay(self):
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _reply(self, prompt):
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            # ConnectionError is treated as transient, so retries get exercised
+            raise ConnectionError("fake model failure")
+        deadline = (datetime.now() + timedelta(days=3)).date().isoformat()
+        answer = {
+            "suggested_title": "Fake suggestion",
+            "priority_score": 5,
+            "suggested_deadline": deadline,
+            "category": "General",
+            "enhanced_description": f"Stub answer for a {len(prompt)} char prompt",
+        }
+        # Batch prompts (API/batch_suggest.py) number their contexts and
+        # expect a JSON array back.
+        n_contexts = sum(1 for line in prompt.splitlines() if line.startswith("CONTEXT "))
+        if n_contexts:
+            return FakeResponse(json.dumps([{"id": i, **answer} for i in range(n_contexts)]))
+        return FakeResponse(json.dumps(answer))
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self._delay())
+        return self._reply(prompt)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        await asyncio.sleep(self._delay())
+        return self._reply(prompt)
+
+    async def _stream(self, prompt, chunk_chars=16):
+        delay = self._delay()
+        # about a third of the latency before the first chunk, like a real model
+        await asyncio.sleep(delay / 3)
+        text = self._reply(prompt).text
+        pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for piece in pieces:
+            yield FakeResponse(piece)
+            await asyncio.sleep(delay * 2 / 3 / len(pieces))
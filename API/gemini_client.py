@@ -0,0 +1,325 @@
+# API/gemini_client.py
+"""
+One shared Gemini client per process.
+
+The SDK is configured once and each model profile ("suggest" for
+ai_utils, "analyze" for Gemini.analyze_task) is built on first use and then
+reused, so requests share the SDK's pooled gRPC/HTTP connection instead of
+redoing client setup and TLS handshakes on every call.
+
+Every call goes through a circuit breaker with jittered retries (see
+API/circuit_breaker.py) so an unhealthy upstream fails fast.
+stream_content_async hands out the reply text as the model writes it.
+
+Everything comes from settings.GEMINI and settings.AI_CIRCUIT_BREAKER (see
+smart_todo/settings.py); outside Django (python -m API.Gemini) the defaults
+below are used.
+"""
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, backoff_delay, is_transient
+from .metrics import record_model_call, timed
+
+DEFAULT_CONFIG = {
+    "API_KEY": os.getenv("GEMINI_API_KEY"),
+    "TRANSPORT": None,  # SDK default (grpc); "rest" uses a pooled HTTP session
+    "TIMEOUT": 30,      # seconds, per request
+    "MODELS": {
+        "suggest": {"model_name": "gemini-1.5-flash"},
+        "analyze": {
+            "model_name": "gemini-2.0-flash",
+            "generation_config": {
+                "temperature": 0.7,
+                "top_p": 1,
+                "top_k": 1,
+                "max_output_tokens": 2048,
+            },
+            "safety_settings": [
+                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            ],
+        },
+    },
+}
+
+DEFAULT_RESILIENCE = {
+    "FAILURE_THRESHOLD": 5,   # consecutive failures before the breaker opens
+    "RECOVERY_TIMEOUT": 30,   # seconds open before a half-open probe
+    "LATENCY_SLO": 10.0,      # slower successful calls count as failures
+    "MAX_ATTEMPTS": 3,        # per call, transient errors only
+    "BACKOFF_BASE": 0.2,      # seconds
+    "BACKOFF_MAX": 2.0,
+    "DEADLINE": 20.0,         # total seconds per call, retries included
+}
+
+_lock = threading.Lock()
+_configured = False
+_models = {}
+_breaker = None
+
+
+def get_config():
+    conf = dict(DEFAULT_CONFIG)
+    if settings.configured:
+        user = getattr(settings, "GEMINI", {})
+        conf.update({k: v for k, v in user.items() if k != "MODELS"})
+        conf["MODELS"] = {**DEFAULT_CONFIG["MODELS"], **user.get("MODELS", {})}
+    return conf
+
+
+def _fake_model_options():
+    return getattr(settings, "AI_FAKE_MODEL", None) if settings.configured else None
+
+
+def model_name(purpose="suggest"):
+    return get_config()["MODELS"][purpose]["model_name"]
+
+
+def _configure_sdk(conf):
+    global _configured
+    if not _configured and not conf["API_KEY"]:
+        raise RuntimeError("No GEMINI_API_KEY found in environment.")
+    import google.generativeai as genai
+
+    if not _configured:
+        kwargs = {"api_key": conf["API_KEY"]}
+        if conf["TRANSPORT"]:
+            kwargs["transport"] = conf["TRANSPORT"]
+        genai.configure(**kwargs)
+        _configured = True
+    return genai
+
+
+def get_model(purpose="suggest"):
+    """Return the shared model for `purpose`, building it on first use."""
+    model = _models.get(purpose)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(purpose)
+        if model is None:
+            fake = _fake_model_options()
+            if fake:
+                from .fake_model import FakeModel
+                model = FakeModel(**fake)
+            else:
+                conf = get_config()
+                genai = _configure_sdk(conf)
+                model = genai.GenerativeModel(**conf["MODELS"][purpose])
+            _models[purpose] = model
+    return model
+
+
+def get_resilience_config():
+    conf = dict(DEFAULT_RESILIENCE)
+    if settings.configured:
+        conf.update(getattr(settings, "AI_CIRCUIT_BREAKER", {}))
+    return conf
+
+
+def get_breaker():
+    """Return the process-wide breaker guarding every model call."""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                conf = get_resilience_config()
+                _breaker = CircuitBreaker(
+                    failure_threshold=conf["FAILURE_THRESHOLD"],
+                    recovery_timeout=conf["RECOVERY_TIMEOUT"],
+                    latency_slo=conf["LATENCY_SLO"],
+                )
+    return _breaker
+
+
+def _attempt_options(deadline, kwargs):
+    """request_options for the next attempt: the configured timeout, capped by what is left of the deadline."""
+    if "request_options" in kwargs:
+        return kwargs
+    remaining = max(0.1, deadline - time.monotonic())
+    return {**kwargs, "request_options": {"timeout": min(get_config()["TIMEOUT"], remaining)}}
+
+
+def generate_content(prompt, purpose="suggest", **kwargs):
+    """
+    Call the shared model through the circuit breaker. Transient errors are
+    retried with jittered backoff while the total DEADLINE allows. Raises
+    CircuitOpenError without calling the model when the breaker is open.
+    Latency and tokens go to API/metrics.py.
+    """
+    start = time.perf_counter()
+    resp = error = None
+    try:
+        with timed("model"):
+            resp = _generate_content(prompt, purpose, **kwargs)
+        return resp
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if not isinstance(error, CircuitOpenError):
+            record_model_call(purpose, time.perf_counter() - start, prompt, resp, error)
+
+
+def _generate_content(prompt, purpose, **kwargs):
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise CircuitOpenError("Gemini circuit breaker is open")
+    conf = get_resilience_config()
+    start = time.monotonic()
+    deadline = start + conf["DEADLINE"]
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = get_model(purpose).generate_content(prompt, **_attempt_options(deadline, kwargs))
+        except Exception as e:
+            delay = backoff_delay(attempt, conf["BACKOFF_BASE"], conf["BACKOFF_MAX"])
+            if is_transient(e) and attempt < conf["MAX_ATTEMPTS"] and time.monotonic() + delay < deadline:
+                breaker.record_retry()
+                time.sleep(delay)
+                continue
+            breaker.record_failure()
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return resp
+
+
+async def generate_content_async(prompt, purpose="suggest", **kwargs):
+    """Async counterpart of generate_content; cancellation counts as a failure."""
+    start = time.perf_counter()
+    resp = error = None
+    try:
+        with timed("model"):
+            resp = await _generate_content_async(prompt, purpose, **kwargs)
+        return resp
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if not isinstance(error, CircuitOpenError):
+            record_model_call(purpose, time.perf_counter() - start, prompt, resp, error)
+
+
+async def _generate_content_async(prompt, purpose, **kwargs):
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise CircuitOpenError("Gemini circuit breaker is open")
+    conf = get_resilience_config()
+    start = time.monotonic()
+    deadline = start + conf["DEADLINE"]
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = await get_model(purpose).generate_content_async(prompt, **_attempt_options(deadline, kwargs))
+        except asyncio.CancelledError:
+            # the caller's own deadline (asyncio.wait_for) ran out
+            breaker.record_failure()
+            raise
+        except Exception as e:
+            delay = backoff_delay(attempt, conf["BACKOFF_BASE"], conf["BACKOFF_MAX"])
+            if is_transient(e) and attempt < conf["MAX_ATTEMPTS"] and time.monotonic() + delay < deadline:
+                breaker.record_retry()
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_failure()
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return resp
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text or ""
+    except ValueError:  # SDK: a chunk without text parts (e.g. only a finish reason)
+        return ""
+
+
+async def stream_content_async(prompt, purpose="suggest", **kwargs):
+    """
+    Async generator over the text of a streamed completion, piece by piece,
+    through the circuit breaker. Transient errors before the first piece are
+    retried like generate_content_async; after that they are raised, since
+    text already handed out cannot be replayed.
+    """
+    start = time.perf_counter()
+    pieces, last, error = [], None, None
+    try:
+        async for chunk in _stream_content_async(prompt, purpose, **kwargs):
+            last = chunk
+            text = _chunk_text(chunk)
+            if text:
+                pieces.append(text)
+                yield text
+    except GeneratorExit:
+        raise  # the consumer stopped reading; not a model error
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if not isinstance(error, CircuitOpenError):
+            resp = SimpleNamespace(text="".join(pieces), usage_metadata=getattr(last, "usage_metadata", None))
+            record_model_call(purpose, time.perf_counter() - start, prompt, resp, error)
+
+
+async def _stream_content_async(prompt, purpose, **kwargs):
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise CircuitOpenError("Gemini circuit breaker is open")
+    conf = get_resilience_config()
+    start = time.monotonic()
+    deadline = start + conf["DEADLINE"]
+    attempt = 0
+    while True:
+        attempt += 1
+        started = False
+        try:
+            resp = await get_model(purpose).generate_content_async(
+                prompt, stream=True, **_attempt_options(deadline, kwargs))
+            async for chunk in resp:
+                started = True
+                yield chunk
+        except GeneratorExit:
+            # the consumer has what it needed; the upstream answered
+            breaker.record_success(time.monotonic() - start)
+            raise
+        except asyncio.CancelledError:
+            breaker.record_failure()
+            raise
+        except Exception as e:
+            delay = backoff_delay(attempt, conf["BACKOFF_BASE"], conf["BACKOFF_MAX"])
+            if (not started and is_transient(e) and attempt < conf["MAX_ATTEMPTS"]
+                    and time.monotonic() + delay < deadline):
+                breaker.record_retry()
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_failure()
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return
+
+
+def reset():
+    """Drop cached models and breaker so the next call rebuilds them from settings."""
+    global _configured, _breaker
+    with _lock:
+        _models.clear()
+        _configured = False
+        _breaker = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ("GEMINI", "AI_FAKE_MODEL", "AI_CIRCUIT_BREAKER"):
+        reset()
@@ -0,0 +1,93 @@
+# API/http_cache.py
+"""
+Conditional GETs for the list and detail endpoints.
+
+Each response carries an ETag and a Last-Modified header derived from one
+validator query per table: the TableVersion counter (bumped on every write,
+including bulk paths that skip model signals), the row count and the
+newest Task.updated_at / ContextEntry.created_at. A client that sends the
+validators back (browsers do so automatically for Cache-Control: no-cache)
+gets 304 Not Modified without the rows being loaded or serialized.
+"""
+import hashlib
+
+from django.db import IntegrityError
+from django.db.models import Count, F, Max, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from AI_todo.models import Category, ContextEntry, TableVersion, Task
+
+# table -> (model, newest-row timestamp field)
+TABLES = {
+    "task": (Task, "updated_at"),
+    "context": (ContextEntry, "created_at"),
+    "category": (Category, None),
+}
+# Task rows embed their category, so a category change also changes tasks.
+DEPENDENTS = {"category": ("task",)}
+
+
+def bump(*tables):
+    """Advance the version counter of `tables` (and the tables embedding them)."""
+    names = set(tables)
+    for table in tables:
+        names.update(DEPENDENTS.get(table, ()))
+    updated = TableVersion.objects.filter(table__in=names).update(version=F("version") + 1, updated_at=timezone.now())
+    if updated < len(names):
+        for name in names - set(TableVersion.objects.filter(table__in=names).values_list("table", flat=True)):
+            try:
+                TableVersion.objects.create(table=name, version=1)
+            except IntegrityError:
+                TableVersion.objects.filter(table=name).update(version=F("version") + 1)
+
+
+def validators(table):
+    """(token, last_modified datetime or None) for `table`, in one query."""
+    model, ts_field = TABLES[table]
+    version = TableVersion.objects.filter(table=table)
+    aggregates = {
+        "rows": Count("pk"),
+        "version": Max(Subquery(version.values("version")[:1])),
+        "version_at": Max(Subquery(version.values("updated_at")[:1])),
+    }
+    if ts_field:
+        aggregates["newest"] = Max(ts_field)
+    found = model.objects.order_by().aggregate(**aggregates)
+    stamps = [t for t in (found.get("newest"), found["version_at"]) if t is not None]
+    last_modified = max(stamps) if stamps else None
+    token = f"{table}:{found['version']}:{found['rows']}:{last_modified.isoformat() if last_modified else ''}"
+    return token, last_modified
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin: ETag / Last-Modified on list and retrieve, 304 when the
+    client's copy is current. Set `cache_table` to a key of TABLES.
+    """
+    cache_table = None
+
+    def _conditional(self, request, render):
+        if request.method not in ("GET", "HEAD"):
+            return render()
+        token, last_modified = validators(self.cache_table)
+        # The same table state renders differently per URL (filters, fields,
+        # cursor) and per Accept header (JSON vs browsable API).
+        variant = f"{token}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        etag = quote_etag(hashlib.sha1(variant.encode("utf-8")).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
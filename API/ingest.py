@@ -0,0 +1,217 @@
+# API/ingest.py
+"""
+Streaming bulk ingest of context entries.
+
+Input is consumed line by line (NDJSON or a WhatsApp "Export chat" text
+file), so an upload of any size is never held in memory. Parsed entries
+are written with bulk_create in fixed-size batches, one transaction per
+batch, together with their embeddings and, optionally, insight jobs.
+Repeated messages are collapsed or linked on the way in (API/dedup.py).
+
+    from API.ingest import ingest, iter_whatsapp
+    with open("chat.txt", encoding="utf-8") as f:
+        summary = ingest(iter_whatsapp(f), batch_size=1000, enqueue=True)
+"""
+import json
+import re
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from AI_todo.models import ContextEntry, Embedding
+
+from .changes import record
+from .dedup import link_batch, prepare_batch
+from .embeddings import embed_text, reset_index, to_bytes
+from .insights import enqueue as enqueue_insights
+
+SOURCE_TYPES = {value for value, _ in ContextEntry.SOURCE_CHOICES}
+KINDS = ("ndjson", "whatsapp")
+
+DEFAULT_CONFIG = {
+    "BATCH_SIZE": 1000,      # rows per bulk_create / transaction
+    "MAX_BATCH_SIZE": 5000,
+}
+
+
+def get_ingest_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "CONTEXT_INGEST", {})}
+
+
+# "12/31/23, 9:41 PM - Alice: text"  (Android)
+# "[31/12/2023, 21:41:05] Alice: text"  (iOS)
+_WHATSAPP_LINE = re.compile(
+    r"^\[?(?P<date>\d{1,2}[/.]\d{1,2}[/.]\d{2,4}),?\s+"
+    r"(?P<time>\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap]\.?[Mm]\.?)?)\]?\s*(?:-\s*)?"
+    r"(?P<rest>.*)$"
+)
+_INVISIBLE = dict.fromkeys(map(ord, "‎‏‪‬﻿"))
+
+
+def _text_lines(lines):
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        yield line.translate(_INVISIBLE).rstrip("\r\n")
+
+
+def iter_ndjson(lines, errors=None):
+    """
+    Yield entry dicts from NDJSON lines ({"content", "source_type",
+    "created_at"}). Unparseable lines are counted in errors["invalid"].
+    """
+    for line in _text_lines(lines):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            obj = None
+        if not isinstance(obj, dict):
+            if errors is not None:
+                errors["invalid"] = errors.get("invalid", 0) + 1
+            continue
+        yield obj
+
+
+def _parse_whatsapp_time(date_s, time_s, dayfirst):
+    date_s = date_s.replace(".", "/")
+    time_s = time_s.replace(".", "").upper().replace(" ", "")
+    day_fmt = "%d/%m/%y" if dayfirst else "%m/%d/%y"
+    if len(date_s.rsplit("/", 1)[-1]) == 4:
+        day_fmt = day_fmt.replace("%y", "%Y")
+    time_fmts = ["%I:%M%p", "%I:%M:%S%p"] if time_s.endswith(("AM", "PM")) else ["%H:%M", "%H:%M:%S"]
+    for time_fmt in time_fmts:
+        try:
+            return timezone.make_aware(datetime.strptime(f"{date_s} {time_s}", f"{day_fmt} {time_fmt}"))
+        except ValueError:
+            continue
+    return None
+
+
+def iter_whatsapp(lines, dayfirst=False, errors=None):
+    """
+    Yield one entry per chat message from a WhatsApp export. Lines without
+    a timestamp continue the previous message; system lines (no "Name:")
+    are skipped.
+    """
+    current = None
+    for line in _text_lines(lines):
+        m = _WHATSAPP_LINE.match(line)
+        if m is None:
+            if current is not None:
+                current["content"] += "\n" + line
+            continue
+        if current is not None:
+            yield current
+            current = None
+        sender, sep, text = m.group("rest").partition(": ")
+        if not sep:
+            continue  # "Messages are end-to-end encrypted", group events, ...
+        created_at = _parse_whatsapp_time(m.group("date"), m.group("time"), dayfirst)
+        if created_at is None and errors is not None:
+            errors["bad_dates"] = errors.get("bad_dates", 0) + 1
+        current = {"content": f"{sender.strip()}: {text}", "source_type": "whatsapp", "created_at": created_at}
+    if current is not None:
+        yield current
+
+
+def parse_records(lines, kind="ndjson", dayfirst=False, errors=None):
+    """Entry dicts from `lines` (str or bytes, any iterable) in the given format."""
+    if kind == "whatsapp":
+        return iter_whatsapp(lines, dayfirst=dayfirst, errors=errors)
+    if kind == "ndjson":
+        return iter_ndjson(lines, errors=errors)
+    raise ValueError(f"Unknown ingest format {kind!r}; expected one of {', '.join(KINDS)}.")
+
+
+def _count(errors, key):
+    errors[key] = errors.get(key, 0) + 1
+
+
+def _to_entry(obj, default_source, errors):
+    """
+    ContextEntry for one record, or None: rows without content are skipped,
+    rows whose content or source_type is not a string are counted in
+    errors["invalid"]. A created_at that is not an ISO datetime string is
+    counted in errors["bad_dates"] and replaced by now.
+    """
+    content, source = obj.get("content"), obj.get("source_type")
+    if not isinstance(content, (str, type(None))) or not isinstance(source, (str, type(None))):
+        _count(errors, "invalid")
+        return None
+    content = (content or "").strip()
+    if not content:
+        return None
+    source = source or default_source
+    created_at = obj.get("created_at")
+    if isinstance(created_at, str):
+        try:
+            parsed = parse_datetime(created_at)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            _count(errors, "bad_dates")
+        elif timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        created_at = parsed
+    elif created_at is not None and not isinstance(created_at, datetime):
+        _count(errors, "bad_dates")
+        created_at = None
+    return ContextEntry(
+        content=content,
+        source_type=source if source in SOURCE_TYPES else default_source,
+        created_at=created_at or timezone.now(),
+    )
+
+
+def _write_batch(entries, enqueue):
+    """Write one batch; returns (created, exact duplicates dropped)."""
+    with transaction.atomic():
+        kept, links = prepare_batch(entries)
+        created = ContextEntry.objects.bulk_create(kept)
+        link_batch(created, links)
+        Embedding.objects.bulk_create(
+            [Embedding(kind="context", object_id=e.pk, vector=to_bytes(embed_text(e.content))) for e in created]
+        )
+        if enqueue:
+            # one job per cluster, on its canonical entry
+            enqueue_insights(e.duplicate_of_id or e.pk for e in created if e.processed_insights is None)
+        record("context", [e.pk for e in created])
+    return len(created), len(entries) - len(kept)
+
+
+def ingest(records, batch_size=None, enqueue=False, default_source="note", errors=None):
+    """
+    Write entry dicts from `records` in batches of `batch_size`. Returns
+    {"created", "duplicates", "skipped", "batches"}; records without content
+    are skipped and exact duplicates of stored or earlier rows are dropped
+    (near duplicates are stored and linked, see API/dedup.py). Malformed
+    records are left out and counted in `errors` (see _to_entry) instead of
+    aborting the import. Embeddings are written with each batch (bulk_create
+    sends no post_save), InsightJobs too when `enqueue` is set.
+    """
+    errors = {} if errors is None else errors
+    conf = get_ingest_config()
+    batch_size = min(max(1, int(batch_size or conf["BATCH_SIZE"])), conf["MAX_BATCH_SIZE"])
+    created = duplicates = skipped = batches = 0
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        invalid = errors.get("invalid", 0)
+        entries = [e for e in (_to_entry(r, default_source, errors) for r in chunk) if e is not None]
+        skipped += len(chunk) - len(entries) - (errors.get("invalid", 0) - invalid)
+        if entries:
+            n_created, n_duplicates = _write_batch(entries, enqueue)
+            created += n_created
+            duplicates += n_duplicates
+            batches += 1
+    if created:
+        reset_index()  # rebuilt lazily with the new vectors on next lookup
+    return {"created": created, "duplicates": duplicates, "skipped": skipped, "batches": batches}
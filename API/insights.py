@@ -0,0 +1,141 @@
+# API/insights.py
+"""
+Background insight pipeline.
+
+New ContextEntry rows get an InsightJob (see AI_todo/signals.py). The worker
+command `python manage.py process_insights` claims pending jobs, runs
+analyze_task (which normalizes via normalize_result) on a thread pool and
+stores the result in ContextEntry.processed_insights, so ai_suggest can read
+it instead of calling the model on the request path.
+
+Duplicate clusters (see API/dedup.py) are analyzed once: jobs target the
+canonical entry and its result is copied to every member.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db.models import F
+from django.utils import timezone
+
+from AI_todo.models import ContextEntry, InsightJob
+
+from .changes import record
+from .dedup import share_insights
+from .Gemini import analyze_task, complete_nlp
+
+MAX_ATTEMPTS = 3
+
+
+def compute_insights(content, source, nlp=True):
+    """
+    Run the Gemini analyzer on one context; raises if it produced nothing.
+    With nlp=False, finish the result with Gemini.complete_nlp.
+    """
+    result = analyze_task(content, source, nlp=nlp)
+    if not result:
+        raise RuntimeError("analyze_task returned no result")
+    return result
+
+
+def enqueue(context_ids):
+    """Queue the given contexts unless they already have an open job. Returns count."""
+    context_ids = set(context_ids)
+    busy = set(InsightJob.objects.filter(context_id__in=context_ids, status__in=["pending", "running"])
+               .values_list("context_id", flat=True))
+    jobs = [InsightJob(context_id=i) for i in sorted(context_ids - busy)]
+    InsightJob.objects.bulk_create(jobs, batch_size=500)
+    return len(jobs)
+
+
+def enqueue_missing():
+    """Queue every canonical context without insights and without an open job. Returns count."""
+    open_jobs = InsightJob.objects.filter(status__in=["pending", "running"]).values("context_id")
+    ids = (ContextEntry.objects.filter(processed_insights__isnull=True, duplicate_of__isnull=True)
+           .exclude(id__in=open_jobs).values_list("id", flat=True))
+    jobs = [InsightJob(context_id=i) for i in ids.iterator()]
+    InsightJob.objects.bulk_create(jobs, batch_size=500)
+    return len(jobs)
+
+
+def requeue_stale(older_than):
+    """Put jobs left 'running' by a dead worker back in the queue."""
+    cutoff = timezone.now() - older_than
+    return InsightJob.objects.filter(status="running", updated_at__lt=cutoff).update(
+        status="pending", updated_at=timezone.now()
+    )
+
+
+def claim_jobs(limit):
+    """
+    Atomically move up to `limit` pending jobs to running and return them.
+    The conditional UPDATE means two workers never claim the same row, even
+    on SQLite where SELECT ... FOR UPDATE SKIP LOCKED is not available.
+    """
+    claimed = []
+    candidates = (InsightJob.objects.filter(status="pending").order_by("id")
+                  .values_list("id", flat=True)[:limit])
+    for job_id in list(candidates):
+        won = InsightJob.objects.filter(pk=job_id, status="pending").update(
+            status="running", attempts=F("attempts") + 1, updated_at=timezone.now()
+        )
+        if won:
+            claimed.append(job_id)
+    return list(InsightJob.objects.filter(pk__in=claimed).select_related("context__duplicate_of"))
+
+
+def _run(job):
+    ctx = job.context
+    canonical = ctx.duplicate_of
+    if canonical is not None and canonical.processed_insights is not None:
+        return job, canonical.processed_insights, None
+    try:
+        # sentiment/keywords are filled per batch, see process_batch
+        return job, compute_insights(ctx.content, ctx.get_source_type_display(), nlp=False), None
+    except Exception as e:
+        return job, None, e
+
+
+def _complete_nlp(outcomes, nlp_workers):
+    """Sentiment/keywords for every new result of the batch in one NLP call."""
+    fresh = [insights for _, insights, error in outcomes if error is None]
+    try:
+        complete_nlp(fresh, workers=nlp_workers)
+        return outcomes
+    except Exception:
+        pass
+    # one bad text (or a missing NLP package) should only fail its own job
+    checked = []
+    for job, insights, error in outcomes:
+        if error is None:
+            try:
+                complete_nlp([insights])
+            except Exception as e:
+                error = e
+        checked.append((job, insights, error))
+    return checked
+
+
+def process_batch(limit=20, workers=4, nlp_workers=None):
+    """
+    Claim and process one batch. Model calls run on the pool, then the
+    batch's NLP runs in one call (on `nlp_workers` processes if set, see
+    API/nlp.py); DB writes stay on the calling thread to keep SQLite writers
+    serialized. Returns the number of jobs handled.
+    """
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return 0
+    done = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        outcomes = list(pool.map(_run, jobs))
+    for job, insights, error in _complete_nlp(outcomes, nlp_workers):
+        if error is None:
+            ContextEntry.objects.filter(pk=job.context_id).update(processed_insights=insights)
+            done.append(job.context_id)
+            share_insights(job.context_id, insights)
+            job.status, job.last_error = "done", ""
+        else:
+            job.status = "failed" if job.attempts >= MAX_ATTEMPTS else "pending"
+            job.last_error = str(error)
+        job.save(update_fields=["status", "last_error", "updated_at"])
+    record("context", done)
+    return len(jobs)
@@ -0,0 +1,110 @@
+# API/json_stream.py
+"""
+Incremental parsing of a JSON object that arrives in pieces (a streamed
+model reply).
+
+Each top-level field is handed back as soon as its value is complete: a
+string, object or array at its closing character, a number or literal at
+the following "," or "}". Anything before the first "{" (a ```json fence,
+a sentence of prose) and after the closing "}" is ignored. Every character
+is scanned once, however the text is split.
+
+    parser = JSONObjectStream()
+    for chunk in chunks:
+        for name, value in parser.feed(chunk):
+            ...
+    parser.fields  # everything parsed so far
+"""
+import json
+
+# What the parser expects next inside the top-level object
+_KEY, _COLON, _VALUE, _IN_VALUE, _AFTER_VALUE = range(5)
+
+
+class JSONObjectStream:
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = self._escape = False
+        self._expect = _KEY
+        self._key = None
+        self._start = 0
+
+    def feed(self, chunk):
+        """Consume `chunk`; return the (name, value) pairs it completed, in order."""
+        completed = []
+        if self.done or not chunk:
+            return completed
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_closed(i, completed)
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._expect == _KEY:
+                        self._start = i
+                    elif self._expect == _VALUE:
+                        self._start, self._expect = i, _IN_VALUE
+            elif c in "{[":
+                if self._depth == 1 and self._expect == _VALUE:
+                    self._start, self._expect = i, _IN_VALUE
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._expect == _IN_VALUE:
+                    self._complete(i + 1, completed)
+                elif self._depth == 0:
+                    if self._expect == _IN_VALUE:
+                        self._complete(i, completed)
+                    self.done = True
+                    break
+            elif self._depth == 1:
+                if c == ":" and self._expect == _COLON:
+                    self._expect = _VALUE
+                elif c == ",":
+                    if self._expect == _IN_VALUE:
+                        self._complete(i, completed)
+                    self._expect = _KEY
+                elif self._expect == _VALUE and not c.isspace():
+                    self._start, self._expect = i, _IN_VALUE
+        self._pos = len(text)
+        return completed
+
+    def _string_closed(self, end, completed):
+        if self._expect == _KEY:
+            try:
+                self._key = json.loads(self._text[self._start:end + 1], strict=False)
+            except ValueError:
+                self._key = None
+            self._expect = _COLON
+        elif self._expect == _IN_VALUE and self._text[self._start] == '"':
+            self._complete(end + 1, completed)
+
+    def _complete(self, end, completed):
+        self._expect = _AFTER_VALUE
+        if self._key is None:
+            return
+        try:
+            value = json.loads(self._text[self._start:end], strict=False)  # raw newlines in strings
+        except ValueError:
+            return  # a malformed value; the field is left out
+        self.fields[self._key] = value
+        completed.append((self._key, value))
@@ -0,0 +1,168 @@
+# API/keyword_rules.py
+"""
+Single-pass keyword classifier used by _heuristic_ai.
+
+All urgency and category keywords are compiled into one regex built from a
+trie of the keywords, so scanning costs about one pass over the text no
+matter how many rules there are (a plain "a|b|c" alternation would retry
+every keyword at every position). Matching keeps the old `k in text`
+substring semantics, including keywords that overlap or prefix each other.
+
+Rules are read, in order of preference, from KeywordRule rows in the
+database, settings.AI_HEURISTIC_RULES, or DEFAULT_RULES below:
+
+    AI_HEURISTIC_RULES = {
+        "urgency": ["urgent", "asap", ...],
+        "categories": [["Work / Meetings", ["meeting", "slides"]], ...],
+        "default_category": "General",
+    }
+
+Categories are tried in the listed order; the first one with a hit wins.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from AI_todo.models import KeywordRule
+
+URGENCY = "urgency"
+
+DEFAULT_RULES = {
+    "urgency": ["urgent", "asap", "tomorrow", "deadline", "due"],
+    "categories": [
+        ["Work / Meetings", ["meeting", "slides", "client"]],
+        ["Work / Dev", ["bug", "deploy", "api", "fix", "issue"]],
+        ["Email", ["email", "reply", "inbox", "compose"]],
+        ["Personal / Shopping", ["buy", "grocer", "shopping", "purchase"]],
+    ],
+    "default_category": "General",
+}
+
+
+def _trie_regex(words):
+    """Return a regex source matching the longest of `words` at a position."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        terminal = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            body = ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordClassifier:
+    def __init__(self, rules):
+        self.default_category = rules.get("default_category", "General")
+        self.category_order = []
+        # keyword -> set of labels ("urgency" or a category name)
+        self.labels = {}
+        for kw in rules.get("urgency", []):
+            self._add(kw, URGENCY)
+        for category, keywords in rules.get("categories", []):
+            self.category_order.append(category)
+            for kw in keywords:
+                self._add(kw, category)
+        # Zero-width lookahead so overlapping keywords are all seen.
+        source = _trie_regex(self.labels)
+        self.pattern = re.compile(f"(?=({source}))") if source else None
+
+    def _add(self, keyword, label):
+        keyword = keyword.strip().lower()
+        if keyword:
+            self.labels.setdefault(keyword, set()).add(label)
+
+    def matches(self, text):
+        """Yield (keyword, label, start, end) for every keyword occurrence in text."""
+        if self.pattern is None or not text:
+            return
+        text = text.lower()
+        for m in self.pattern.finditer(text):
+            found = m.group(1)
+            start = m.start(1)
+            # The trie regex returns the longest keyword starting here;
+            # shorter keywords that are prefixes of it also count.
+            for n in range(1, len(found) + 1):
+                for label in self.labels.get(found[:n], ()):
+                    yield found[:n], label, start, start + n
+
+    def classify(self, text):
+        """Return urgency flag, chosen category and all matches with positions."""
+        hits = list(self.matches(text))
+        urgent = any(label == URGENCY for _, label, _, _ in hits)
+        found = {label for _, label, _, _ in hits}
+        category = next((c for c in self.category_order if c in found), self.default_category)
+        return {
+            "urgent": urgent,
+            "category": category,
+            "matches": [
+                {"keyword": kw, "label": label, "start": start, "end": end}
+                for kw, label, start, end in hits
+            ],
+        }
+
+
+def load_rules():
+    """Rules from the KeywordRule table if it has any, else settings, else defaults."""
+    try:
+        rows = list(KeywordRule.objects.order_by("group_order", "id").values_list("label", "keyword"))
+    except DatabaseError:
+        rows = []  # table not migrated yet
+    if rows:
+        urgency, categories = [], {}
+        for label, keyword in rows:
+            if label == URGENCY:
+                urgency.append(keyword)
+            else:
+                categories.setdefault(label, []).append(keyword)
+        rules = {"urgency": urgency, "categories": list(categories.items())}
+        rules["default_category"] = getattr(settings, "AI_HEURISTIC_RULES", {}).get(
+            "default_category", DEFAULT_RULES["default_category"]
+        )
+        return rules
+    return {**DEFAULT_RULES, **getattr(settings, "AI_HEURISTIC_RULES", {})}
+
+
+_classifier = None
+_lock = threading.Lock()
+
+
+def get_classifier():
+    """Return the compiled classifier, building it on first use."""
+    global _classifier
+    if _classifier is None:
+        with _lock:
+            if _classifier is None:
+                _classifier = KeywordClassifier(load_rules())
+    return _classifier
+
+
+def reset_classifier(**kwargs):
+    global _classifier
+    with _lock:
+        _classifier = None
+
+
+post_save.connect(reset_classifier, sender=KeywordRule)
+post_delete.connect(reset_classifier, sender=KeywordRule)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting == "AI_HEURISTIC_RULES":
+        reset_classifier()
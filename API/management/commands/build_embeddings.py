@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from API.embeddings import backfill, get_context_index
+
+
+class Command(BaseCommand):
+    help = "Embed contexts that have no vector yet (e.g. rows from bulk imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        created = backfill(batch_size=opts["batch"])
+        index = get_context_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {created} object(s); context index holds {len(index)} vector(s) "
+            f"in {len(index.centroids)} list(s)"
+        ))
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from AI_todo.models import ContextEntry, Task
+
+TITLE_PREFIX = "db bench"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write throughput of the configured database under concurrent writers "
+        "(one thread and connection each), with optional concurrent list readers. "
+        "Run once per mode, e.g. SQLITE_TUNED=0 vs the default, or DB_ENGINE=postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=200, help="transactions per writer")
+        parser.add_argument("--readers", type=int, default=2, help="threads listing tasks meanwhile")
+        parser.add_argument("--keep", action="store_true", help="leave the benchmark rows in place")
+
+    def handle(self, *args, **opts):
+        db = settings.DATABASES["default"]
+        mode = db["ENGINE"].rsplit(".", 1)[-1]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                mode += f" journal_mode={cursor.fetchone()[0]}"  # persists in the file once set
+        self.stdout.write(f"{mode} {db.get('OPTIONS') or ''}")
+        connection.close()
+        latencies, errors, reads = [], [], [0]
+        stop = threading.Event()
+        lock = threading.Lock()
+
+        def writer(n):
+            try:
+                for i in range(opts["writes"]):
+                    start = time.perf_counter()
+                    try:
+                        # a read followed by writes, like the API and ingest paths
+                        with transaction.atomic():
+                            Task.objects.order_by("-created_at").values("id").first()
+                            task = Task.objects.create(title=f"{TITLE_PREFIX} {n}-{i}")
+                            task.priority_score = 1.0
+                            task.save(update_fields=["priority_score"])
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    list(Task.objects.order_by("-created_at")[:50])
+                    list(ContextEntry.objects.order_by("-created_at").values("id")[:50])
+                    reads[0] += 1
+            except OperationalError as e:
+                with lock:
+                    errors.append(f"read: {e}")
+            finally:
+                connection.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(opts["readers"])]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(opts["writers"])]
+        for t in readers:
+            t.start()
+        started = time.perf_counter()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for t in readers:
+            t.join()
+
+        latencies.sort()
+        n = len(latencies)
+        self.stdout.write(
+            f"{opts['writers']} writers, {n} committed writes in {elapsed:.2f}s: {n / elapsed:.0f} writes/s, "
+            f"{reads[0] / elapsed:.0f} list reads/s\n"
+            + (f"p50 {latencies[n // 2] * 1000:.1f}ms  p99 {latencies[max(0, int(n * 0.99) - 1)] * 1000:.1f}ms  "
+               if n else "")
+            + f"errors {len(errors)}" + (f" (first: {errors[0]})" if errors else "")
+        )
+        if not opts["keep"]:
+            for task in Task.objects.filter(title__startswith=TITLE_PREFIX).iterator():
+                task.delete()
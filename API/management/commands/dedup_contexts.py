@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from API.dedup import backfill
+
+
+class Command(BaseCommand):
+    help = "Fingerprint context entries saved before dedup existed and link their duplicates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows loaded per query")
+
+    def handle(self, *args, **opts):
+        done, linked = backfill(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Fingerprinted {done} context(s); {linked} linked to an earlier duplicate"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from API.startup import HEAVY_MODULES, import_profile
+
+
+class Command(BaseCommand):
+    help = "Measure import time of the worker startup path with python -X importtime (runs in a fresh interpreter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="slowest modules to list (by self time)")
+        parser.add_argument("--budget-ms", type=float, default=None, help="fail when the total exceeds this")
+        parser.add_argument("--runs", type=int, default=3, help="best of N runs")
+
+    def handle(self, *args, **opts):
+        profiles = [import_profile() for _ in range(max(1, opts["runs"]))]
+        best = min(profiles, key=lambda p: p["total_ms"])
+        self.stdout.write(f"{len(best['modules'])} modules, {best['total_ms']:.0f}ms total import time "
+                          f"(best of {len(profiles)})")
+        for name, self_ms, cumulative_ms in sorted(best["modules"], key=lambda m: -m[1])[:opts["top"]]:
+            self.stdout.write(f"  {self_ms:8.1f}ms self  {cumulative_ms:8.1f}ms cumulative  {name}")
+        if best["heavy"]:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(best['heavy'])} "
+                               f"(keep {', '.join(HEAVY_MODULES)} behind first use)")
+        if opts["budget_ms"] is not None and best["total_ms"] > opts["budget_ms"]:
+            raise CommandError(f"Startup imports took {best['total_ms']:.0f}ms, budget {opts['budget_ms']:.0f}ms")
+        self.stdout.write(self.style.SUCCESS("No heavy modules on the startup path"))
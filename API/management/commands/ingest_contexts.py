@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from API.ingest import KINDS, SOURCE_TYPES, ingest, parse_records
+
+
+class Command(BaseCommand):
+    help = "Stream an NDJSON file or WhatsApp chat export into ContextEntry rows in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, or - for stdin")
+        parser.add_argument("--kind", choices=KINDS, default="ndjson", help="input format")
+        parser.add_argument("--batch-size", type=int, default=None, help="rows per transaction")
+        parser.add_argument("--source-type", default=None, help="source_type for rows that do not name one")
+        parser.add_argument("--enqueue", action="store_true", help="queue InsightJobs for the new rows")
+        parser.add_argument("--dayfirst", action="store_true", help="WhatsApp dates are DD/MM/YY")
+
+    def handle(self, *args, **opts):
+        kind = opts["kind"]
+        source_type = opts["source_type"] or ("whatsapp" if kind == "whatsapp" else "note")
+        if source_type not in SOURCE_TYPES:
+            raise CommandError(f"--source-type must be one of {', '.join(sorted(SOURCE_TYPES))}")
+        errors = {}
+        try:
+            stream = sys.stdin if opts["path"] == "-" else open(opts["path"], encoding="utf-8", errors="replace")
+        except OSError as e:
+            raise CommandError(e)
+        with stream:
+            summary = ingest(
+                parse_records(stream, kind, dayfirst=opts["dayfirst"], errors=errors),
+                batch_size=opts["batch_size"],
+                enqueue=opts["enqueue"],
+                default_source=source_type,
+                errors=errors,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Created {created} context(s) in {batches} batch(es), "
+            "{duplicates} exact duplicate(s) dropped, {skipped} empty row(s) skipped".format(**summary)
+        ))
+        if errors:
+            self.stdout.write(self.style.WARNING(f"Unparsed or invalid input: {errors}"))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from API.insights import enqueue_missing, process_batch, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Drain the InsightJob queue, filling ContextEntry.processed_insights."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="concurrent model calls")
+        parser.add_argument("--batch", type=int, default=20, help="jobs claimed per round")
+        parser.add_argument("--nlp-workers", type=int, default=None,
+                            help="processes for sentiment/keyword tagging (default: NLP['WORKERS'])")
+        parser.add_argument("--poll", type=float, default=2.0, help="seconds to sleep when idle")
+        parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+        parser.add_argument("--enqueue-missing", action="store_true",
+                            help="first queue existing contexts that have no insights")
+        parser.add_argument("--stale-minutes", type=int, default=15,
+                            help="requeue jobs stuck in 'running' for this long")
+
+    def handle(self, *args, **opts):
+        requeued = requeue_stale(timedelta(minutes=opts["stale_minutes"]))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+        if opts["enqueue_missing"]:
+            self.stdout.write(f"Queued {enqueue_missing()} context(s) without insights")
+
+        total = 0
+        try:
+            while True:
+                handled = process_batch(limit=opts["batch"], workers=opts["workers"], nlp_workers=opts["nlp_workers"])
+                total += handled
+                if handled:
+                    continue
+                if opts["once"]:
+                    break
+                time.sleep(opts["poll"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} job(s)"))
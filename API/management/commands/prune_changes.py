@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from API.changes import prune
+
+
+class Command(BaseCommand):
+    help = "Drop change-feed rows older than the retention window (CHANGE_FEED['RETENTION_DAYS'])."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="keep this many days instead")
+
+    def handle(self, *args, **opts):
+        deleted = prune(opts["days"])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} change row(s)"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from API.category_counts import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute Category.usage_count from the task table in one aggregate query."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="report drift without saving")
+
+    def handle(self, *args, **opts):
+        summary = reconcile(dry_run=opts["dry_run"])
+        self.stdout.write(self.style.SUCCESS(
+            "{corrected} of {categories} category count(s) had drifted{suffix}".format(
+                suffix=" (dry run)" if summary["dry_run"] else "", **summary
+            )
+        ))
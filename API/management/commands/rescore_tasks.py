@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from API.rescoring import rescore_open_tasks
+
+
+class Command(BaseCommand):
+    help = "Recompute priority_score for all open tasks in vectorized chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=5000, help="tasks loaded per chunk")
+        parser.add_argument("--dry-run", action="store_true", help="compute scores without saving")
+
+    def handle(self, *args, **opts):
+        summary = rescore_open_tasks(chunk_size=opts["chunk"], dry_run=opts["dry_run"])
+        self.stdout.write(self.style.SUCCESS(
+            "Scanned {scanned} open task(s), {updated} score(s) changed in {seconds}s"
+            "{suffix}".format(suffix=" (dry run)" if summary["dry_run"] else "", **summary)
+        ))
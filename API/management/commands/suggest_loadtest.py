@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from API.ai_utils import get_ai_suggestions_async
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent suggestion requests at the async path using the offline fake model."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=0.5, help="fake model latency (s)")
+        parser.add_argument("--jitter", type=float, default=0.2)
+        parser.add_argument("--fail-rate", type=float, default=0.0)
+        parser.add_argument("--timeout", type=float, default=None,
+                            help="per-request deadline (default: settings.AI_SUGGEST_TIMEOUT)")
+
+    def handle(self, *args, **opts):
+        fake = {"latency": opts["latency"], "jitter": opts["jitter"], "fail_rate": opts["fail_rate"]}
+        timeout = opts["timeout"] if opts["timeout"] is not None else settings.AI_SUGGEST_TIMEOUT
+        with override_settings(AI_FAKE_MODEL=fake):
+            elapsed, latencies, fallbacks = asyncio.run(
+                self._run(opts["requests"], opts["concurrency"], timeout)
+            )
+
+        latencies.sort()
+        n = len(latencies)
+        self.stdout.write(
+            f"{n} requests, concurrency {opts['concurrency']}, wall {elapsed:.2f}s, "
+            f"{n / elapsed:.1f} req/s\n"
+            f"p50 {latencies[n // 2] * 1000:.0f}ms  p99 {latencies[int(n * 0.99) - 1] * 1000:.0f}ms  "
+            f"heuristic fallbacks {fallbacks}"
+        )
+
+    async def _run(self, total, concurrency, timeout):
+        sem = asyncio.Semaphore(concurrency)
+        latencies = []
+        fallbacks = 0
+
+        async def one(i):
+            nonlocal fallbacks
+            async with sem:
+                start = time.perf_counter()
+                # unique title per request so the suggestion cache never answers
+                result = await get_ai_suggestions_async(f"load test {i}", "", [], timeout=timeout)
+                latencies.append(time.perf_counter() - start)
+                if result.get("suggested_title") != "Fake suggestion":
+                    fallbacks += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start, latencies, fallbacks
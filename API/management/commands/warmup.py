@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from API.startup import WARMUP_STEPS, warm_up
+
+
+class Command(BaseCommand):
+    help = "Load the model SDK, NLP models and in-memory indexes now and report what each step costs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("steps", nargs="*", help=f"steps to run: {', '.join(WARMUP_STEPS)} (default: all)")
+
+    def handle(self, *args, **opts):
+        unknown = set(opts["steps"]) - set(WARMUP_STEPS)
+        if unknown:
+            raise CommandError(f"Unknown step(s): {', '.join(sorted(unknown))}")
+        for step, seconds in warm_up(opts["steps"] or None).items():
+            if seconds is None:
+                self.stdout.write(self.style.WARNING(f"{step}: failed (see log)"))
+            else:
+                self.stdout.write(f"{step}: {seconds * 1000:.0f}ms")
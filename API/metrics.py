@@ -0,0 +1,270 @@
+# API/metrics.py
+"""
+In-process request metrics, exported in Prometheus text format at
+GET /api/metrics/.
+
+MetricsMiddleware (API/middleware.py) opens a per-request scope; hooks in
+the code below it add to that scope and to the process-wide registry:
+
+- every SQL statement (a connection execute wrapper installed on
+  connection_created) adds to the request's query count and DB time;
+- `timed("serialize")` around serializer output, `timed("model")` around
+  Gemini calls (API/gemini_client.py);
+- counters for model tokens, heuristic fallbacks, suggestion sources,
+  suggestion-cache lookups, context tokens trimmed from prompts and model
+  replies by schema check result.
+
+Per endpoint (the URL name, e.g. "tasks-list") the middleware records
+latency, query count, DB time, serializer time and model time histograms,
+and, with METRICS["SERVER_TIMING"], a Server-Timing header that browser
+devtools show per request. The registry is per process: scrape each worker,
+or aggregate with a sum() in PromQL.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "SERVER_TIMING": False,  # add a Server-Timing header to every response
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "METRICS", {})}
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[n] for n in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[n] for n in self.labelnames))
+        return series[-2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, series in items:
+            for bound, n in zip(self.buckets, series):
+                yield f"{self.name}_bucket{_format_labels(names, key + (f'{bound:g}',))} {n}"
+            yield f"{self.name}_bucket{_format_labels(names, key + ('+Inf',))} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:g}"
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+REQUEST_SECONDS = _register(Histogram(
+    "smart_todo_request_seconds", "Request latency until the response is returned.",
+    ("endpoint", "method", "status")))
+REQUEST_QUERIES = _register(Histogram(
+    "smart_todo_request_db_queries", "SQL statements per request.", ("endpoint",), QUERY_BUCKETS))
+REQUEST_DB_SECONDS = _register(Histogram(
+    "smart_todo_request_db_seconds", "Time spent in SQL per request.", ("endpoint",)))
+REQUEST_SERIALIZE_SECONDS = _register(Histogram(
+    "smart_todo_request_serialize_seconds", "Serializer output time per request, SQL excluded.", ("endpoint",)))
+REQUEST_MODEL_SECONDS = _register(Histogram(
+    "smart_todo_request_model_seconds", "Model call time per request.", ("endpoint",)))
+MODEL_CALL_SECONDS = _register(Histogram(
+    "smart_todo_model_call_seconds", "Gemini call latency, retries included.", ("purpose", "outcome")))
+MODEL_TOKENS = _register(Counter(
+    "smart_todo_model_tokens_total", "Tokens sent to (prompt) and received from (output) the model.",
+    ("purpose", "direction")))
+AI_SUGGESTIONS = _register(Counter(
+    "smart_todo_ai_suggestions_total", "Suggestions served, by source (model, cache, insights, heuristic).",
+    ("source",)))
+AI_FALLBACKS = _register(Counter(
+    "smart_todo_ai_fallbacks_total", "Heuristic fallbacks, by cause.", ("reason",)))
+SUGGESTION_CACHE = _register(Counter(
+    "smart_todo_suggestion_cache_lookups_total", "Suggestion cache lookups, by result.", ("result",)))
+MODEL_OUTPUT = _register(Counter(
+    "smart_todo_model_output_total",
+    "Model replies by kind and schema check result (valid, repaired, invalid).", ("kind", "result")))
+PROMPT_TOKENS_TRIMMED = _register(Counter(
+    "smart_todo_prompt_tokens_trimmed_total",
+    "Context tokens kept out of prompts, by step (quoted, compacted).", ("step",)))
+
+
+def render():
+    """The registry in Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+class RequestScope:
+    """What one request spent, filled in by the hooks below."""
+    __slots__ = ("queries", "db_seconds", "phases", "_active")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.phases = {}
+        self._active = set()
+
+
+_scope = contextvars.ContextVar("smart_todo_request_scope", default=None)
+
+
+def begin_request():
+    return _scope.set(RequestScope())
+
+
+def end_request(token):
+    scope = _scope.get()
+    _scope.reset(token)
+    return scope
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the wall time of the block, minus SQL run inside it, to `phase` of
+    the current request. Nested blocks of the same phase count once.
+    """
+    scope = _scope.get()
+    if scope is None or phase in scope._active:
+        yield
+        return
+    scope._active.add(phase)
+    db_before = scope.db_seconds
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (scope.db_seconds - db_before)
+        scope.phases[phase] = scope.phases.get(phase, 0.0) + max(0.0, elapsed)
+        scope._active.discard(phase)
+
+
+def _record_query(execute, sql, params, many, context):
+    scope = _scope.get()
+    if scope is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        scope.queries += 1
+        scope.db_seconds += time.perf_counter() - start
+
+
+def install_query_hook(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@receiver(connection_created)
+def _hook_new_connection(sender, connection, **kwargs):
+    install_query_hook(connection)
+
+
+def _response_tokens(resp, prompt):
+    """(prompt, output) token counts: the SDK's usage metadata, else ~4 chars per token."""
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is not None and getattr(usage, "prompt_token_count", None):
+        return usage.prompt_token_count, getattr(usage, "candidates_token_count", 0) or 0
+    text = getattr(resp, "text", "") if resp is not None else ""
+    return len(str(prompt)) // 4, len(text or "") // 4
+
+
+def record_model_call(purpose, seconds, prompt, resp=None, error=None):
+    MODEL_CALL_SECONDS.observe(seconds, purpose=purpose, outcome="error" if error is not None else "ok")
+    sent, received = _response_tokens(resp, prompt)
+    MODEL_TOKENS.inc(sent, purpose=purpose, direction="prompt")
+    if received:
+        MODEL_TOKENS.inc(received, purpose=purpose, direction="output")
+
+
+def observe_request(endpoint, method, status, seconds, scope):
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint, method=method, status=status)
+    REQUEST_QUERIES.observe(scope.queries, endpoint=endpoint)
+    REQUEST_DB_SECONDS.observe(scope.db_seconds, endpoint=endpoint)
+    if "serialize" in scope.phases:
+        REQUEST_SERIALIZE_SECONDS.observe(scope.phases["serialize"], endpoint=endpoint)
+    if "model" in scope.phases:
+        REQUEST_MODEL_SECONDS.observe(scope.phases["model"], endpoint=endpoint)
+
+
+def server_timing(seconds, scope):
+    """Server-Timing header value for one request (durations in ms)."""
+    parts = [f'db;dur={scope.db_seconds * 1000:.1f};desc="{scope.queries} queries"']
+    parts += [f"{phase};dur={spent * 1000:.1f}" for phase, spent in sorted(scope.phases.items())]
+    parts.append(f"total;dur={seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def reset():
+    """Zero every metric (tests)."""
+    for metric in REGISTRY:
+        with metric._lock:
+            (metric._values if isinstance(metric, Counter) else metric._series).clear()
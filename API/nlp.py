@@ -0,0 +1,170 @@
+# API/nlp.py
+"""
+Sentiment and keyword extraction for the analyzer (API/Gemini.py).
+
+TextBlob POS tagging is the expensive part, so each text is tagged once,
+sentiment and keywords come from the same pass, and results are memoized
+by text hash in a bounded LRU shared by the process. Batches are
+de-duplicated first; a large batch can be spread over a process pool
+(NLP["WORKERS"]), which sidesteps the GIL for the tagger.
+
+Keywords are the nouns and verbs of the text ranked by frequency, ties by
+first appearance, so the same text always yields the same list.
+
+    from API.nlp import get_nlp
+    get_nlp().analyze(["Submit the report by Friday", ...])
+    # [{"sentiment": "neutral", "keywords": ["submit", "report", "friday"]}, ...]
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_CONFIG = {
+    "CACHE_SIZE": 4096,       # memoized texts
+    "TOP_KEYWORDS": 5,
+    "WORKERS": 0,             # processes for large batches; 0 keeps everything in-process
+    "POOL_MIN_BATCH": 64,     # smaller batches are not worth the pickling
+}
+
+POSITIVE, NEGATIVE = 0.1, -0.1  # polarity thresholds
+
+
+def get_config():
+    conf = dict(DEFAULT_CONFIG)
+    if settings.configured:
+        conf.update(getattr(settings, "NLP", {}))
+    return conf
+
+
+def sentiment_label(polarity):
+    if polarity > POSITIVE:
+        return "positive"
+    if polarity < NEGATIVE:
+        return "negative"
+    return "neutral"
+
+
+def rank_keywords(tags, top=5):
+    """Nouns and verbs from (word, tag) pairs, most frequent first, ties by first appearance."""
+    counts = {}
+    for word, tag in tags:
+        if tag.startswith(("NN", "VB")):
+            word = word.lower()
+            counts[word] = counts.get(word, 0) + 1
+    # dicts keep insertion order, and sorted() is stable
+    return [word for word, _ in sorted(counts.items(), key=lambda item: -item[1])[:top]]
+
+
+def textblob_analyzer(text, top=5):
+    """One TextBlob pass: {"sentiment", "keywords"}. Module level so a process pool can pickle it."""
+    from textblob import TextBlob  # heavy (pulls in NLTK); first call only
+
+    blob = TextBlob(text)
+    return {"sentiment": sentiment_label(blob.sentiment.polarity), "keywords": rank_keywords(blob.tags, top)}
+
+
+def _key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class NLPService:
+    def __init__(self, analyzer=textblob_analyzer, cache_size=4096, top=5, workers=0, pool_min_batch=64):
+        self.analyzer = analyzer
+        self.cache_size = cache_size
+        self.top = top
+        self.workers = workers
+        self.pool_min_batch = pool_min_batch
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _store(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def analyze(self, texts, workers=None):
+        """
+        {"sentiment", "keywords"} for each text, in order. Each distinct
+        uncached text is analyzed once; with `workers` (default
+        NLP["WORKERS"]) processes when enough of them are uncached.
+        """
+        workers = self.workers if workers is None else workers
+        keys = [_key(text or "") for text in texts]
+        found, todo = {}, {}
+        for key, text in zip(keys, texts):
+            if key in found or key in todo:
+                continue
+            cached = self._lookup(key)
+            if cached is not None:
+                found[key] = cached
+            else:
+                todo[key] = text or ""
+        if todo:
+            pending = list(todo.values())
+            tops = [self.top] * len(pending)
+            if workers and len(pending) >= self.pool_min_batch:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(self.analyzer, pending, tops,
+                                            chunksize=max(1, len(pending) // (workers * 4))))
+            else:
+                results = list(map(self.analyzer, pending, tops))
+            for key, result in zip(todo, results):
+                self._store(key, result)
+                found[key] = result
+        # copies, so callers cannot corrupt the memo
+        return [{"sentiment": found[k]["sentiment"], "keywords": list(found[k]["keywords"])} for k in keys]
+
+    def analyze_one(self, text):
+        return self.analyze([text])[0]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_nlp():
+    """Return the process-wide NLPService, building it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                conf = get_config()
+                _service = NLPService(
+                    cache_size=conf["CACHE_SIZE"], top=conf["TOP_KEYWORDS"],
+                    workers=conf["WORKERS"], pool_min_batch=conf["POOL_MIN_BATCH"],
+                )
+    return _service
+
+
+def reset_nlp():
+    global _service
+    with _service_lock:
+        _service = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting == "NLP":
+        reset_nlp()
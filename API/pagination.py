@@ -0,0 +1,26 @@
+# API/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Only kicks in when the client asks for it with ?page_size= or ?cursor=,
+    so the existing dashboard pages that expect a plain list keep working.
+    Each page is a single indexed range query, however deep the cursor.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CategoryCursorPagination(OptionalCursorPagination):
+    ordering = ("name",)
@@ -0,0 +1,208 @@
+# API/prompts.py
+"""
+Prompt budgeting for every model call (API/Gemini.py, API/ai_utils.py,
+API/batch_suggest.py).
+
+User text is the only part of a prompt whose size we do not control, so it
+is fitted before it is pasted in:
+
+1. `strip_quoted` drops what the model has already seen or does not need:
+   quoted reply chains in emails ("> ..." lines, everything below an
+   "On ... wrote:" / "-----Original Message-----" / Outlook "From:/Sent:"
+   header), repeated chat lines (the same WhatsApp message forwarded twice)
+   and chat noise such as "<Media omitted>".
+2. `compact` keeps the text as is when it fits, and otherwise selects whole
+   sentences extractively: the first sentence (usually the ask), then the
+   sentences that share its words, carry recurring (but not ubiquitous)
+   content words or mention a deadline, in their original order, with
+   "[...]" marking the gaps.
+
+Both steps are deterministic, so the same context always yields the same
+prompt (and the same suggestion-cache key). Tokens are estimated at ~4
+characters each, like the model-token metrics.
+
+Prompts put their static instructions first and the per-call values last,
+so consecutive calls share a long identical prefix that the provider can
+serve from its prompt cache.
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from .metrics import PROMPT_TOKENS_TRIMMED
+
+DEFAULT_CONFIG = {
+    "MAX_PROMPT_TOKENS": 3000,     # whole prompt, instructions included
+    "MAX_CONTEXT_TOKENS": 1200,    # one context text
+    "MAX_FIELD_TOKENS": 200,       # title / description typed by the user
+    "BATCH_CONTEXT_TOKENS": 300,   # one context in a batch prompt
+    "STRIP_QUOTED": True,
+}
+
+CHARS_PER_TOKEN = 4
+MIN_CONTEXT_TOKENS = 32
+GAP = " [...] "
+
+# "On Mon, 5 Aug 2024 at 10:02, Ravi <ravi@x.com> wrote:" (may wrap onto two lines)
+_ON_WROTE = re.compile(r"^On\s.{4,200}?\bwrote:$", re.I)
+_ON_START = re.compile(r"^On\s.{4,200}$", re.I)
+_ORIGINAL = re.compile(r"^-{2,}\s*(?:Original Message|Reply message)\s*-{2,}$", re.I)
+_HEADER_FROM = re.compile(r"^\*?From:\*?\s")
+_HEADER_NEXT = re.compile(r"^\*?(?:Sent|Date|To):\*?\s")
+# "[31/12/2023, 21:41:05] Alice: text" / "12/31/23, 9:41 PM - Alice: text" (as in API/ingest.py)
+_CHAT_PREFIX = re.compile(
+    r"^\[?\d{1,2}[/.]\d{1,2}[/.]\d{2,4},?\s+\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap]\.?[Mm]\.?)?\]?\s*(?:-\s*)?"
+    r"(?:[^:]{1,40}:\s)?"
+)
+_CHAT_NOISE = {
+    "<media omitted>", "image omitted", "video omitted", "sticker omitted", "audio omitted",
+    "this message was deleted", "you deleted this message",
+}
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+_DEADLINE_CUE = re.compile(
+    r"\b(?:by|due|deadline|before|until|asap|urgent|eod|today|tonight|tomorrow|"
+    r"mon|tue|wed|thu|fri|sat|sun)\w*|\d",
+    re.I,
+)
+_STOPWORDS = frozenset(
+    "the and for are but not you your with this that from have has had was were will would "
+    "can could should our out all any its it's they them their there then than also just "
+    "into about what when which who how been being get got please thanks thank regards hi hello".split()
+)
+
+
+def get_config():
+    conf = dict(DEFAULT_CONFIG)
+    if settings.configured:
+        conf.update(getattr(settings, "PROMPT_BUDGET", {}))
+    return conf
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _reply_header(lines, i):
+    """True when lines[i] starts a quoted reply (everything below it is the old thread)."""
+    line = lines[i].strip()
+    nxt = next((l.strip() for l in lines[i + 1:] if l.strip()), "")
+    if _ON_WROTE.match(line) or _ORIGINAL.match(line):
+        return True
+    if _ON_START.match(line) and nxt.lower() == "wrote:":
+        return True
+    return bool(_HEADER_FROM.match(line) and _HEADER_NEXT.match(nxt))
+
+
+def strip_quoted(text):
+    """`text` without quoted reply chains, repeated lines and chat noise."""
+    lines = (text or "").splitlines()
+    kept, seen = [], set()
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            if kept and kept[-1]:
+                kept.append("")
+            continue
+        if any(kept) and _reply_header(lines, i):
+            break
+        if stripped.startswith(">"):
+            continue
+        body = _CHAT_PREFIX.sub("", stripped, count=1)
+        key = " ".join(_WORD.findall(body.lower()))
+        if body.lower() in _CHAT_NOISE or (key and key in seen):
+            continue
+        seen.add(key)
+        kept.append(stripped)
+    result = "\n".join(kept).strip()
+    # a message that is nothing but a quote is still the context
+    return result or (text or "").strip()
+
+
+def _truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(0, max_chars - len(GAP))]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + GAP.rstrip()
+
+
+def compact(text, max_tokens):
+    """
+    `text` within `max_tokens`: unchanged when it fits, otherwise an
+    extractive summary of whole sentences in their original order.
+    """
+    text = (text or "").strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    if len(sentences) < 3:
+        return _truncate(" ".join(sentences), max_chars)
+
+    words = [{w for w in _WORD.findall(s.lower()) if len(w) > 2 and w not in _STOPWORDS} for s in sentences]
+    df = Counter(w for ws in words for w in ws)
+    n = len(sentences)
+    # Words that recur are the topic, words in every sentence (boilerplate,
+    # signatures) are not: weight by sentence count damped by spread.
+    weight = {w: math.log(1 + d) * math.log((n + 1) / d) for w, d in df.items()}
+
+    def score(i):
+        if i == 0:
+            return math.inf
+        ws = words[i]
+        base = sum(weight[w] for w in ws) / math.sqrt(len(ws)) if ws else 0.0
+        return base + len(ws & words[0]) + (2.0 if _DEADLINE_CUE.search(sentences[i]) else 0.0)
+
+    chosen, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: (-score(i), i)):
+        cost = len(sentences[i]) + len(GAP)
+        if i == 0 and cost > max_chars:
+            return _truncate(sentences[0], max_chars)
+        if used + cost <= max_chars:
+            chosen.add(i)
+            used += cost
+
+    parts, previous = [], -1
+    for i in sorted(chosen):
+        if parts:
+            parts.append(" " if i == previous + 1 else GAP)
+        parts.append(sentences[i])
+        previous = i
+    if previous != len(sentences) - 1:
+        parts.append(GAP.rstrip())
+    return "".join(parts)
+
+
+def _count_trimmed(before, after, step):
+    saved = estimate_tokens(before) - estimate_tokens(after)
+    if saved > 0:
+        PROMPT_TOKENS_TRIMMED.inc(saved, step=step)
+
+
+def fit_context(text, reserved_tokens=0, max_tokens=None):
+    """
+    A context text ready for a prompt whose other parts take
+    `reserved_tokens`: quoted chains stripped, then compacted to
+    min(max_tokens or MAX_CONTEXT_TOKENS, what is left of MAX_PROMPT_TOKENS).
+    """
+    conf = get_config()
+    limit = conf["MAX_CONTEXT_TOKENS"] if max_tokens is None else max_tokens
+    limit = max(MIN_CONTEXT_TOKENS, min(limit, conf["MAX_PROMPT_TOKENS"] - reserved_tokens))
+    text = (text or "").strip()
+    if conf["STRIP_QUOTED"]:
+        stripped = strip_quoted(text)
+        _count_trimmed(text, stripped, "quoted")
+        text = stripped
+    fitted = compact(text, limit)
+    _count_trimmed(text, fitted, "compacted")
+    return fitted
+
+
+def fit_field(text):
+    """A short user-typed field (title, description) capped at MAX_FIELD_TOKENS."""
+    return compact(text, get_config()["MAX_FIELD_TOKENS"])
@@ -0,0 +1,131 @@
+# API/rescoring.py
+"""
+Bulk re-prioritization of open tasks.
+
+Task.priority_score is only set when a task is created, so it goes stale
+as deadlines approach. rescore_open_tasks() walks open tasks in id-ordered
+chunks, turns each chunk into NumPy columns (days to deadline, age,
+category weight, urgency keywords), computes every score in one vectorized
+step and writes back only the rows that changed, batching rows that share
+a score into one UPDATE.
+
+Used by `python manage.py rescore_tasks` and POST /api/tasks/rescore/.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from AI_todo.models import Task
+
+from .changes import record
+from .keyword_rules import get_classifier
+
+OPEN_STATUSES = ("pending", "in_progress")
+WRITE_BATCH = 900  # ids per UPDATE, below SQLite's bound-parameter limit
+
+DEFAULT_WEIGHTS = {
+    "BASE": 3.0,
+    "DEADLINE": 5.0,           # added in full when due today or overdue
+    "DEADLINE_HALF_LIFE": 3.0, # days until the deadline bonus halves
+    "URGENT": 2.0,             # urgency keyword in title/description
+    "AGE_PER_WEEK": 0.25,      # slow creep for tasks left open
+    "AGE_MAX": 1.0,
+    "CATEGORIES": {},          # category name -> bonus, e.g. {"Work / Dev": 0.5}
+}
+
+
+def get_weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, "AI_RESCORE_WEIGHTS", {})}
+
+
+def compute_scores(days_to_deadline, age_days, category_weight, urgent, weights):
+    """
+    Vectorized score for one chunk. days_to_deadline holds NaN for tasks
+    without a deadline. Returns scores clipped to 0-10, rounded to 2 places.
+    """
+    import numpy as np
+
+    has_deadline = ~np.isnan(days_to_deadline)
+    days = np.where(has_deadline, np.maximum(days_to_deadline, 0.0), 0.0)
+    deadline_bonus = np.where(
+        has_deadline, weights["DEADLINE"] * np.exp2(-days / weights["DEADLINE_HALF_LIFE"]), 0.0
+    )
+    age_bonus = np.minimum(age_days / 7.0 * weights["AGE_PER_WEEK"], weights["AGE_MAX"])
+    scores = weights["BASE"] + deadline_bonus + age_bonus + category_weight + urgent * weights["URGENT"]
+    return np.round(np.clip(scores, 0.0, 10.0), 2)
+
+
+def _chunk_columns(rows, today, now_ts, weights):
+    import numpy as np
+
+    ids, deadlines, created, categories, titles, descs, old = zip(*rows)
+    deadline_arr = np.array([d.isoformat() if d else "NaT" for d in deadlines], dtype="datetime64[D]")
+    days_to_deadline = np.where(
+        np.isnat(deadline_arr), np.nan, (deadline_arr - np.datetime64(today, "D")).astype(float)
+    )
+    age_days = (now_ts - np.array([c.timestamp() for c in created])) / 86400.0
+    cat_weights = weights["CATEGORIES"]
+    category_weight = np.array([cat_weights.get(c, 0.0) for c in categories], dtype=float)
+    classifier = get_classifier()
+    urgent = np.array([classifier.classify(f"{t} {d}")["urgent"] for t, d in zip(titles, descs)], dtype=float)
+    return np.array(ids), days_to_deadline, age_days, category_weight, urgent, np.array(old, dtype=float)
+
+
+def _write_scores(ids, scores, now):
+    """
+    Save new scores for one chunk. Scores are rounded to 2 decimals, so a
+    chunk has few distinct values; one UPDATE ... WHERE id IN (...) per value
+    is far cheaper than bulk_update's per-row CASE expression.
+    """
+    import numpy as np
+
+    order = np.argsort(scores, kind="stable")
+    values, starts = np.unique(scores[order], return_index=True)
+    groups = np.split(ids[order], starts[1:])
+    with transaction.atomic():
+        for value, group in zip(values, groups):
+            group = group.tolist()
+            for n in range(0, len(group), WRITE_BATCH):
+                Task.objects.filter(id__in=group[n:n + WRITE_BATCH]).update(
+                    priority_score=float(value), updated_at=now
+                )
+        record("task", ids.tolist())
+
+
+def rescore_open_tasks(chunk_size=5000, dry_run=False):
+    """Recompute priority_score for every open task. Returns a summary dict."""
+    import numpy as np
+
+    weights = get_weights()
+    today = timezone.localdate()
+    now = timezone.now()
+    started = time.perf_counter()
+    scanned = updated = 0
+    last_id = 0
+
+    while True:
+        rows = list(
+            Task.objects.filter(status__in=OPEN_STATUSES, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "deadline", "created_at", "category__name",
+                         "title", "description", "priority_score")[:chunk_size]
+        )
+        if not rows:
+            break
+        ids, days, age, cat_w, urgent, old = _chunk_columns(rows, today, now.timestamp(), weights)
+        scores = compute_scores(days, age, cat_w, urgent, weights)
+        changed = np.nonzero(np.abs(scores - old) > 1e-9)[0]
+        if changed.size and not dry_run:
+            _write_scores(ids[changed], scores[changed], now)
+        scanned += len(rows)
+        updated += int(changed.size)
+        last_id = int(ids[-1])
+
+    return {
+        "scanned": scanned,
+        "updated": updated,
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,369 @@
+# API/schemas.py
+"""
+Schemas for the JSON the model returns: a suggestion (API/ai_utils.py), a
+batch of suggestions (API/batch_suggest.py) and a task analysis
+(API/Gemini.py).
+
+Each schema is written once, as a small JSON-Schema-like dict, and used
+twice:
+
+- sent to the model as `response_schema` (with response_mime_type
+  application/json) so the reply is constrained to it (`output_config`,
+  switched by STRUCTURED_OUTPUT["REQUEST_SCHEMA"]);
+- compiled into a validator, a tree of closures built at import time, so
+  checking a reply is a single pass over the data with no schema lookups.
+
+The validator repairs what models commonly get wrong instead of rejecting
+the reply: numbers sent as strings ("8", "8/10") and out of range, strings
+sent as numbers, enum values in the wrong case or spacing, comma-separated
+strings instead of lists, duplicates, overlong text, missing fields (the
+schema default). A reply only counts as invalid when it holds none of the
+schema's fields.
+
+`parse_json` finds the JSON value in the reply with json's raw_decode
+(fences and prose around it are skipped, raw newlines inside strings are
+accepted). Truncated or malformed objects fall back to the incremental
+parser (API/json_stream.py), which keeps every field that was complete.
+Outcomes are counted in smart_todo_model_output_total (API/metrics.py).
+"""
+import json
+import math
+import re
+
+from django.conf import settings
+
+from .json_stream import JSONObjectStream
+from .metrics import MODEL_OUTPUT
+
+DEFAULT_CONFIG = {
+    "REQUEST_SCHEMA": True,   # ask the model for schema-constrained JSON
+}
+
+_MISSING = object()
+_DECODER = json.JSONDecoder(strict=False)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# Keys the Gemini API understands in a response_schema
+_MODEL_KEYS = ("type", "description", "nullable", "enum", "items", "properties", "required")
+
+
+def get_config():
+    conf = dict(DEFAULT_CONFIG)
+    if settings.configured:
+        conf.update(getattr(settings, "STRUCTURED_OUTPUT", {}))
+    return conf
+
+
+def _enum_key(value):
+    return value.casefold().replace("_", "-").replace(" ", "-")
+
+
+def _string(schema, path, fallback):
+    enum = {_enum_key(v): v for v in schema["enum"]} if "enum" in schema else None
+    max_length = schema.get("maxLength")
+    date_only = schema.get("format") == "date"
+
+    def check(value, problems):
+        if isinstance(value, str):
+            text = value.strip()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            text = str(value)
+            problems.append((path, "repaired"))
+        elif isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+            text = ", ".join(str(v).strip() for v in value)
+            problems.append((path, "repaired"))
+        else:
+            problems.append((path, "invalid"))
+            return fallback()
+        if enum is not None:
+            match = enum.get(_enum_key(text))
+            if match is None:
+                problems.append((path, "invalid"))
+                return fallback()
+            if match != text:
+                problems.append((path, "repaired"))
+            text = match
+        if date_only and text:
+            found = _DATE.search(text)
+            if found is None:
+                problems.append((path, "invalid"))
+                return fallback()
+            if found.group() != text:
+                problems.append((path, "repaired"))
+            text = found.group()
+        if max_length and len(text) > max_length:
+            text = text[:max_length].rstrip()
+            problems.append((path, "repaired"))
+        return text
+
+    return check
+
+
+def _number(schema, path, fallback):
+    integer = schema["type"] == "integer"
+    low, high = schema.get("minimum"), schema.get("maximum")
+
+    def check(value, problems):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            number = value
+        elif isinstance(value, str) and (found := _NUMBER.search(value)):
+            number = float(found.group())
+            problems.append((path, "repaired"))
+        else:
+            problems.append((path, "invalid"))
+            return fallback()
+        if not math.isfinite(number):
+            problems.append((path, "invalid"))
+            return fallback()
+        if low is not None and number < low:
+            number = low
+            problems.append((path, "repaired"))
+        elif high is not None and number > high:
+            number = high
+            problems.append((path, "repaired"))
+        return int(round(number)) if integer else float(number)
+
+    return check
+
+
+def _array(schema, path, fallback):
+    item = _compile(schema["items"], path + "[]")
+    max_items = schema.get("maxItems")
+    unique = schema.get("uniqueItems", False)
+
+    def check(value, problems):
+        if isinstance(value, str):
+            value = value.replace(";", ",").replace("\n", ",").split(",")
+            problems.append((path, "repaired"))
+        elif not isinstance(value, list):
+            problems.append((path, "invalid"))
+            return fallback()
+        out, seen = [], set()
+        for raw in value:
+            item_problems = []
+            clean = item(raw, item_problems)
+            if clean in ("", None) or any(action != "repaired" for _, action in item_problems):
+                problems.append((path, "repaired"))  # unusable items are dropped
+                continue
+            problems.extend(item_problems)
+            if unique:
+                key = clean if isinstance(clean, str) else json.dumps(clean, sort_keys=True)
+                if key in seen:
+                    continue
+                seen.add(key)
+            out.append(clean)
+            if max_items and len(out) == max_items:
+                break
+        return out
+
+    return check
+
+
+def _object(schema, path, fallback):
+    fields = [(name, _compile(sub, f"{path}.{name}")) for name, sub in schema["properties"].items()]
+
+    def check(value, problems):
+        if not isinstance(value, dict):
+            problems.append((path, "invalid"))
+            return fallback()
+        return {name: field(value.get(name, _MISSING), problems) for name, field in fields}
+
+    return check
+
+
+_BUILDERS = {"string": _string, "number": _number, "integer": _number, "array": _array, "object": _object}
+
+
+def _compile(schema, path):
+    kind = schema["type"]
+    nullable = schema.get("nullable", False)
+    if kind == "object":
+        def fallback():
+            return check({}, [])
+    elif kind == "array":
+        def fallback():
+            return []
+    else:
+        default = schema.get("default", "" if kind == "string" else None)
+
+        def fallback():
+            return default
+    check = _BUILDERS[kind](schema, path, fallback)
+
+    def run(value, problems):
+        if value is None and nullable:
+            return None
+        if value is _MISSING or value is None:
+            problems.append((path, "missing"))
+            return fallback()
+        return check(value, problems)
+
+    return run
+
+
+def _model_schema(schema):
+    """`schema` restricted to what the Gemini API accepts as response_schema."""
+    out = {k: v for k, v in schema.items() if k in _MODEL_KEYS and k not in ("items", "properties")}
+    out["type"] = schema["type"].upper()
+    if "items" in schema:
+        out["items"] = _model_schema(schema["items"])
+    if "properties" in schema:
+        out["properties"] = {name: _model_schema(sub) for name, sub in schema["properties"].items()}
+    return out
+
+
+class CompiledSchema:
+    """A schema for one kind of model reply (top level: an object, or an array of objects)."""
+
+    def __init__(self, name, schema):
+        self.name = name
+        self.schema = schema
+        self.model_schema = _model_schema(schema)
+        item = schema["items"] if schema["type"] == "array" else schema
+        self.properties = frozenset(item["properties"])
+        self._item = _compile(item, "$")
+        self._fields = {field: _compile(sub, field) for field, sub in item["properties"].items()}
+
+    def validate(self, value):
+        """
+        (clean, problems) for one reply object: `clean` is None when it holds
+        none of the schema's fields; problems are (path, "repaired" |
+        "missing" | "invalid") pairs.
+        """
+        if not isinstance(value, dict) or not self.properties.intersection(value):
+            return None, [("$", "invalid")]
+        problems = []
+        return self._item(value, problems), problems
+
+    def field(self, name, value):
+        """One field checked on its own (streamed replies); None if unknown or unusable."""
+        check = self._fields.get(name)
+        if check is None:
+            return None
+        problems = []
+        clean = check(value, problems)
+        return None if any(action != "repaired" for _, action in problems) else clean
+
+
+def parse_json(text, opener="{"):
+    """
+    (value, repaired) for the first JSON object (opener "{") or array ("[")
+    in a model reply; value is None when there is none.
+    """
+    text = text or ""
+    start = text.find(opener)
+    if start == -1:
+        return None, False
+    try:
+        return _DECODER.raw_decode(text, start)[0], False
+    except ValueError:
+        pass
+    if opener == "{":
+        parser = JSONObjectStream()
+        parser.feed(text[start:])
+        return (parser.fields or None), True
+    # an array that does not decode: keep the objects inside it that do
+    items, pos = [], start + 1
+    while (at := text.find("{", pos)) != -1:
+        try:
+            value, pos = _DECODER.raw_decode(text, at)
+        except ValueError:
+            parser = JSONObjectStream()
+            parser.feed(text[at:])
+            value, pos = parser.fields, at + 1
+        if isinstance(value, dict) and value:
+            items.append(value)
+    return (items or None), True
+
+
+def _count(schema, clean, problems, repaired):
+    if clean is None:
+        result = "invalid"
+    elif repaired or problems:
+        result = "repaired"
+    else:
+        result = "valid"
+    MODEL_OUTPUT.inc(kind=schema.name, result=result)
+
+
+def check_reply(value, schema, repaired=False):
+    """`value` (a decoded reply object) validated against `schema`, or None when unusable."""
+    clean, problems = schema.validate(value)
+    _count(schema, clean, problems, repaired)
+    return clean
+
+
+def parse_reply(text, schema):
+    """The validated object in a model reply, or None when nothing usable is in it."""
+    value, repaired = parse_json(text, "{")
+    return check_reply(value, schema, repaired)
+
+
+def parse_items(text, schema):
+    """The validated objects of a model reply holding a JSON array (batch replies)."""
+    value, repaired = parse_json(text, "[")
+    items = []
+    for raw in value if isinstance(value, list) else ():
+        clean, problems = schema.validate(raw)
+        _count(schema, clean, problems, repaired)
+        if clean is not None:
+            items.append(clean)
+    if not items:
+        MODEL_OUTPUT.inc(kind=schema.name, result="invalid")
+    return items
+
+
+def output_config(schema):
+    """generate_content kwargs asking for JSON constrained to `schema` (empty when disabled)."""
+    if not get_config()["REQUEST_SCHEMA"]:
+        return {}
+    return {"generation_config": {
+        "response_mime_type": "application/json",
+        "response_schema": schema.model_schema,
+    }}
+
+
+SUGGESTION = CompiledSchema("suggestion", {
+    "type": "object",
+    "properties": {
+        "suggested_title": {"type": "string", "maxLength": 120},
+        "priority_score": {"type": "number", "minimum": 0, "maximum": 10, "default": 5.0},
+        "suggested_deadline": {"type": "string", "format": "date"},
+        "category": {"type": "string", "maxLength": 60, "default": "General"},
+        "enhanced_description": {"type": "string", "maxLength": 500},
+    },
+    "required": ["suggested_title", "priority_score", "suggested_deadline", "category", "enhanced_description"],
+})
+
+SUGGESTION_BATCH = CompiledSchema("suggestion_batch", {
+    "type": "array",
+    "items": {
+        **SUGGESTION.schema,
+        "properties": {"id": {"type": "integer", "minimum": 0}, **SUGGESTION.schema["properties"]},
+        "required": ["id", *SUGGESTION.schema["required"]],
+    },
+})
+
+ANALYSIS = CompiledSchema("analysis", {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "maxLength": 200},
+        "description": {"type": "string"},
+        "category": {"type": "string", "maxLength": 60, "default": "Uncategorized"},
+        "deadline": {
+            "type": "object",
+            "properties": {"date": {"type": "string"}, "text": {"type": "string"}},
+            "required": ["date", "text"],
+        },
+        "status": {"type": "string", "enum": ["pending", "on-progress", "done"], "default": "pending"},
+        "priority_score": {"type": "integer", "minimum": 1, "maximum": 10, "default": 5},
+        "sentiment_analysis": {"type": "string", "enum": ["positive", "neutral", "negative"],
+                               "default": "neutral"},
+        "keywords": {"type": "array", "items": {"type": "string"}, "maxItems": 5, "uniqueItems": True},
+        "time_required": {"type": "number", "minimum": 0, "default": 1.0},
+        "best_time": {"type": "string", "default": "Anytime"},
+        "dependencies": {"type": "array", "items": {"type": "string"}, "uniqueItems": True},
+    },
+    "required": ["title", "description", "category", "deadline", "status", "priority_score",
+                 "sentiment_analysis", "keywords", "time_required", "best_time", "dependencies"],
+})
@@ -0,0 +1,101 @@
+# API/search.py
+"""
+Full-text search over tasks and context entries.
+
+On SQLite this queries the FTS5 indexes created by migration
+AI_todo/0004_search_index (bm25 ranking, highlighted snippets). Other
+database backends fall back to icontains lookups so the endpoint still works.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from AI_todo.models import ContextEntry, Task
+
+SNIPPET_OPEN = "["
+SNIPPET_CLOSE = "]"
+SNIPPET_TOKENS = 12
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# (kind, fts table, source table, extra columns to return)
+_FTS_SOURCES = {
+    "task": ("ai_todo_task_fts", "AI_todo_task", ["title", "status"]),
+    "context": ("ai_todo_contextentry_fts", "AI_todo_contextentry", ["source_type", "created_at"]),
+}
+
+
+def build_match_query(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must occur,
+    the last one as a prefix so results appear while the user is typing.
+    Returns "" when the text has no searchable words.
+    """
+    words = _WORD_RE.findall(q or "")
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def _fts_search(kind, match, limit):
+    fts, source, extra = _FTS_SOURCES[kind]
+    extra_sql = ", ".join(f"s.{c}" for c in extra)
+    sql = (
+        f"SELECT s.id, {extra_sql}, bm25({fts}) AS rank, "
+        f"snippet({fts}, -1, %s, %s, '…', %s) "
+        f"FROM {fts} JOIN {source} s ON s.id = {fts}.rowid "
+        f"WHERE {fts} MATCH %s ORDER BY rank LIMIT %s"
+    )
+    with connection.cursor() as cur:
+        cur.execute(sql, [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_TOKENS, match, limit])
+        rows = cur.fetchall()
+    out = []
+    for row in rows:
+        item = {"type": kind, "id": row[0]}
+        item.update(zip(extra, row[1:1 + len(extra)]))
+        item["rank"] = round(row[-2], 4)
+        item["snippet"] = row[-1]
+        out.append(item)
+    return out
+
+
+def _snippet(text, words, width=80):
+    lowered = text.lower()
+    pos = min((p for p in (lowered.find(w.lower()) for w in words) if p != -1), default=0)
+    start = max(0, pos - width // 2)
+    return ("…" if start else "") + text[start:start + width] + ("…" if start + width < len(text) else "")
+
+
+def _fallback_search(kind, q, limit):
+    words = _WORD_RE.findall(q)
+    if kind == "task":
+        qs = Task.objects.all()
+        for w in words:
+            qs = qs.filter(Q(title__icontains=w) | Q(description__icontains=w))
+        rows = qs.order_by("-created_at")[:limit]
+        return [{"type": "task", "id": t.id, "title": t.title, "status": t.status, "rank": 0.0,
+                 "snippet": _snippet(f"{t.title} {t.description}", words)} for t in rows]
+    qs = ContextEntry.objects.all()
+    for w in words:
+        qs = qs.filter(content__icontains=w)
+    rows = qs.order_by("-created_at")[:limit]
+    return [{"type": "context", "id": c.id, "source_type": c.source_type, "created_at": c.created_at,
+             "rank": 0.0, "snippet": _snippet(c.content, words)} for c in rows]
+
+
+def search(q, kinds=("task", "context"), limit=20):
+    """Return up to `limit` hits across `kinds`, best match first."""
+    match = build_match_query(q)
+    if not match:
+        return []
+    results = []
+    for kind in kinds:
+        if connection.vendor == "sqlite":
+            results.extend(_fts_search(kind, match, limit))
+        else:
+            results.extend(_fallback_search(kind, q, limit))
+    # bm25 scores are negative, lower is better
+    results.sort(key=lambda r: r["rank"])
+    return results[:limit]
@@ -1,13 +1,46 @@
 from rest_framework import serializers
 from AI_todo.models import Task, Category, ContextEntry
 
-class CategorySerializer(serializers.ModelSerializer):
-    class Meta: model = Category; fields = ["id","name","usage_count"]
+from .metrics import timed
 
-class ContextEntrySerializer(serializers.ModelSerializer):
-    class Meta: model = ContextEntry; fields = ["id","content","source_type","created_at","processed_insights"]
 
-class TaskSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Accept a `fields` kwarg (iterable of names) and drop every other field.
+    Views pass it from ?fields=a,b,c; unknown names are ignored.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        with timed("serialize"):  # request metrics, API/metrics.py
+            return super().to_representation(instance)
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ["id","name","usage_count"]
+        read_only_fields = ["usage_count"]
+
+class ContextEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ContextEntry
+        fields = ["id","content","source_type","created_at","processed_insights","duplicate_of"]
+        read_only_fields = ["duplicate_of"]
+
+class ContextEntryListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Compact list row: a content preview instead of the full text and insights."""
+    PREVIEW_CHARS = 200
+    content_preview = serializers.CharField(read_only=True)
+    has_insights = serializers.BooleanField(read_only=True)
+    class Meta: model = ContextEntry; fields = ["id","content_preview","source_type","created_at","has_insights"]
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category',
@@ -0,0 +1,121 @@
+# API/startup.py
+"""
+Cold start.
+
+Nothing heavy is imported while Django boots: the Gemini SDK is loaded
+when gemini_client builds its first model, TextBlob/NLTK on the first
+sentiment or keyword call, numpy on the first index or rescoring call.
+Short-lived processes (manage.py commands, test runs, freshly autoscaled
+workers) therefore start with Django and DRF only.
+
+A long-lived worker can pay those costs before taking traffic instead of
+on its first request:
+
+    SMART_TODO_WARMUP=1 gunicorn smart_todo.wsgi      (or uvicorn smart_todo.asgi:application)
+    python manage.py warmup                           (see what each step costs)
+
+`import_profile` runs `python -X importtime` on the startup path in a
+fresh interpreter; `python manage.py import_bench` prints it and fails
+when a HEAVY_MODULES entry shows up or the budget is exceeded, and
+AI_todo/tests.py checks the same on every test run.
+"""
+import logging
+import os
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Must not be imported by django.setup() plus the URLconf.
+HEAVY_MODULES = ("google.generativeai", "grpc", "textblob", "nltk", "numpy", "brotli")
+
+# What a worker imports before serving its first request.
+STARTUP_CODE = (
+    "import os, django; "
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_todo.settings'); "
+    "django.setup(); "
+    "import smart_todo.urls, API.views, API.insights"
+)
+
+
+def _warm_sdk():
+    from django.conf import settings
+
+    from . import gemini_client
+
+    if getattr(settings, "AI_FAKE_MODEL", None) is None:
+        import google.generativeai  # noqa: F401
+    for purpose in gemini_client.get_config()["MODELS"]:
+        gemini_client.get_model(purpose)
+
+
+def _warm_nlp():
+    from .Gemini import analyze_sentiment, extract_keywords
+
+    analyze_sentiment("warm up")
+    extract_keywords("Warm up the tagger")
+
+
+def _warm_indexes():
+    from .dedup import get_signature_index
+    from .embeddings import get_context_index
+    from .keyword_rules import get_classifier
+
+    get_classifier()
+    get_context_index()
+    get_signature_index()
+
+
+WARMUP_STEPS = {"sdk": _warm_sdk, "nlp": _warm_nlp, "indexes": _warm_indexes}
+
+
+def warm_up(steps=None):
+    """
+    Run the named WARMUP_STEPS (all by default). A step that fails (an
+    optional package missing, no network) is logged and skipped; the
+    request path would then pay that cost or fail the same way later.
+    Returns {step: seconds or None if it failed}.
+    """
+    timings = {}
+    for name in steps or WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            WARMUP_STEPS[name]()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            timings[name] = None
+        else:
+            timings[name] = round(time.perf_counter() - start, 3)
+    logger.info("Warm-up done: %s", timings)
+    return timings
+
+
+def warm_up_from_env():
+    """Called by wsgi.py / asgi.py; warms only when SMART_TODO_WARMUP=1."""
+    if os.getenv("SMART_TODO_WARMUP", "0") == "1":
+        warm_up()
+
+
+def import_profile(code=STARTUP_CODE):
+    """
+    Run `code` under `python -X importtime` in a fresh interpreter. Returns
+    {"total_ms", "modules": [(name, self_ms, cumulative_ms)] in import
+    order, "heavy": HEAVY_MODULES entries that were imported}.
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, check=False,
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    heavy = sorted({root for root in HEAVY_MODULES
+                    for name, _, _ in modules if name == root or name.startswith(root + ".")})
+    return {"total_ms": round(sum(m[1] for m in modules), 1), "modules": modules, "heavy": heavy}
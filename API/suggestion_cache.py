@@ -0,0 +1,178 @@
+# API/suggestion_cache.py
+"""
+Content-addressed cache for AI task suggestions.
+
+Keys are a SHA-256 over the normalized (title, description, context texts,
+model name, prompt version) so identical requests from the task form reuse
+the earlier model answer instead of making another remote call.
+
+Configure through settings.AI_SUGGEST_CACHE, e.g.:
+
+    AI_SUGGEST_CACHE = {
+        "BACKEND": "locmem",      # "locmem" (in-process) or "django"
+        "TTL": 3600,              # seconds
+        "MAX_ENTRIES": 1024,      # LRU bound for the locmem backend
+        "ALIAS": "default",       # CACHES alias for the django backend
+    }
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import SUGGESTION_CACHE
+
+DEFAULT_CONFIG = {
+    "BACKEND": "locmem",
+    "TTL": 3600,
+    "MAX_ENTRIES": 1024,
+    "ALIAS": "default",
+}
+
+KEY_PREFIX = "ai_suggest:"
+
+
+def _normalize(text):
+    """Collapse whitespace so cosmetic edits still hit the same entry."""
+    return " ".join((text or "").split())
+
+
+def make_key(title, desc, contexts, model_name, prompt_version):
+    """
+    Return the content hash used as cache key for one suggestion request.
+    contexts is one context text or the list of them sent in the prompt.
+    """
+    if isinstance(contexts, str):
+        contexts = [contexts]
+    payload = json.dumps(
+        [_normalize(title), _normalize(desc), [_normalize(c) for c in contexts], model_name, prompt_version],
+        ensure_ascii=False,
+    )
+    return KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LocMemBackend:
+    """Thread-safe in-process store with per-entry TTL and LRU eviction."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """
+    Store entries in a Django cache (settings.CACHES[alias]).
+    Pointing the alias at DatabaseCache gives a persistent SQLite-backed table,
+    at Redis/Memcached a cache shared by all workers.
+    """
+
+    def __init__(self, ttl, alias="default"):
+        from django.core.cache import caches
+
+        self.ttl = ttl
+        self._cache = caches[alias]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, timeout=self.ttl)
+
+    def clear(self):
+        # Only our own keys should go, but generic caches can't enumerate by
+        # prefix; clearing the whole alias is the documented behaviour.
+        self._cache.clear()
+
+
+class SuggestionCache:
+    """Front for a backend that also keeps hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        SUGGESTION_CACHE.inc(result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _build_cache():
+    conf = {**DEFAULT_CONFIG, **getattr(settings, "AI_SUGGEST_CACHE", {})}
+    backend_name = conf["BACKEND"]
+    if backend_name == "locmem":
+        backend = LocMemBackend(conf["TTL"], conf["MAX_ENTRIES"])
+    elif backend_name == "django":
+        backend = DjangoCacheBackend(conf["TTL"], conf["ALIAS"])
+    else:
+        raise ValueError(f"Unknown AI_SUGGEST_CACHE backend: {backend_name!r}")
+    return SuggestionCache(backend)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_suggestion_cache():
+    """Return the process-wide SuggestionCache, building it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _build_cache()
+    return _cache
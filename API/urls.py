@@ -2,7 +2,7 @@ from django.urls import path
 # from . import views
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CategoryViewSet, ContextEntryViewSet, ai_suggest, health
+from .views import TaskViewSet, CategoryViewSet, ContextEntryViewSet, ai_suggest, ai_suggest_async, ai_suggest_batch, ai_suggest_stream, ai_suggest_cache_stats, ai_breaker_stats, change_stream, changes, health, metrics_export, search
 
 from . import views
 
@@ -13,7 +13,16 @@ router.register(r'context', ContextEntryViewSet, basename='context')
 
 urlpatterns = [
     path('health/', health),
+    path('search/', search),
     path('ai/suggest/', ai_suggest),
+    path('ai/suggest/batch/', ai_suggest_batch),
+    path('ai/suggest/async/', ai_suggest_async),
+    path('ai/suggest/stream/', ai_suggest_stream),
+    path('ai/suggest/cache/', ai_suggest_cache_stats),
+    path('ai/breaker/', ai_breaker_stats),
+    path('changes/', changes),
+    path('metrics/', metrics_export),
+    path('changes/stream/', change_stream),
     path('', include(router.urls)),
     path('contexts/<int:pk>/delete/', views.delete_context, name='delete_context'),
 ]
@@ -1,50 +1,509 @@
+import asyncio
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import BooleanField, DateField, ExpressionWrapper, Q, Value
+from django.db.models.functions import Coalesce, Substr
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets
-from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from AI_todo.models import Task, Category, ContextEntry
-from .serializers import TaskSerializer, CategorySerializer, ContextEntrySerializer
-from .ai_utils import get_ai_suggestions_with_gemini
+from .serializers import TaskSerializer, CategorySerializer, ContextEntrySerializer, ContextEntryListSerializer
+from .pagination import OptionalCursorPagination, CategoryCursorPagination
+from . import gemini_client, metrics
+from .ai_utils import fallback_stats, get_ai_suggestions_with_gemini, get_ai_suggestions_async, stream_ai_suggestions
+from .changes import TABLES as CHANGE_TABLES, CursorExpired, changes_since, get_config as get_change_config, head as change_head
+from .embeddings import relevant_contexts
+from .http_cache import ConditionalGetMixin
+from .ingest import KINDS as INGEST_KINDS, SOURCE_TYPES, ingest as ingest_records, parse_records
+from .batch_suggest import get_batch_config, suggest_batch
+from .rescoring import rescore_open_tasks
+from .search import search as run_search
+from .suggestion_cache import get_suggestion_cache
 from rest_framework import status
-from .ai_utils import get_ai_suggestions_with_gemini
 import logging
 logger = logging.getLogger(__name__)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all().order_by('-created_at')
+class SparseFieldsViewMixin:
+    """Pass ?fields=a,b,c on GET requests through to the serializer."""
+
+    def requested_fields(self):
+        if self.request is None or self.request.method != "GET":
+            return None
+        raw = self.request.query_params.get("fields", "")
+        return [f.strip() for f in raw.split(",") if f.strip()] or None
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+
+def _query_date(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_date(raw)
+    except ValueError:  # well formed but impossible, e.g. 2025-02-30
+        value = None
+    if value is None:
+        raise ValidationError({name: "Expected YYYY-MM-DD."})
+    return value
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _query_float(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValidationError({name: "Expected a number."})
+
+
+def _query_positive_int(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    if not raw.isdigit() or int(raw) < 1:
+        raise ValidationError({name: "Expected a positive integer."})
+    return int(raw)
+
+
+def _query_flag(params, name):
+    return params.get(name, "").lower() in ("1", "true")
+
+
+# Tasks without a deadline sort as if due on date.max: cursor pages encode
+# the first ordering key, and a NULL there cannot be compared against.
+DEADLINE_KEY = Coalesce("deadline", Value(date.max), output_field=DateField())
+
+
+class TaskOrderingFilter(OrderingFilter):
+    """?ordering=deadline sorts on DEADLINE_KEY, with id as the tiebreaker."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or ordering[0].lstrip("-") != "deadline":
+            return ordering
+        sign = "-" if ordering[0].startswith("-") else ""
+        return [f"{sign}deadline_key", f"{sign}id"]
+
+
+class TaskViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
+    """
+    List filters: ?status=, ?category= (id or name), ?deadline_after=,
+    ?deadline_before= (YYYY-MM-DD, inclusive), ?min_priority= (>=),
+    ?priority_below= (<). ?ordering= one of created_at, deadline,
+    priority_score (prefix "-" for descending).
+    """
+    queryset = Task.objects.select_related('category').order_by('-created_at')
+    cache_table = "task"
     serializer_class = TaskSerializer
+    pagination_class = OptionalCursorPagination
+    filter_backends = [TaskOrderingFilter]
+    ordering_fields = ["created_at", "deadline", "priority_score"]
+    ordering = ["-created_at"]
+
+    @action(detail=False, methods=["post"])
+    def rescore(self, request):
+        """Recompute priority_score for every open task (see API/rescoring.py)."""
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true")
+        return Response(rescore_open_tasks(dry_run=dry_run))
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != "list":
+            return qs
+        qs = qs.annotate(deadline_key=DEADLINE_KEY)
+        params = self.request.query_params
+        if params.get("status"):
+            qs = qs.filter(status=params["status"])
+        category = params.get("category")
+        if category:
+            qs = qs.filter(category_id=int(category)) if category.isdigit() else qs.filter(category__name=category)
+        deadline_after = _query_date(params, "deadline_after")
+        if deadline_after:
+            qs = qs.filter(deadline__gte=deadline_after)
+        deadline_before = _query_date(params, "deadline_before")
+        if deadline_before:
+            qs = qs.filter(deadline__lte=deadline_before)
+        min_priority = _query_float(params, "min_priority")
+        if min_priority is not None:
+            qs = qs.filter(priority_score__gte=min_priority)
+        priority_below = _query_float(params, "priority_below")
+        if priority_below is not None:
+            qs = qs.filter(priority_score__lt=priority_below)
+        return qs
+
+class CategoryViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
+    """?ordering=-usage_count lists the most used categories first."""
     queryset = Category.objects.all().order_by('name')
+    cache_table = "category"
     serializer_class = CategorySerializer
+    pagination_class = CategoryCursorPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["name", "usage_count"]
+    ordering = ["name"]
 
-class ContextEntryViewSet(viewsets.ModelViewSet):
+class ContextEntryViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
+    """
+    ?compact=1 on list returns ContextEntryListSerializer rows: the preview is
+    cut in SQL and the full content/insights columns are never loaded.
+    ?fields= on the full serializer also limits the columns selected.
+    List filters: ?source_type=, ?created_after=, ?created_before= (YYYY-MM-DD).
+    """
     queryset = ContextEntry.objects.all().order_by('-created_at')
+    cache_table = "context"
     serializer_class = ContextEntrySerializer
+    pagination_class = OptionalCursorPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["created_at"]
+    ordering = ["-created_at"]
+
+    @action(detail=False, methods=["post"])
+    def ingest(self, request):
+        """
+        Bulk import (see API/ingest.py). The body is read line by line: either
+        a multipart "file" upload or the raw request body. Query params:
+        ?kind=ndjson|whatsapp, ?batch_size=, ?enqueue=1, ?dayfirst=1,
+        ?source_type= (default for rows that do not name one).
+        """
+        params = request.query_params
+        kind = params.get("kind", "ndjson")
+        if kind not in INGEST_KINDS:
+            raise ValidationError({"kind": f"Expected one of {', '.join(INGEST_KINDS)}."})
+        source_type = params.get("source_type") or ("whatsapp" if kind == "whatsapp" else "note")
+        if source_type not in SOURCE_TYPES:
+            raise ValidationError({"source_type": f"Expected one of {', '.join(sorted(SOURCE_TYPES))}."})
+        batch_size = _query_positive_int(params, "batch_size")
+        upload = request.FILES.get("file") if request.content_type.startswith("multipart/") else None
+        lines = upload if upload is not None else (request.stream or [])
+        errors = {}
+        summary = ingest_records(
+            parse_records(lines, kind, dayfirst=_query_flag(params, "dayfirst"), errors=errors),
+            batch_size=batch_size,
+            enqueue=_query_flag(params, "enqueue"),
+            default_source=source_type,
+            errors=errors,
+        )
+        return Response({**summary, "errors": errors}, status=status.HTTP_201_CREATED)
+
+    def is_compact(self):
+        return self.action == "list" and self.request.query_params.get("compact") in ("1", "true")
+
+    def get_serializer_class(self):
+        return ContextEntryListSerializer if self.is_compact() else ContextEntrySerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            params = self.request.query_params
+            if params.get("source_type"):
+                qs = qs.filter(source_type=params["source_type"])
+            # Compare against day boundaries rather than created_at__date so
+            # the (source_type, created_at) index can serve the range.
+            created_after = _query_date(params, "created_after")
+            if created_after:
+                qs = qs.filter(created_at__gte=_day_start(created_after))
+            created_before = _query_date(params, "created_before")
+            if created_before:
+                qs = qs.filter(created_at__lt=_day_start(created_before + timedelta(days=1)))
+        if self.is_compact():
+            return qs.annotate(
+                content_preview=Substr("content", 1, ContextEntryListSerializer.PREVIEW_CHARS),
+                has_insights=ExpressionWrapper(Q(processed_insights__isnull=False), output_field=BooleanField()),
+            ).defer("content", "processed_insights")
+        fields = self.requested_fields()
+        if fields:
+            model_fields = {f.name for f in ContextEntry._meta.concrete_fields}
+            return qs.only("id", "created_at", *(set(fields) & model_fields))
+        return qs
 
 @api_view(["GET"])
 def health(_req):
     return Response({"ok": True})
 
 
+@api_view(["GET"])
+def search(request):
+    """
+    Ranked full-text search. ?q= text, optional ?type=task|context and
+    ?limit= (default 20, max 100). Matches are wrapped in [ ] in "snippet".
+    """
+    q = request.query_params.get("q", "").strip()
+    kind = request.query_params.get("type")
+    if kind and kind not in ("task", "context"):
+        return Response({"error": "type must be task or context"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    kinds = (kind,) if kind else ("task", "context")
+    return Response({"query": q, "results": run_search(q, kinds=kinds, limit=limit)})
+
+
+def _select_contexts(title, description, ctx_ids, k=5):
+    """
+    Contexts for a suggestion, best first: the explicit ids if given (in the
+    caller's order), else the k contexts most similar to the title/description
+    (API/embeddings.py), else the k newest.
+    """
+    if ctx_ids:
+        ids = list(dict.fromkeys(int(i) for i in ctx_ids if str(i).isdigit()))
+        found = ContextEntry.objects.in_bulk(ids)
+        return [found[i] for i in ids if i in found]
+    query = f"{title} {description}".strip()
+    if query:
+        relevant = relevant_contexts(query, k=k)
+        if relevant:
+            return relevant
+    return list(ContextEntry.objects.all().order_by('-created_at')[:k])
+
+
 @api_view(["POST"])
 def ai_suggest(request):
     title = request.data.get("title", "").strip()
     description = request.data.get("description", "").strip()
     ctx_ids = request.data.get("context_ids", [])
 
-    if ctx_ids:
-        contexts = ContextEntry.objects.filter(id__in=ctx_ids).order_by('-created_at')
-    else:
-        # fetch most recent 1 (or a few, but util uses only most recent)
-        contexts = ContextEntry.objects.all().order_by('-created_at')[:5]
+    contexts = _select_contexts(title, description, ctx_ids)
 
     # prefer Gemini if configured, fallback to heuristic
-    suggestions = get_ai_suggestions_with_gemini(title, description, list(contexts))
+    suggestions = get_ai_suggestions_with_gemini(title, description, contexts)
 
     return Response(suggestions)
 
 
+@api_view(["POST"])
+def ai_suggest_batch(request):
+    """
+    Suggest tasks for many contexts in one call.
+    Body: {"context_ids": [1, 2, ...]} and/or {"texts": ["...", ...]}.
+    Results follow input order (ids first, then texts), each with "ok" and
+    either "suggestion" or "error".
+    """
+    if not isinstance(request.data, dict):
+        return Response({"error": "body must be a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+    ctx_ids = request.data.get("context_ids", []) or []
+    texts = request.data.get("texts", []) or []
+    if not isinstance(ctx_ids, list) or not isinstance(texts, list):
+        return Response({"error": "context_ids and texts must be lists"}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(type(i) is int for i in ctx_ids):
+        return Response({"error": "context_ids must be a list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_items = get_batch_config()["MAX_ITEMS"]
+    if len(ctx_ids) + len(texts) > max_items:
+        return Response({"error": f"At most {max_items} items per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+    found = ContextEntry.objects.in_bulk(ctx_ids)
+    entries = [found.get(i) for i in ctx_ids]
+    entries += [t if isinstance(t, str) else "" for t in texts]
+
+    results = suggest_batch(entries)
+    for n, res in enumerate(results):
+        if n < len(ctx_ids):
+            res["context_id"] = ctx_ids[n]
+        res["index"] = n
+    return Response({"results": results})
+
+
+def _suggest_body(request):
+    """
+    (data, error) for an ai_suggest JSON body; error is a 400 response when
+    the body is not an object or its fields have the wrong types.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None, JsonResponse({"detail": "JSON parse error"}, status=400)
+    if not isinstance(data, dict):
+        return None, JsonResponse({"error": "body must be a JSON object"}, status=400)
+    ctx_ids = data.get("context_ids") or []
+    if not isinstance(ctx_ids, list) or not all(type(i) is int for i in ctx_ids):
+        return None, JsonResponse({"error": "context_ids must be a list of ids"}, status=400)
+    if not all(isinstance(data.get(f) or "", str) for f in ("title", "description")):
+        return None, JsonResponse({"error": "title and description must be strings"}, status=400)
+    return {**data, "context_ids": ctx_ids}, None
+
+
+@csrf_exempt
+async def ai_suggest_async(request):
+    """
+    Same contract as ai_suggest, but the model call is awaited with a deadline
+    so an ASGI worker can keep many suggestions in flight. DRF views are sync
+    only, hence the plain Django view (csrf_exempt like DRF's APIView).
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    data, error = _suggest_body(request)
+    if error is not None:
+        return error
+
+    title = (data.get("title") or "").strip()
+    description = (data.get("description") or "").strip()
+    ctx_ids = data["context_ids"]
+
+    contexts = await sync_to_async(_select_contexts)(title, description, ctx_ids)
+
+    suggestions = await get_ai_suggestions_async(title, description, contexts)
+    return JsonResponse(suggestions)
+
+
+def _sse_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pass events through unbuffered
+    return response
+
+
+@csrf_exempt
+async def ai_suggest_stream(request):
+    """
+    ai_suggest as Server-Sent Events: a "field" event ({"name", "value"})
+    for each suggestion field as soon as the model has written it, usually
+    title and priority first, then a "done" event ({"source", "suggestion"})
+    with the final answer. POST takes the ai_suggest body; GET takes
+    ?title=&description=&context_ids=1,2 so EventSource can be used directly.
+    Meant for the ASGI app (smart_todo/asgi.py).
+    """
+    if request.method == "POST":
+        data, error = _suggest_body(request)
+        if error is not None:
+            return error
+        ctx_ids = data["context_ids"]
+    elif request.method == "GET":
+        data = request.GET
+        raw_ids = [i.strip() for i in data.get("context_ids", "").split(",") if i.strip()]
+        if not all(i.isdigit() for i in raw_ids):
+            return JsonResponse({"error": "context_ids must be comma-separated ids"}, status=400)
+        ctx_ids = [int(i) for i in raw_ids]
+    else:
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    title = (data.get("title") or "").strip()
+    description = (data.get("description") or "").strip()
+    contexts = await sync_to_async(_select_contexts)(title, description, ctx_ids)
+
+    async def events():
+        async for event in stream_ai_suggestions(title, description, contexts):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+    return _sse_response(events())
+
+
+@api_view(["GET"])
+def ai_suggest_cache_stats(_req):
+    return Response(get_suggestion_cache().stats())
+
+
+@api_view(["GET"])
+def ai_breaker_stats(_req):
+    return Response({"breaker": gemini_client.get_breaker().stats(), "fallbacks": fallback_stats()})
+
+
+def metrics_export(request):
+    """Prometheus scrape target (API/metrics.py); plain Django view, no content negotiation."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _feed_params(params, default_since=None):
+    """(since, tables) for the change feed; since is None when not given."""
+    raw = params.get("since") or default_since
+    since = None
+    if raw:
+        if not raw.isdigit():
+            raise ValueError("since must be a cursor returned by /api/changes/")
+        since = int(raw)
+    tables = [t.strip() for t in params.get("tables", "").split(",") if t.strip()] or None
+    unknown = set(tables or ()) - set(CHANGE_TABLES)
+    if unknown:
+        raise ValueError(f"tables must be among {', '.join(CHANGE_TABLES)}")
+    return since, tables
+
+
+@api_view(["GET"])
+def changes(request):
+    """
+    Delta sync (API/changes.py). Without ?since= returns the current cursor
+    only; with it, the upserts and tombstones written after that cursor,
+    one per object. Follow "cursor" while "more" is true. ?tables=task,context
+    narrows the feed, ?limit= caps the log rows read. 410 means the cursor
+    predates the retained log: re-download the lists and start over.
+    """
+    try:
+        since, tables = _feed_params(request.query_params)
+        raw_limit = request.query_params.get("limit")
+        limit = None
+        if raw_limit:
+            if not raw_limit.isdigit() or int(raw_limit) < 1:
+                raise ValueError("limit must be a positive integer")
+            limit = int(raw_limit)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if since is None:
+        return Response({"cursor": change_head(), "more": False, "changes": []})
+    try:
+        return Response(changes_since(since, limit=limit, tables=tables))
+    except CursorExpired:
+        return Response({"error": "cursor expired, resync"}, status=status.HTTP_410_GONE)
+
+
+async def change_stream(request):
+    """
+    The change feed as Server-Sent Events: one "changes" event per page, its
+    id the new cursor, so EventSource resumes from Last-Event-ID on its own.
+    Takes ?since= and ?tables= like /api/changes/. Each connection is closed
+    after STREAM_MAX_SECONDS; meant for the ASGI app (smart_todo/asgi.py).
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        since, tables = _feed_params(request.GET, request.headers.get("Last-Event-ID"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if since is None:
+        since = await sync_to_async(change_head)()
+    conf = get_change_config()
+
+    async def events(cursor):
+        yield f"retry: {int(conf['STREAM_POLL'] * 2000)}\n\n"
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < conf["STREAM_MAX_SECONDS"]:
+            try:
+                page = await sync_to_async(changes_since)(cursor, tables=tables)
+            except CursorExpired:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            cursor = page["cursor"]
+            if page["changes"]:
+                yield f"id: {cursor}\nevent: changes\ndata: {json.dumps(page, cls=DjangoJSONEncoder)}\n\n"
+                last_sent = time.monotonic()
+            if page["more"]:
+                continue
+            if time.monotonic() - last_sent >= conf["STREAM_HEARTBEAT"]:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(conf["STREAM_POLL"])
+
+    return _sse_response(events(since))
+
+
 
 @api_view(["DELETE"])
 def delete_context(request, pk):
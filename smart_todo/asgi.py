@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve it with an ASGI server so /api/ai/suggest/async/ can keep many model
+calls in flight per worker, and /api/changes/stream/ can hold open many
+Server-Sent Events connections, e.g.:
+
+    uvicorn smart_todo.asgi:application --workers 2
 """
 
 import os
@@ -14,3 +20,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_todo.settings')
 
 application = get_asgi_application()
+
+# Optional: load the model SDK, NLP models and indexes before the first
+# request (SMART_TODO_WARMUP=1, see API/startup.py).
+from API.startup import warm_up_from_env  # noqa: E402
+
+warm_up_from_env()
+
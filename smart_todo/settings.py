@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'API.middleware.MetricsMiddleware',
+    'API.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,12 +78,52 @@ WSGI_APPLICATION = 'smart_todo.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgres; see the README for every variable.
+# SQLite: WAL lets readers run alongside the single writer, busy_timeout makes
+# writers queue instead of failing with "database is locked", and IMMEDIATE
+# transactions take the write lock up front so a read-then-write transaction
+# never hits a lock upgrade that SQLite cannot retry. SQLITE_TUNED=0 restores
+# the stock rollback-journal setup (for benchmarking).
+# PostgreSQL: persistent connections (DB_CONN_MAX_AGE seconds, health-checked)
+# or, with DB_POOL=1 and psycopg[pool] installed, a per-process pool.
+
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite").lower()
+
+if DB_ENGINE in ("postgres", "postgresql"):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "smart_todo"),
+            'USER': os.getenv("DB_USER", "smart_todo"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.getenv("DB_POOL", "0") == "1":
+        # Django's pool replaces persistent connections; the two cannot be combined.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH") or BASE_DIR / 'db.sqlite3',
+        }
+    }
+    if os.getenv("SQLITE_TUNED", "1") == "1":
+        DATABASES['default']['OPTIONS'] = {
+            "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),  # seconds, sets busy_timeout
+            "transaction_mode": "IMMEDIATE",
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-16000",
+        }
 
 
 # Password validation
@@ -128,3 +170,137 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# AI suggestion cache (see API/suggestion_cache.py)
+# Use "BACKEND": "django" to store entries in CACHES["ALIAS"] instead of
+# process memory (e.g. a DatabaseCache table shared by all workers).
+
+AI_SUGGEST_CACHE = {
+    "BACKEND": os.getenv("AI_SUGGEST_CACHE_BACKEND", "locmem"),
+    "TTL": int(os.getenv("AI_SUGGEST_CACHE_TTL", "3600")),
+    "MAX_ENTRIES": 1024,
+    "ALIAS": "default",
+}
+
+# Deadline (seconds) for the model call on /api/ai/suggest/async/ before it
+# falls back to the local heuristic.
+AI_SUGGEST_TIMEOUT = float(os.getenv("AI_SUGGEST_TIMEOUT", "8"))
+
+# Offline model stub for load tests, e.g. {"latency": 0.5, "jitter": 0.2}.
+# Leave as None to call Gemini.
+AI_FAKE_MODEL = None
+
+# Batch suggestions (/api/ai/suggest/batch/, API/batch_suggest.py)
+AI_SUGGEST_BATCH = {
+    "CHUNK_SIZE": 10,
+    "CONCURRENCY": 4,
+    "MAX_ITEMS": 500,
+}
+
+# Queue new ContextEntry rows for `manage.py process_insights`
+# (fills ContextEntry.processed_insights in the background).
+INSIGHTS_AUTO_ENQUEUE = True
+
+# Shared Gemini client (API/gemini_client.py). The API key comes from the
+# GEMINI_API_KEY environment variable; per-purpose model overrides go in
+# "MODELS" ("suggest" for /api/ai/suggest/, "analyze" for Gemini.analyze_task).
+GEMINI = {
+    "TIMEOUT": float(os.getenv("GEMINI_TIMEOUT", "30")),
+    "TRANSPORT": os.getenv("GEMINI_TRANSPORT") or None,
+    "MODELS": {
+        "suggest": {"model_name": os.getenv("GEMINI_SUGGEST_MODEL", "gemini-1.5-flash")},
+    },
+}
+
+# Circuit breaker and retries around every Gemini call (API/circuit_breaker.py).
+# State and fallback counts: GET /api/ai/breaker/
+AI_CIRCUIT_BREAKER = {
+    "FAILURE_THRESHOLD": 5,
+    "RECOVERY_TIMEOUT": 30,
+    "LATENCY_SLO": 10.0,
+    "MAX_ATTEMPTS": 3,
+    "BACKOFF_BASE": 0.2,
+    "BACKOFF_MAX": 2.0,
+    "DEADLINE": 20.0,
+}
+
+# Keyword rules for the offline heuristic (API/keyword_rules.py). KeywordRule
+# rows in the database take precedence; leave empty to use the built-ins.
+AI_HEURISTIC_RULES = {}
+
+# Bulk context import (POST /api/context/ingest/, manage.py ingest_contexts).
+CONTEXT_INGEST = {
+    "BATCH_SIZE": 1000,
+    "MAX_BATCH_SIZE": 5000,
+}
+
+# Duplicate detection for context entries (API/dedup.py).
+CONTEXT_DEDUP = {
+    "NEAR_DISTANCE": 5,
+    "MIN_WORDS": 8,
+    "MIN_JACCARD": 0.8,
+}
+
+# Conditional GETs on the task/context/category endpoints (API/http_cache.py)
+# need no settings: ETags come from the TableVersion counters.
+# Response compression (API/middleware.py). Brotli needs `pip install brotli`;
+# without it every client gets gzip.
+# HTTP_COMPRESSION = {
+#     "BROTLI": True,
+#     "BROTLI_QUALITY": 5,
+# }
+
+# Delta sync change feed (GET /api/changes/, /api/changes/stream/, API/changes.py).
+# Run `python manage.py prune_changes` daily to drop rows past the retention.
+CHANGE_FEED = {
+    "PAGE_SIZE": 500,
+    "RETENTION_DAYS": 30,
+    "STREAM_POLL": 1.0,
+    "STREAM_MAX_SECONDS": 300,
+}
+
+# Request metrics (API/metrics.py): Prometheus text at GET /api/metrics/.
+# SERVER_TIMING adds a Server-Timing header (db, serialize, model, total)
+# to every response; handy in browser devtools, off by default.
+METRICS = {
+    "ENABLED": True,
+    "SERVER_TIMING": False,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "API": {"handlers": ["console"], "level": os.getenv("API_LOG_LEVEL", "INFO")},
+    },
+}
+
+# Sentiment / keyword extraction for the analyzer (API/nlp.py). WORKERS > 0
+# tags large insight batches on a process pool (also: process_insights
+# --nlp-workers).
+NLP = {
+    "CACHE_SIZE": 4096,
+    "TOP_KEYWORDS": 5,
+    "WORKERS": 0,
+}
+
+# Prompt budget (API/prompts.py), in ~4-character tokens. Contexts lose
+# quoted reply chains and repeated chat lines, then long ones are reduced
+# to their key sentences; instructions stay first so the provider can
+# cache them.
+PROMPT_BUDGET = {
+    "MAX_PROMPT_TOKENS": 3000,
+    "MAX_CONTEXT_TOKENS": 1200,
+    "MAX_FIELD_TOKENS": 200,
+    "BATCH_CONTEXT_TOKENS": 300,
+    "STRIP_QUOTED": True,
+}
+
+# Model replies (API/schemas.py): ask for JSON constrained to the suggestion,
+# batch and analysis schemas. Replies are validated and repaired against the
+# same schemas either way.
+STRUCTURED_OUTPUT = {
+    "REQUEST_SCHEMA": True,
+}
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_todo.settings')
 
 application = get_wsgi_application()
+
+# Optional: load the model SDK, NLP models and indexes before the first
+# request (SMART_TODO_WARMUP=1, see API/startup.py).
+from API.startup import warm_up_from_env  # noqa: E402
+
+warm_up_from_env()
+